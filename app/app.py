@@ -5,7 +5,7 @@
 Application web Book Finder
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for
+from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for, Response, stream_with_context
 from flask_talisman import Talisman
 from flask_seasurf import SeaSurf
 from flask_limiter import Limiter
@@ -13,6 +13,8 @@ from flask_limiter.util import get_remote_address
 import os
 import sys
 import bleach
+import functools
+import json
 import logging
 from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
@@ -25,7 +27,14 @@ load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.config import Config
-from app.core.search_engine import SearchEngine
+from app.core.limiter_storage import SharedLimiterStorage  # noqa: F401 (enregistre le schéma shared://)
+from app.core.instrumentation import configure_logging, start_timings, timed
+from app.core.metrics import render_metrics
+from app.core.search_engine import SearchEngine, decode_cursor
+from app.core.warmup import CacheWarmer
+
+# Journaux des sources et du moteur (niveau Config.LOG_LEVEL, échantillonnage Config.LOG_SAMPLE_RATE)
+configure_logging()
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -86,27 +95,37 @@ csrf = SeaSurf(app)
 app.config['CSRF_COOKIE_SECURE'] = True
 app.config['CSRF_COOKIE_HTTPONLY'] = True
 
-# Limiteur de taux avec configuration plus stricte
+# Limiteur de taux avec configuration plus stricte, compteurs communs à tous les workers
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=Config.RATELIMIT_STORAGE_URL,
+    # Stockage partagé indisponible : compteurs en mémoire du worker jusqu'à son retour
+    # (échecs comptés dans book_finder_ratelimit_storage_errors_total)
+    in_memory_fallback_enabled=True
 )
 
 # Initialise le moteur de recherche
 search_engine = SearchEngine()
+# Préchauffage des caches, lancé au démarrage de chaque worker (voir gunicorn_config.py)
+warmer = CacheWarmer(search_engine)
 
 @app.before_request
 def before_request():
     """Vérifications avant chaque requête"""
     if request.is_secure or app.config['ENV'] == 'development':
         return
-
+    
+    # Les métriques sont collectées par Prometheus en HTTP simple, sur l'interface locale
+    if request.path == '/metrics':
+        return
+    
     # Liste des routes autorisées et leur fonction correspondante
     ALLOWED_ROUTES = {
         '/': 'index',
         '/search': 'search',
+        '/search/stream': 'search_stream',
         '/about': 'about',
         '/contact': 'contact'
     }
@@ -176,6 +195,7 @@ def index():
         'error': 'Erreur',
         'loading': 'Chargement...',
         'search_placeholder': 'Rechercher un livre...',
+        'more_results': 'Plus de résultats',
     }
     
     return render_template('index.html',
@@ -184,6 +204,64 @@ def index():
                          lang=lang,
                          config=Config)
 
+def read_cursor():
+    """
+    Lit le curseur de pagination du paramètre 'page'
+    
+    Returns:
+        Curseur, ou None pour la première page
+        
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    cursor = request.args.get('page') or None
+    if cursor is not None:
+        decode_cursor(cursor)
+    return cursor
+
+@functools.lru_cache(maxsize=4096)
+def clean_text(text):
+    """
+    Nettoie une chaîne (None devient une chaîne vide)
+    
+    Les mêmes valeurs reviennent d'une réponse à l'autre (noms de source, langues,
+    résultats en cache) : elles ne sont nettoyées qu'une fois.
+    """
+    return bleach.clean(text) if text else ''
+
+def stream_response(events, **kwargs):
+    """
+    Réponse diffusée au fil de l'eau à partir d'un générateur asynchrone
+    
+    Sous WSGI, le générateur est parcouru sur la boucle du client HTTP ; sous ASGI
+    (app/asgi.py), le serveur le parcourt directement sur sa boucle (async_body).
+    """
+    response = Response(stream_with_context(search_engine.http_client.iterate(events)), **kwargs)
+    response.async_body = events
+    return response
+
+def clean_link(link):
+    """Nettoie les liens d'une source vers un résultat fusionné"""
+    return {field: clean_text(link[field]) if link.get(field) else None
+            for field in ('source', 'url', 'read_url', 'download_url')}
+
+def clean_result(result):
+    """
+    Nettoie les champs d'un résultat avant de le renvoyer au navigateur
+    
+    Appelé uniquement sur les résultats de la page renvoyée, déjà limitée à
+    Config.MAX_SEARCH_RESULTS par le moteur.
+    """
+    return {
+        'title': clean_text(result.get('title')),
+        'author': clean_text(result.get('author')),
+        'url': clean_text(result.get('url')),
+        'source': clean_text(result.get('source')),
+        'language': clean_text(result.get('language')),
+        # Toutes les sources qui proposent ce livre, y compris la principale
+        'links': [clean_link(link) for link in result.get('links', [])]
+    }
+
 @app.route('/search')
 @limiter.limit("30 per minute")
 async def search():
@@ -195,26 +273,104 @@ async def search():
     
     if not query or lang not in Config.SUPPORTED_LANGUAGES:
         return jsonify([])
+    try:
+        cursor = read_cursor()
+    except ValueError:
+        return jsonify({"error": "Page invalide"}), 400
+    
+    # Fréquence des requêtes, pour le préchauffage des caches
+    if cursor is None:
+        warmer.query_log.record(query, lang)
     
+    # Durées par phase (réseau et analyse par source, score, nettoyage, sérialisation)
+    timings = start_timings()
     try:
-        results = await search_engine.search_async(query, lang)
+        with timed('search'):
+            report = await search_engine.search_with_status(query, lang, cursor)
+        results = report.results
         app.logger.info(f'Résultats trouvés: {len(results)}')
         # Nettoyer les résultats avant de les renvoyer
-        clean_results = []
-        for result in results:
-            clean_results.append({
-                'title': bleach.clean(result.get('title', '')),
-                'author': bleach.clean(result.get('author', '')),
-                'url': bleach.clean(result.get('url', '')),
-                'source': bleach.clean(result.get('source', '')),
-                'language': bleach.clean(result.get('language', ''))
-            })
-        return jsonify(clean_results)
+        with timed('sanitize'):
+            clean_results = [clean_result(result) for result in results]
+        with timed('serialize'):
+            if Config.SERVER_TIMING_DEBUG and request.args.get('timing') == '1':
+                response = jsonify({'results': clean_results, 'timing': timings.as_dict()})
+            else:
+                response = jsonify(clean_results)
+        if Config.SERVER_TIMING_ENABLED:
+            response.headers['Server-Timing'] = timings.server_timing()
+        # Curseur de la page suivante, à renvoyer dans le paramètre 'page'
+        if report.next_cursor:
+            response.headers['X-Next-Page'] = report.next_cursor
+        # Signale les sources absentes d'une réponse partielle
+        if report.timed_out:
+            response.headers['X-Sources-Timed-Out'] = ','.join(report.timed_out)
+        if report.failed:
+            response.headers['X-Sources-Failed'] = ','.join(report.failed)
+        return response
     except Exception as e:
         # Ne pas logger l'exception complète qui pourrait contenir des données sensibles
         app.logger.error(f'Erreur pendant la recherche depuis {request.remote_addr}: {type(e).__name__}')
         return jsonify({"error": "Une erreur est survenue"}), 500
 
+@app.route('/search/stream')
+@limiter.limit("30 per minute")
+def search_stream():
+    """
+    Endpoint de recherche en flux (NDJSON)
+    
+    Émet une ligne JSON par source dès que ses résultats arrivent, une ligne de type
+    'update' pour les résultats déjà émis que ses doublons complètent, puis une ligne
+    finale de type 'done' indiquant les sources abandonnées ou en erreur, et le
+    curseur de la page suivante.
+    """
+    query = bleach.clean(request.args.get('q', ''))
+    app.logger.info(f'Recherche en flux depuis {request.remote_addr} - longueur: {len(query)}')
+    lang = bleach.clean(request.args.get('lang', ''))
+    remote_addr = request.remote_addr
+    try:
+        cursor = read_cursor()
+    except ValueError:
+        return jsonify({"error": "Page invalide"}), 400
+    
+    async def generate():
+        if not query or lang not in Config.SUPPORTED_LANGUAGES:
+            yield json.dumps({'type': 'done', 'timed_out': [], 'failed': [], 'next_cursor': None}) + '\n'
+            return
+        if cursor is None:
+            warmer.query_log.record(query, lang)
+        try:
+            async for event in search_engine.iter_search(query, lang, cursor):
+                if event['type'] == 'results':
+                    # Le score permet au navigateur d'insérer les résultats à leur place
+                    event['results'] = [
+                        {**clean_result(result), 'score': result.get('score', 0)}
+                        for result in event['results']
+                    ]
+                elif event['type'] == 'update':
+                    # Résultats déjà émis, complétés par les doublons d'une autre source
+                    event['results'] = [
+                        {**clean_result(result), 'score': result.get('score', 0),
+                         'replaces': clean_text(result['replaces'])}
+                        for result in event['results']
+                    ]
+                yield json.dumps(event) + '\n'
+        except Exception as e:
+            app.logger.error(f'Erreur pendant la recherche en flux depuis {remote_addr}: {type(e).__name__}')
+            yield json.dumps({'type': 'error', 'error': 'Une erreur est survenue'}) + '\n'
+    
+    return stream_response(generate(),
+                           mimetype='application/x-ndjson',
+                           headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics')
+@limiter.exempt
+@talisman(force_https=False)
+def metrics():
+    """Métriques Prometheus, agrégées entre les workers gunicorn"""
+    content, content_type = render_metrics()
+    return Response(content, content_type=content_type)
+
 @app.route('/favicon.ico')
 def favicon():
     """Endpoint pour le favicon"""
@@ -0,0 +1,205 @@
+"""
+Point d'entrée ASGI de Book Finder
+
+Sert l'application Flask sur la boucle d'événements d'un serveur ASGI (workers
+uvicorn, voir gunicorn_asgi_config.py) :
+
+    gunicorn -c gunicorn_asgi_config.py
+
+Contrairement aux workers synchrones, qui immobilisent un processus pendant toute
+l'attente des sources, un worker multiplexe des centaines de recherches sur une
+seule boucle. Les vues asynchrones (/search) et les flux (/search/stream) y sont
+exécutées directement, avec le pool de connexions et les caches du worker ; les
+vues synchrones, courtes (pages, métriques), s'exécutent sur la boucle sans la
+quitter.
+
+asgiref.wsgi.WsgiToAsgi ne convient pas : il exécute toutes les requêtes WSGI dans
+un même thread, l'une après l'autre.
+"""
+
+import asyncio
+import contextvars
+import inspect
+import io
+import sys
+from typing import Any, Callable, Dict
+
+from flask import Flask
+from flask.globals import request_ctx
+
+from app.app import app as flask_app, search_engine, warmer
+
+# Vrai pendant le traitement d'une requête sur la boucle du serveur
+_dispatching = contextvars.ContextVar('asgi_dispatching', default=False)
+
+def build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """Environnement WSGI d'une requête ASGI"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        # Les en-têtes répétés sont joints, comme le ferait un serveur WSGI
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+class AsgiApp:
+    """Adaptateur ASGI qui exécute les requêtes Flask sur la boucle du serveur"""
+    
+    def __init__(self, app: Flask):
+        self.app = app
+        self.search_engine = search_engine
+        self.http_client = search_engine.http_client
+        self.warmer = warmer
+        self._ensure_sync = app.ensure_sync
+        # Les vues asynchrones, y compris enveloppées (Flask-Limiter), sont attendues
+        # par l'adaptateur au lieu d'être exécutées sur une boucle temporaire
+        app.ensure_sync = self.ensure_sync
+    
+    def ensure_sync(self, func: Callable) -> Callable:
+        """Remplace Flask.ensure_sync : sur la boucle du serveur, les coroutines sont rendues telles quelles"""
+        if _dispatching.get() and inspect.iscoroutinefunction(func):
+            return func
+        return self._ensure_sync(func)
+    
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            # Rattache le client HTTP à la boucle du serveur (sans effet s'il l'est déjà)
+            self.http_client.attach(asyncio.get_running_loop())
+            await self._handle(scope, receive, send)
+        else:
+            raise ValueError(f"Type de connexion non pris en charge : {scope['type']}")
+    
+    async def _lifespan(self, receive: Callable, send: Callable):
+        """Démarrage et arrêt du worker"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.http_client.attach(asyncio.get_running_loop())
+                self.warmer.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def shutdown(self):
+        """Arrête le préchauffage et les recherches en arrière-plan, puis ferme le pool de connexions"""
+        await self.warmer.stop()
+        await self.search_engine.shutdown()
+        await self.http_client.aclose()
+    
+    async def _read_body(self, receive: Callable) -> bytes:
+        """Lit le corps de la requête, dans la limite de MAX_CONTENT_LENGTH"""
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if len(body) > self.app.config['MAX_CONTENT_LENGTH']:
+                # Werkzeug renverra 413 d'après Content-Length
+                break
+        return body
+    
+    async def _handle(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        """Traite une requête HTTP avec le cycle de vie d'une requête Flask"""
+        environ = build_environ(scope, await self._read_body(receive))
+        token = _dispatching.set(True)
+        ctx = self.app.request_context(environ)
+        ctx.push()
+        error = None
+        try:
+            try:
+                response = await self._full_dispatch_request()
+            except Exception as e:
+                error = e
+                response = self.app.handle_exception(e)
+            await self._send_response(scope, response, send)
+        finally:
+            ctx.pop(error)
+            _dispatching.reset(token)
+    
+    async def _full_dispatch_request(self):
+        """Équivalent de Flask.full_dispatch_request, qui attend les vues asynchrones"""
+        try:
+            rv = self.app.preprocess_request()
+            if rv is None:
+                rv = await self._dispatch_request()
+        except Exception as e:
+            rv = self.app.handle_user_exception(e)
+        return self.app.finalize_request(rv)
+    
+    async def _dispatch_request(self):
+        """Équivalent de Flask.dispatch_request, sur la boucle du serveur"""
+        req = request_ctx.request
+        if req.routing_exception is not None:
+            self.app.raise_routing_exception(req)
+        rule = req.url_rule
+        if getattr(rule, 'provide_automatic_options', False) and req.method == 'OPTIONS':
+            return self.app.make_default_options_response()
+        rv = self.app.view_functions[rule.endpoint](**req.view_args)
+        if inspect.isawaitable(rv):
+            rv = await rv
+        return rv
+    
+    @staticmethod
+    async def _send_response(scope: Dict[str, Any], response, send: Callable):
+        """
+        Envoie la réponse Flask au serveur
+        
+        Une réponse diffusée à partir d'un générateur asynchrone (async_body, voir
+        app.stream_response) est parcourue directement sur la boucle du serveur.
+        """
+        async_body = getattr(response, 'async_body', None)
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [(key.lower().encode('latin-1'), value.encode('latin-1'))
+                            for key, value in response.headers.items()],
+            })
+            if scope['method'] != 'HEAD':
+                if async_body is not None:
+                    async for chunk in async_body:
+                        if isinstance(chunk, str):
+                            chunk = chunk.encode()
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                else:
+                    for chunk in response.iter_encoded():
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Client déconnecté ou réponse terminée : libère les recherches en cours
+            if async_body is not None:
+                await async_body.aclose()
+            response.close()
+
+application = AsgiApp(flask_app)
@@ -3,14 +3,43 @@ Classe de base pour toutes les sources de livres
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union, Callable, Awaitable, Sequence, AsyncIterator
+import asyncio
+import logging
+import re
+import time
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from difflib import SequenceMatcher
+from rapidfuzz import fuzz
+from lxml import etree
+import lxml.html
+from lxml.html import soupparser
+
+from app.core.config import Config
+from app.core.http_client import get_http_client
+from app.core.cache import get_detail_cache, FRESH
+from app.core.metrics import observe_duration, observe_phase
+from app.core.outbound import OutboundScheduler, OutboundThrottled, Ticket, get_outbound_scheduler
+from app.core.scoring import normalize_text
+
+class DetailResults(list):
+    """
+    Résultats de BookSource.fetch_details
+    
+    complete vaut False si des pages de détail n'ont pas été lues (délai écoulé ou
+    requêtes refusées par le débit sortant) : la liste est alors tronquée.
+    """
+    
+    complete = True
 
 class BookSource(ABC):
     """Classe de base abstraite pour toutes les sources de livres"""
     
+    # Les sources paginées acceptent un numéro de page dans search_async
+    paginated = False
+    
     def __init__(self, name: str, base_url: str):
         """
         Initialise une source de livres
@@ -21,10 +50,15 @@ class BookSource(ABC):
         """
         self.name = name
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=len(Config.SOURCES),
+                              pool_maxsize=Config.HTTP_POOL_PER_HOST)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         
         # Mapping des codes de langue
         self.language_map = {
@@ -40,6 +74,37 @@ class BookSource(ABC):
             'ko': 'korean'
         }
     
+    @property
+    def key(self) -> str:
+        """Identifiant de la source tel qu'utilisé dans Config.SOURCES (nom du module)"""
+        return type(self).__module__.rsplit('.', 1)[-1]
+    
+    @property
+    def logger(self) -> logging.Logger:
+        """Logger de la source (app.sources.<nom>), partagé avec le module de l'adaptateur"""
+        return logging.getLogger(type(self).__module__)
+    
+    @property
+    def scheduler(self) -> OutboundScheduler:
+        """Ordonnanceur du débit sortant, par lequel passent toutes les requêtes de la source"""
+        return get_outbound_scheduler()
+    
+    async def throttle(self, url: str) -> Ticket:
+        """
+        Attend le créneau d'envoi d'une requête vers l'hôte de l'URL
+        
+        Le ticket obtenu est réglé avec la réponse (self.scheduler.settle) pour que
+        les 429/503 ralentissent l'hôte.
+        
+        Raises:
+            OutboundThrottled: Si aucun créneau n'est disponible dans Config.OUTBOUND_MAX_WAIT
+        """
+        start = time.perf_counter()
+        try:
+            return await self.scheduler.acquire(url)
+        finally:
+            observe_duration(self.key, 'throttle', time.perf_counter() - start)
+    
     @staticmethod
     def calculate_similarity(str1: str, str2: str) -> float:
         """
@@ -53,26 +118,80 @@ class BookSource(ABC):
             Score entre 0 et 1, où 1 signifie que les chaînes sont identiques
         """
         # Normalise les chaînes pour la comparaison
-        str1 = str1.lower().strip()
-        str2 = str2.lower().strip()
+        str1 = normalize_text(str1)
+        str2 = normalize_text(str2)
         
-        # Utilise SequenceMatcher pour calculer la similarité
-        return SequenceMatcher(None, str1, str2).ratio()
+        # Similarité d'Indel (équivalent de SequenceMatcher.ratio, calculé en C)
+        return fuzz.ratio(str1, str2) / 100
     
     @abstractmethod
-    def search(self, query: str, language: str = 'fr') -> List[Dict[str, Any]]:
+    async def search_async(self, query: str, language: str,
+                           session: aiohttp.ClientSession) -> List[Dict[str, Any]]:
         """
-        Recherche des livres
+        Recherche des livres de manière asynchrone
+        
+        Les sources paginées acceptent en plus un argument page (numéro de page à
+        partir de 0) et positionnent la variable de classe paginated.
         
         Args:
             query: Terme de recherche
             language: Code de langue (fr, en, etc.)
+            session: Session aiohttp du pool partagé, à utiliser pour toutes les requêtes
             
         Returns:
             Liste de résultats
+            
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: Si la requête de recherche échoue
         """
         pass
     
+    async def search_page(self, query: str, language: str, session: aiohttp.ClientSession,
+                          page: int = 0) -> List[Dict[str, Any]]:
+        """
+        Recherche une page de résultats
+        
+        Une source non paginée n'a qu'une page : les suivantes sont vides.
+        
+        Args:
+            query: Terme de recherche
+            language: Code de langue (fr, en, etc.)
+            session: Session aiohttp du pool partagé
+            page: Numéro de la page, à partir de 0
+            
+        Returns:
+            Liste de résultats de la page
+        """
+        if self.paginated:
+            return await self.search_async(query, language, session, page=page)
+        if page:
+            return []
+        return await self.search_async(query, language, session)
+    
+    def search(self, query: str, language: str = 'fr') -> List[Dict[str, Any]]:
+        """
+        Recherche des livres (interface synchrone autour de search_async)
+        
+        La recherche s'exécute sur la boucle du client HTTP partagé.
+        
+        Args:
+            query: Terme de recherche
+            language: Code de langue (fr, en, etc.)
+            
+        Returns:
+            Liste de résultats, vide en cas d'erreur
+        """
+        client = get_http_client()
+        
+        async def _run():
+            return await self.search_async(query, language, await client.get_session())
+        
+        try:
+            return client.run_sync(_run())
+        except Exception as e:
+            self.logger.warning("Erreur de recherche sur %s: %s", self.name, e)
+            return []
+    
     def get_language_code(self, language: str) -> str:
         """Retourne le code de langue approprié pour la source"""
         return self.language_map.get(language, 'english')
@@ -147,18 +266,280 @@ class BookSource(ABC):
             
         Raises:
             requests.RequestException: En cas d'erreur de requête
+            OutboundThrottled: Si aucun créneau d'envoi n'est disponible
         """
         try:
-            response = self.session.request(method, url, timeout=10, **kwargs)
+            ticket = self.scheduler.acquire_sync(url)
+            with observe_phase(self.key, 'network'):
+                response = self.session.request(method, url, timeout=10, **kwargs)
+            self.scheduler.settle(ticket, response.status_code, response.headers)
             response.raise_for_status()
             return response
-        except requests.RequestException as e:
-            print(f"Erreur lors de la requête vers {url}: {str(e)}")
+        except (requests.RequestException, OutboundThrottled) as e:
+            self.logger.debug("Erreur lors de la requête vers %s: %s", url, e)
+            raise
+    
+    async def fetch(self, session: aiohttp.ClientSession, url: str, method: str = 'get',
+                    as_bytes: bool = False, timeout: float = 10, **kwargs) -> Union[str, bytes]:
+        """
+        Effectue une requête HTTP asynchrone avec gestion des erreurs
+        
+        La requête attend son créneau auprès de l'ordonnanceur du débit sortant (throttle).
+        
+        Args:
+            session: Session aiohttp à utiliser
+            url: URL à requêter
+            method: Méthode HTTP (get, post)
+            as_bytes: Retourne le contenu brut plutôt que le texte décodé
+            timeout: Timeout total en secondes
+            **kwargs: Arguments supplémentaires pour la requête (params, headers, ssl...)
+            
+        Returns:
+            Contenu de la réponse
+            
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: En cas d'erreur de requête
+        """
+        headers = {**self.headers, **kwargs.pop('headers', {})}
+        try:
+            ticket = await self.throttle(url)
+            with observe_phase(self.key, 'network'):
+                async with session.request(method, url, headers=headers,
+                                           timeout=aiohttp.ClientTimeout(total=timeout),
+                                           **kwargs) as response:
+                    self.scheduler.settle(ticket, response.status, response.headers)
+                    response.raise_for_status()
+                    if as_bytes:
+                        return await response.read()
+                    return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.debug("Erreur lors de la requête vers %s: %s", url, str(e) or type(e).__name__)
             raise
     
-    def parse_html(self, content: str) -> BeautifulSoup:
-        """Parse le contenu HTML avec BeautifulSoup"""
-        return BeautifulSoup(content, 'lxml')
+    async def iter_xml(self, session: aiohttp.ClientSession, url: str, tags: Sequence[str],
+                       method: str = 'get', timeout: float = 10,
+                       **kwargs) -> AsyncIterator[etree._Element]:
+        """
+        Télécharge un document XML et produit ses éléments au fil de la réception
+        
+        Le flux de la réponse est transmis bloc par bloc à un analyseur incrémental :
+        l'analyse progresse pendant le téléchargement. Chaque élément produit est vidé,
+        avec ceux qui le précèdent, une fois traité par l'appelant ; la mémoire utilisée
+        ne dépend donc pas du nombre d'éléments du document.
+        
+        Args:
+            session: Session aiohttp à utiliser
+            url: URL à requêter
+            tags: Balises des éléments à produire (ex. '{http://www.loc.gov/zing/srw/}record')
+            method: Méthode HTTP (get, post)
+            timeout: Timeout total en secondes
+            **kwargs: Arguments supplémentaires pour la requête (params, headers, ssl...)
+            
+        Yields:
+            Éléments complets, dans l'ordre du document
+            
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: En cas d'erreur de requête
+        """
+        headers = {**self.headers, **kwargs.pop('headers', {})}
+        parser = etree.XMLPullParser(events=('end',), tag=tags, recover=True, resolve_entities=False)
+        network = parse = 0.0
+        try:
+            ticket = await self.throttle(url)
+            start = time.perf_counter()
+            async with session.request(method, url, headers=headers,
+                                       timeout=aiohttp.ClientTimeout(total=timeout),
+                                       **kwargs) as response:
+                self.scheduler.settle(ticket, response.status, response.headers)
+                response.raise_for_status()
+                chunks = response.content.iter_chunked(Config.HTTP_STREAM_CHUNK_SIZE)
+                while True:
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        chunk = None
+                    network += time.perf_counter() - start
+                    
+                    start = time.perf_counter()
+                    if chunk is None:
+                        parser.close()
+                    else:
+                        parser.feed(chunk)
+                    events = list(parser.read_events())
+                    parse += time.perf_counter() - start
+                    
+                    for _, element in events:
+                        yield element
+                        # Libère l'élément traité et ceux qui le précèdent
+                        element.clear(keep_tail=True)
+                        parent = element.getparent()
+                        while parent is not None and element.getprevious() is not None:
+                            del parent[0]
+                    if chunk is None:
+                        break
+                    start = time.perf_counter()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.debug("Erreur lors de la requête vers %s: %s", url, str(e) or type(e).__name__)
+            raise
+        finally:
+            observe_duration(self.key, 'network', network)
+            observe_duration(self.key, 'parse', parse)
+    
+    async def fetch_details(self, items: Sequence[Any],
+                            fetch_one: Callable[[Any], Awaitable[Optional[Dict[str, Any]]]]) -> DetailResults:
+        """
+        Récupère les pages de détail en parallèle, avec un nombre borné de requêtes simultanées
+        
+        La limite de parallélisme et le délai global viennent de
+        Config.DETAIL_FETCH_CONCURRENCY et Config.DETAIL_FETCH_DEADLINE.
+        Les résultats sont retournés dans l'ordre d'origine des éléments ; la collecte
+        s'arrête une fois le délai écoulé, et les requêtes restantes sont annulées. Un
+        délai écoulé ou une page refusée par le débit sortant (OutboundThrottled) rend
+        la liste incomplète (complete à False).
+        
+        Args:
+            items: Éléments issus de la page de recherche (URL, dictionnaire partiel...)
+            fetch_one: Coroutine qui récupère le détail d'un élément, ou None pour l'ignorer
+            
+        Returns:
+            Liste des résultats retenus, dans l'ordre des éléments
+        """
+        limit = Config.DETAIL_FETCH_CONCURRENCY.get(self.key, Config.DETAIL_FETCH_CONCURRENCY_DEFAULT)
+        semaphore = asyncio.Semaphore(limit)
+        
+        async def _bounded(item):
+            async with semaphore:
+                return await fetch_one(item)
+        
+        tasks = [asyncio.create_task(_bounded(item)) for item in items]
+        results = DetailResults()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Config.DETAIL_FETCH_DEADLINE
+        try:
+            # Consomme les tâches dans l'ordre d'origine pour conserver le classement de la source
+            for task in tasks:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.logger.debug("Délai dépassé pour les pages de détail de %s", self.name)
+                    results.complete = False
+                    break
+                try:
+                    result = await asyncio.wait_for(task, remaining)
+                except asyncio.TimeoutError:
+                    self.logger.debug("Délai dépassé pour les pages de détail de %s", self.name)
+                    results.complete = False
+                    break
+                except OutboundThrottled as e:
+                    self.logger.debug("Page de détail différée: %s", e)
+                    results.complete = False
+                    continue
+                except Exception as e:
+                    self.logger.debug("Erreur lors de l'extraction des informations: %s", e)
+                    continue
+                if result is not None:
+                    results.append(result)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        return results
+    
+    async def fetch_metadata(self, session: aiohttp.ClientSession, url: str,
+                             extract: Callable[[str], Optional[Dict[str, Any]]],
+                             **kwargs) -> Optional[Dict[str, Any]]:
+        """
+        Retourne les métadonnées d'une page de détail, en passant par le cache des détails
+        
+        Args:
+            session: Session HTTP partagée
+            url: URL de la page de détail, utilisée comme clé de cache
+            extract: Fonction qui extrait les métadonnées du HTML (None si la page est inexploitable)
+            **kwargs: Arguments supplémentaires pour fetch
+            
+        Returns:
+            Métadonnées extraites, ou None
+        """
+        cache = get_detail_cache()
+        metadata, state = cache.get(url)
+        if state == FRESH:
+            return metadata
+        
+        html = await self.fetch(session, url, **kwargs)
+        metadata = extract(html)
+        cache.set(url, metadata, Config.DETAIL_CACHE_TTL)
+        return metadata
+    
+    def parse_html(self, content: Union[str, bytes], features: str = 'lxml') -> BeautifulSoup:
+        """Parse le contenu HTML (ou XML) avec BeautifulSoup, en mesurant la durée d'analyse"""
+        with observe_phase(self.key, 'parse'):
+            return BeautifulSoup(content, features)
+    
+    def select_nodes(self, content: str, selector: etree.XPath, marker: str,
+                     end_tag: Optional[str] = None) -> List[lxml.html.HtmlElement]:
+        """
+        Analyse une page avec lxml et retourne les éléments désignés par un XPath compilé
+        
+        Si end_tag est fourni et que le marqueur figure dans la page, le fragment compris
+        entre le marqueur et la balise end_tag qui ferme la partie utile (les éléments
+        imbriqués du même nom sont sautés) est analysé en premier. S'il n'y a pas de
+        fragment ou qu'il ne donne rien, toute la page est analysée avec lxml, puis avec
+        html5lib, aussi tolérant qu'un navigateur pour le HTML mal formé : le marqueur ne
+        sert qu'à trouver le fragment, une variante d'écriture de la page (guillemets,
+        espaces) ne fait donc pas perdre les résultats.
+        
+        Args:
+            content: Page HTML
+            selector: XPath compilé des éléments recherchés
+            marker: Texte propre à la partie utile de la page (ex. 'class="bibrec"')
+            end_tag: Balise fermant cette partie (ex. '</table>')
+            
+        Returns:
+            Éléments trouvés, liste vide si la page n'en contient pas
+        """
+        with observe_phase(self.key, 'parse'):
+            attempts = []
+            if end_tag and marker in content:
+                start = content.rfind('<', 0, content.find(marker))
+                end = self._closing_tag(content, start, end_tag) if start >= 0 else -1
+                if end >= 0:
+                    attempts.append((lxml.html.fromstring, content[start:end]))
+            attempts.append((lxml.html.fromstring, content))
+            attempts.append((lambda markup: soupparser.fromstring(markup, features='html5lib'), content))
+            
+            for parse, markup in attempts:
+                try:
+                    nodes = selector(parse(markup))
+                except (etree.ParserError, ValueError) as e:
+                    self.logger.debug("Analyse impossible, essai suivant: %s", e)
+                    continue
+                if nodes:
+                    return nodes
+            return []
+    
+    @staticmethod
+    def _closing_tag(content: str, start: int, end_tag: str) -> int:
+        """
+        Position de fin de la balise end_tag qui ferme l'élément ouvert à start
+        (ou l'élément qui le contient), -1 si elle manque
+        """
+        name = end_tag.strip('</> ')
+        tags = re.compile(rf'<(/?){re.escape(name)}\b[^>]*>', re.IGNORECASE)
+        # Le fragment commence dans un élément end_tag ouvert, ou par son ouverture
+        depth = 0 if tags.match(content, start) else 1
+        for tag in tags.finditer(content, start):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                return tag.end()
+        return -1
+    
+    @staticmethod
+    def node_text(node: Optional[lxml.html.HtmlElement]) -> str:
+        """Texte d'un élément lxml, comme get_text(strip=True) de BeautifulSoup"""
+        if node is None:
+            return ''
+        return ''.join(text.strip() for text in node.itertext())
     
     def extract_text(self, element: BeautifulSoup) -> str:
         """Extrait le texte d'un élément BeautifulSoup de manière sécurisée"""
@@ -0,0 +1,227 @@
+"""
+Cache des résultats de recherche à deux niveaux
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional, Tuple
+
+from app.core.config import Config
+from app.core.metrics import CACHE_REQUESTS
+from app.core.storage import SharedStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+
+def normalize_query(query: str) -> str:
+    """
+    Normalise une requête pour construire une clé de cache
+    
+    Applique la normalisation Unicode NFKC, ignore la casse et réduit les espaces,
+    afin que "Les Misérables" et "  les  misérables" partagent la même entrée.
+    """
+    query = unicodedata.normalize('NFKC', query).casefold()
+    return re.sub(r'\s+', ' ', query).strip()
+
+def make_cache_key(*parts: str) -> str:
+    """Construit une clé de cache à partir de ses composantes, la requête en dernier"""
+    return '|'.join(parts[:-1] + (normalize_query(parts[-1]),))
+
+class CacheEntry(NamedTuple):
+    """Entrée de cache : la valeur reste fraîche jusqu'à fresh_until, servable jusqu'à stale_until"""
+    value: Any
+    fresh_until: float
+    stale_until: float
+
+class LRUCache:
+    """Cache en mémoire borné, avec éviction de l'entrée la moins récemment utilisée"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Retourne l'entrée si elle est encore servable"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.stale_until <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+    
+    def set(self, key: str, entry: CacheEntry):
+        """Ajoute ou remplace une entrée, en évinçant les plus anciennes si nécessaire"""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class ResultCache:
+    """
+    Cache à deux niveaux : LRU en mémoire du worker, puis stockage SQLite partagé
+    
+    Une entrée est fraîche pendant son TTL, puis reste servable pendant
+    stale_ttl secondes : l'appelant la renvoie immédiatement et la rafraîchit
+    en arrière-plan (stale-while-revalidate).
+    """
+    
+    def __init__(self, namespace: str, max_entries: int = None, stale_ttl: float = None,
+                 storage: Optional[SharedStorage] = None, storage_max_entries: int = None):
+        """
+        Args:
+            namespace: Espace de noms dans le stockage partagé
+            max_entries: Taille du cache en mémoire
+            stale_ttl: Durée pendant laquelle une entrée expirée reste servable
+            storage: Stockage partagé (par défaut celui de Config.SHARED_STORAGE_URI)
+            storage_max_entries: Nombre d'entrées conservées dans le stockage partagé
+        """
+        self.namespace = namespace
+        self.stale_ttl = Config.CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+        self.memory = LRUCache(max_entries or Config.CACHE_MEMORY_ENTRIES)
+        self.storage = storage or get_storage()
+        self.storage_max_entries = storage_max_entries or Config.CACHE_STORAGE_MAX_ENTRIES
+        self.stats = {'memory_hits': 0, 'storage_hits': 0, 'stale_hits': 0, 'misses': 0, 'errors': 0}
+        self._writes = 0
+    
+    def get(self, key: str) -> Tuple[Any, str]:
+        """
+        Lit une entrée dans le cache
+        
+        Returns:
+            Tuple (valeur, état) où l'état vaut FRESH, STALE ou MISS
+        """
+        entry, state = self.get_entry(key)
+        return (entry.value if entry else None), state
+    
+    def get_entry(self, key: str) -> Tuple[Optional[CacheEntry], str]:
+        """
+        Lit une entrée dans le cache, avec ses dates d'expiration
+        
+        Returns:
+            Tuple (entrée, état) où l'état vaut FRESH, STALE ou MISS
+        """
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None and entry.fresh_until <= now:
+            # Un autre worker a peut-être déjà rafraîchi l'entrée
+            shared = self._get_from_storage(key)
+            if shared is not None and shared.fresh_until > entry.fresh_until:
+                entry = shared
+                self.memory.set(key, entry)
+        if entry is not None:
+            self.stats['memory_hits'] += 1
+            CACHE_REQUESTS.labels(self.namespace, 'memory').inc()
+        else:
+            entry = self._get_from_storage(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                CACHE_REQUESTS.labels(self.namespace, 'miss').inc()
+                return None, MISS
+            self.stats['storage_hits'] += 1
+            CACHE_REQUESTS.labels(self.namespace, 'storage').inc()
+            self.memory.set(key, entry)
+        
+        if entry.fresh_until > now:
+            return entry, FRESH
+        self.stats['stale_hits'] += 1
+        CACHE_REQUESTS.labels(self.namespace, 'stale').inc()
+        return entry, STALE
+    
+    def peek_fresh(self, key: str) -> Optional[Any]:
+        """
+        Lit une entrée fraîche du stockage partagé, sans la compter dans les statistiques
+        
+        Sert à attendre une valeur qu'un autre worker est en train de calculer.
+        """
+        entry = self._get_from_storage(key)
+        if entry is None or entry.fresh_until <= time.time():
+            return None
+        self.memory.set(key, entry)
+        return entry.value
+    
+    def _get_from_storage(self, key: str) -> Optional[CacheEntry]:
+        """Lit une entrée dans le stockage partagé"""
+        try:
+            row = self.storage.get(self.namespace, key)
+            if row is None:
+                return None
+            payload = json.loads(row[0])
+            return CacheEntry(payload['value'], payload['fresh_until'], row[2])
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning("Erreur de lecture du cache partagé: %s", e)
+            return None
+    
+    def set(self, key: str, value: Any, ttl: float, stale_ttl: Optional[float] = None):
+        """
+        Enregistre une valeur dans les deux niveaux du cache
+        
+        Args:
+            key: Clé de cache
+            value: Valeur sérialisable en JSON
+            ttl: Durée de fraîcheur en secondes
+            stale_ttl: Durée de service après expiration (par défaut celle du cache)
+        """
+        now = time.time()
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        entry = CacheEntry(value, now + ttl, now + ttl + stale_ttl)
+        self.memory.set(key, entry)
+        try:
+            payload = json.dumps({'value': value, 'fresh_until': entry.fresh_until})
+            self.storage.set(self.namespace, key, payload, entry.stale_until, stored_at=now)
+            self._writes += 1
+            if self._writes % Config.CACHE_PRUNE_INTERVAL == 0:
+                self.storage.prune(self.namespace, self.storage_max_entries)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning("Erreur d'écriture du cache partagé: %s", e)
+    
+    def hit_ratio(self) -> float:
+        """Proportion de lectures servies par le cache"""
+        hits = self.stats['memory_hits'] + self.stats['storage_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+    
+    def clear(self):
+        """Vide les deux niveaux du cache"""
+        self.memory.clear()
+        self.storage.clear(self.namespace)
+
+_detail_cache: Optional[ResultCache] = None
+_detail_cache_lock = threading.Lock()
+
+def get_detail_cache() -> ResultCache:
+    """
+    Retourne le cache des métadonnées de pages de détail, partagé par toutes les sources
+
+    Les fiches des livres ne changent pratiquement jamais : on y conserve les
+    métadonnées extraites (et non le HTML), avec une longue durée de vie.
+    """
+    global _detail_cache
+    with _detail_cache_lock:
+        if _detail_cache is None:
+            _detail_cache = ResultCache('details',
+                                        max_entries=Config.DETAIL_CACHE_MEMORY_ENTRIES,
+                                        stale_ttl=0,
+                                        storage_max_entries=Config.DETAIL_CACHE_STORAGE_MAX_ENTRIES)
+        return _detail_cache
@@ -2,6 +2,7 @@
 Configuration de l'application
 """
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -62,7 +63,9 @@ class Config:
     
     # Limites de taux par défaut
     RATELIMIT_DEFAULT = "200 per day"
-    RATELIMIT_STORAGE_URL = "memory://"
+    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'shared://')  # Compteurs dans le stockage partagé (voir app.core.limiter_storage)
+    RATELIMIT_STORAGE_MAX_ENTRIES = 100000  # Compteurs conservés dans le stockage partagé
+    RATELIMIT_PRUNE_INTERVAL = 1000  # Nettoyage des compteurs expirés toutes les N incrémentations
     
     # Configuration SSL/TLS
     if ENV == 'development':
@@ -77,8 +80,129 @@ class Config:
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif'}
     
     # Configuration de la recherche
-    MAX_SEARCH_RESULTS = 10  # Nombre maximum de résultats par source
+    MAX_SEARCH_RESULTS = 10  # Nombre maximum de résultats par source, et par page de réponse
     SEARCH_TIMEOUT = 10  # Timeout en secondes pour les requêtes
+    SEARCH_DEADLINE = 4.0  # Délai global d'une recherche : les sources plus lentes sont abandonnées
+    SEARCH_MAX_PAGES = 10  # Nombre maximum de pages parcourues par source
+    SEARCH_PREFETCH_NEXT_PAGE = os.getenv('SEARCH_PREFETCH_NEXT_PAGE', 'true').lower() == 'true'  # Prépare la page suivante en arrière-plan
+    SEARCH_PREFETCH_MAX_IN_FLIGHT = 2  # Pages préparées simultanément par worker ; au-delà, elles ne le sont pas
+    SINGLEFLIGHT_LEASE_TTL = SEARCH_DEADLINE + 1.0  # Durée du bail d'une recherche menée pour tous les workers
+    SINGLEFLIGHT_POLL_INTERVAL = 0.05  # Intervalle de lecture du cache partagé en attendant un autre worker
+    SINGLEFLIGHT_RESULT_TTL = 5.0  # Durée de publication d'un résultat pour les workers qui l'attendaient
+    SINGLEFLIGHT_PRUNE_INTERVAL = 500  # Nettoyage des baux et résultats expirés toutes les N publications
+    SINGLEFLIGHT_MAX_ENTRIES = 10000  # Baux et résultats publiés conservés dans le stockage partagé
+    SOURCE_TIMEOUTS = {  # Budget de chaque source, en secondes
+        'gallica': 3.5,
+        'libgen': 3.0,
+        'gutenberg': 4.0,
+        'openlibrary': 4.0
+    }
+    
+    # Récupération parallèle des pages de détail (Gutenberg, Open Library)
+    DETAIL_FETCH_CONCURRENCY_DEFAULT = 4  # Requêtes simultanées par source
+    DETAIL_FETCH_CONCURRENCY = {
+        'gutenberg': 8,
+        'openlibrary': 6
+    }
+    DETAIL_FETCH_DEADLINE = 3  # Délai global en secondes pour toutes les pages de détail
+    
+    # Pool de connexions HTTP partagé (un par worker)
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 100))  # Connexions simultanées au total
+    HTTP_POOL_PER_HOST = int(os.getenv('HTTP_POOL_PER_HOST', 10))  # Connexions simultanées par hôte
+    HTTP_KEEPALIVE_TIMEOUT = 30  # Durée de conservation des connexions inactives (secondes)
+    HTTP_DNS_CACHE_TTL = 300  # Durée du cache DNS (secondes)
+    HTTP_STREAM_CHUNK_SIZE = 16 * 1024  # Taille des blocs lus lors de l'analyse XML au fil de l'eau
+    
+    # Stockage partagé entre les workers (SQLite en mémoire dans /dev/shm si disponible)
+    SHARED_STORAGE_PATH = os.getenv('SHARED_STORAGE_PATH', os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+        'book-finder.sqlite3'
+    ))
+    SHARED_STORAGE_URI = os.getenv('SHARED_STORAGE_URI', f'sqlite://{SHARED_STORAGE_PATH}')  # sqlite:///chemin, ou memory:// pour un seul worker
+    SHARED_STORAGE_BUSY_TIMEOUT = 5.0  # Attente maximale du verrou d'écriture SQLite (secondes)
+    SHARED_STORAGE_LOOP_BUSY_TIMEOUT = float(os.getenv('SHARED_STORAGE_LOOP_BUSY_TIMEOUT', 0.05))  # Même attente sur une boucle d'événements, qu'elle bloque entièrement
+    
+    # Cache des résultats de recherche
+    CACHE_MEMORY_ENTRIES = 1024  # Entrées conservées en mémoire par worker
+    CACHE_STORAGE_MAX_ENTRIES = 50000  # Entrées conservées dans le stockage partagé
+    CACHE_PRUNE_INTERVAL = 500  # Nettoyage du stockage toutes les N écritures
+    CACHE_STALE_TTL = 6 * 3600  # Durée pendant laquelle un résultat expiré est servi pendant son rafraîchissement
+    CACHE_TTL_DEFAULT = 3600
+    CACHE_TTL = {  # Durée de fraîcheur des résultats par source (secondes)
+        'gallica': 24 * 3600,
+        'libgen': 12 * 3600,
+        'gutenberg': 3 * 24 * 3600,
+        'openlibrary': 24 * 3600
+    }
+    CACHE_NEGATIVE_TTL = 300  # Durée de cache d'une source sans résultat
+    CACHE_FAILURE_TTL = 60  # Durée pendant laquelle une source en erreur n'est pas réinterrogée
+    
+    # Cache des métadonnées des pages de détail (titre, auteur, langue par URL de livre)
+    DETAIL_CACHE_TTL = 30 * 24 * 3600
+    DETAIL_CACHE_MEMORY_ENTRIES = 10000
+    DETAIL_CACHE_STORAGE_MAX_ENTRIES = 200000
+    
+    # Suivi de l'état des sources (disjoncteur partagé entre les workers)
+    HEALTH_WINDOW = 300  # Fenêtre glissante des mesures (secondes)
+    HEALTH_MAX_SAMPLES = 50  # Mesures conservées par source
+    HEALTH_MIN_SAMPLES = 10  # Mesures nécessaires avant de juger un taux d'erreur
+    HEALTH_FAILURE_THRESHOLD = 5  # Échecs consécutifs avant l'ouverture du circuit
+    HEALTH_ERROR_RATE = 0.5  # Taux d'erreur provoquant l'ouverture du circuit
+    HEALTH_OPEN_COOLDOWN = 30  # Délai avant une requête de test (secondes)
+    HEALTH_PROBE_TIMEOUT = 10  # Durée de réservation de la requête de test (secondes)
+    HEALTH_DEGRADED_ERROR_RATE = 0.25  # Taux d'erreur à partir duquel une source est dégradée
+    HEALTH_DEGRADED_BUDGET_FACTOR = 0.5  # Part du budget accordée à une source dégradée
+    
+    # Débit sortant par hôte (ordonnanceur partagé entre les workers)
+    OUTBOUND_RATE_LIMITS = {  # Requêtes par seconde et rafale autorisées par hôte (None : pas de limite)
+        'gallica.bnf.fr': (5.0, 10),
+        'www.gutenberg.org': (10.0, 20),
+        'openlibrary.org': (5.0, 10),
+        'libgen.is': (2.0, 4),
+        'libgen.rs': (2.0, 4),
+        'libgen.st': (2.0, 4)
+    }
+    OUTBOUND_RATE_DEFAULT = (5.0, 10)  # Débit des hôtes absents de OUTBOUND_RATE_LIMITS
+    OUTBOUND_MAX_WAIT = 2.0  # Attente maximale d'un créneau ; au-delà, la requête est abandonnée
+    OUTBOUND_BACKOFF_BASE = 1.0  # Pause après un premier 429/503 sans Retry-After, doublée à chaque récidive
+    OUTBOUND_BACKOFF_MAX = 60.0  # Pause maximale, Retry-After compris (secondes)
+    OUTBOUND_MIN_RATE_FACTOR = 0.125  # Réduction maximale du débit après des 429/503 (divisé par 2 à chaque fois)
+    OUTBOUND_RECOVERY_STEP = 0.125  # Part du débit regagnée à chaque réponse réussie
+    OUTBOUND_STATE_TTL = 600  # Conservation de l'état d'un hôte inactif (secondes)
+    
+    # Préchauffage des caches à partir des requêtes les plus fréquentes
+    WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() == 'true'  # Préchauffage au démarrage des workers, puis périodique
+    WARMUP_TOP_QUERIES = int(os.getenv('WARMUP_TOP_QUERIES', 100))  # Requêtes rejouées à chaque préchauffage
+    WARMUP_MIN_COUNT = 2  # Occurrences nécessaires pour qu'une requête soit rejouée
+    WARMUP_INTERVAL = 3600  # Un seul préchauffage par intervalle, tous workers confondus (0 : au démarrage seulement)
+    WARMUP_STARTUP_DELAY = 5  # Délai avant le premier préchauffage d'un worker (secondes)
+    WARMUP_MIN_HEADROOM = 0.5  # Part de la rafale de chaque source qui doit être libre avant de rejouer une requête
+    WARMUP_POLL_INTERVAL = 0.25  # Intervalle de vérification du débit sortant disponible (secondes)
+    WARMUP_HISTORY_TTL = 7 * 24 * 3600  # Fenêtre de la table de fréquence des requêtes (secondes)
+    WARMUP_HISTORY_MAX_ENTRIES = 10000  # Requêtes distinctes conservées dans la table de fréquence
+    WARMUP_HISTORY_PRUNE_INTERVAL = 500  # Nettoyage de la table toutes les N requêtes enregistrées
+    WARMUP_ACCESS_LOG = os.getenv('WARMUP_ACCESS_LOG', '/var/log/book-finder/access.log')  # Journal d'accès gunicorn, lu s'il existe
+    WARMUP_ACCESS_LOG_MAX_BYTES = 16 * 1024 * 1024  # Lecture limitée à la fin du journal
+    
+    # Miroirs Library Genesis, interrogés du plus rapide au plus lent
+    LIBGEN_MIRRORS = [
+        mirror.strip().rstrip('/')
+        for mirror in os.getenv('LIBGEN_MIRRORS',
+                                'https://libgen.is,https://libgen.rs,https://libgen.st').split(',')
+        if mirror.strip()
+    ]
+    LIBGEN_PROBE_INTERVAL = 300  # Intervalle entre deux mesures de latence des miroirs (secondes)
+    LIBGEN_PROBE_TIMEOUT = 5  # Délai maximum d'une mesure de latence (secondes)
+    LIBGEN_HEDGE_DELAY = 1.0  # Délai avant d'interroger un second miroir, faute de mesures suffisantes
+    LIBGEN_HEDGE_MIN_DELAY = 0.3  # Bornes du délai calculé à partir de la latence p95 du miroir
+    LIBGEN_HEDGE_MAX_DELAY = 2.0
+    
+    # Journalisation
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # Les traces détaillées des sources sont au niveau DEBUG
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))  # Part des traces INFO/DEBUG conservées
+    LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+    SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() == 'true'  # En-tête Server-Timing sur /search
+    SERVER_TIMING_DEBUG = ENV == 'development'  # Autorise le détail des durées dans la réponse (?timing=1)
     
     # Configuration des traductions
     TRANSLATIONS = {
@@ -0,0 +1,144 @@
+"""
+Fusion des résultats en double entre les sources
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+# Mots ignorés dans les empreintes de titre (articles et liaisons)
+STOPWORDS = {
+    'le', 'la', 'les', 'l', 'un', 'une', 'des', 'de', 'du', 'd', 'et', 'a', 'au', 'aux',
+    'the', 'an', 'of', 'and',
+    'el', 'los', 'las', 'y', 'der', 'die', 'das', 'und', 'il', 'lo', 'gli', 'e',
+}
+
+# Auteurs qui ne permettent pas d'identifier une œuvre
+UNKNOWN_AUTHORS = {'', 'auteur inconnu', 'unknown', 'anonymous', 'anonyme'}
+
+MD5_PATTERN = re.compile(r'md5=([0-9a-f]{32})', re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def fold(text: Optional[str]) -> str:
+    """Supprime les accents et la casse d'une chaîne"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+
+def token_key(text: Optional[str], stopwords=frozenset()) -> str:
+    """
+    Clé indépendante de l'ordre des mots : mots distincts, triés
+    
+    Les mots vides sont ignorés, sauf si le texte n'est composé que de mots vides.
+    """
+    tokens = set(TOKEN_PATTERN.findall(fold(text)))
+    meaningful = tokens - stopwords
+    return ' '.join(sorted(meaningful or tokens))
+
+def fingerprints(result: Dict[str, Any]) -> List[str]:
+    """
+    Empreintes d'un résultat : deux résultats qui partagent une empreinte sont la même œuvre
+    
+    - 'isbn:' et 'md5:' lorsque la source fournit ces identifiants (le md5 de LibGen
+      est lu dans ses URL) ;
+    - 'work:' formée des mots du titre et de l'auteur, triés, et du numéro de tome.
+      Elle n'est calculée que si l'auteur est connu, pour ne pas confondre deux
+      œuvres différentes de même titre.
+    """
+    keys = []
+    if result.get('isbn'):
+        keys.append('isbn:' + re.sub(r'[^0-9x]', '', str(result['isbn']).lower()))
+    md5 = result.get('md5')
+    if not md5:
+        for field in ('url', 'download_url'):
+            match = MD5_PATTERN.search(result.get(field) or '')
+            if match:
+                md5 = match.group(1)
+                break
+    if md5:
+        keys.append('md5:' + md5.lower())
+    
+    author = result.get('author')
+    if fold(author).strip() not in UNKNOWN_AUTHORS:
+        title = token_key(result.get('title'), STOPWORDS)
+        if title:
+            key = f"work:{title}|{token_key(author)}"
+            # Numéro de tome tel que rangé par format_result (le titre n'en porte plus trace)
+            volume = (result.get('series') or {}).get('volume')
+            if volume:
+                key += f"|{volume}"
+            keys.append(key)
+    return keys
+
+def link(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Liens d'un résultat vers sa source"""
+    return {
+        'source': result.get('source'),
+        'url': result.get('url'),
+        'read_url': result.get('read_url'),
+        'download_url': result.get('download_url'),
+    }
+
+class ResultMerger:
+    """
+    Regroupe les résultats qui désignent la même œuvre
+    
+    Chaque résultat est rattaché au premier résultat déjà vu qui partage l'une de ses
+    empreintes, grâce à un index empreinte → entrée : le coût est linéaire en nombre
+    de résultats, sans comparaison deux à deux. Le résultat de meilleur score d'un
+    groupe en est l'entrée principale, quel que soit l'ordre des résultats (à score
+    égal, le premier vu) ; ses doublons y ajoutent leurs liens dans 'links' et
+    complètent read_url et download_url s'ils manquent.
+    
+    Les entrées d'un appel précédent à add qu'un doublon a modifiées sont
+    listées dans updated, jusqu'à l'appel suivant.
+    """
+    
+    def __init__(self):
+        self.results: List[Dict[str, Any]] = []
+        self.updated: List[Dict[str, Any]] = []
+        self._index: Dict[str, Dict[str, Any]] = {}
+    
+    def add(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Ajoute des résultats
+        
+        Returns:
+            Les nouvelles entrées, sans les doublons de résultats déjà ajoutés
+        """
+        added = []
+        self.updated = []
+        touched = set()  # id() des entrées déjà listées dans added ou updated
+        for result in results:
+            keys = fingerprints(result)
+            entry = next((self._index[key] for key in keys if key in self._index), None)
+            if entry is None:
+                entry = {**result, 'links': [link(result)]}
+                self.results.append(entry)
+                added.append(entry)
+                touched.add(id(entry))
+            else:
+                self._absorb(entry, result)
+                if id(entry) not in touched:
+                    touched.add(id(entry))
+                    self.updated.append(entry)
+            for key in keys:
+                self._index.setdefault(key, entry)
+        return added
+    
+    @staticmethod
+    def _absorb(entry: Dict[str, Any], duplicate: Dict[str, Any]):
+        """Ajoute les liens d'un doublon à l'entrée principale"""
+        entry['links'].append(link(duplicate))
+        if duplicate.get('score', 0) > entry.get('score', 0):
+            # Le doublon devient l'entrée principale ; l'ancienne complète ses liens
+            previous = dict(entry)
+            entry.clear()
+            entry.update(duplicate, links=previous['links'])
+            duplicate = previous
+        for field in ('read_url', 'download_url'):
+            if not entry.get(field) and duplicate.get(field):
+                entry[field] = duplicate[field]
+
+def merge_duplicates(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Regroupe les doublons d'une liste de résultats (voir ResultMerger)"""
+    return ResultMerger().add(results)
@@ -0,0 +1,180 @@
+"""
+Suivi de l'état de santé des sources (disjoncteur)
+"""
+
+import json
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import Config
+from app.core.storage import SharedStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class HealthTracker:
+    """
+    Disjoncteur et mesures glissantes (erreurs, latence) pour chaque source
+    
+    L'état est conservé dans le stockage partagé, donc commun à tous les workers :
+    une source en panne détectée par un worker est écartée par tous les autres.
+    
+    - fermé : la source est interrogée normalement ;
+    - ouvert : après HEALTH_FAILURE_THRESHOLD échecs consécutifs, ou un taux d'erreur
+      supérieur à HEALTH_ERROR_RATE, la source n'est plus interrogée ;
+    - semi-ouvert : après HEALTH_OPEN_COOLDOWN secondes, une seule requête de test
+      est autorisée ; son succès referme le circuit, son échec le rouvre.
+    """
+    
+    NAMESPACE = 'health'
+    
+    def __init__(self, storage: Optional[SharedStorage] = None):
+        self.storage = storage or get_storage()
+    
+    @staticmethod
+    def _empty_state() -> Dict[str, Any]:
+        return {'state': CLOSED, 'failures': 0, 'opened_at': 0, 'probe_until': 0, 'samples': []}
+    
+    def _load(self, value: Optional[str]) -> Dict[str, Any]:
+        return json.loads(value) if value else self._empty_state()
+    
+    def _update(self, source_name: str, func) -> Dict[str, Any]:
+        """Applique func à l'état de la source dans une transaction partagée"""
+        def apply(value):
+            return json.dumps(func(self._load(value)))
+        expires_at = time.time() + max(Config.HEALTH_WINDOW, Config.HEALTH_OPEN_COOLDOWN) * 10
+        return json.loads(self.storage.update(self.NAMESPACE, source_name, apply, expires_at))
+    
+    def get_state(self, source_name: str) -> Dict[str, Any]:
+        """Retourne l'état courant d'une source"""
+        row = self.storage.get(self.NAMESPACE, source_name)
+        return self._load(row[0] if row else None)
+    
+    def allow(self, source_name: str) -> bool:
+        """
+        Indique si la source peut être interrogée
+        
+        Lorsque le délai d'ouverture est écoulé, un seul appelant (tous workers
+        confondus) obtient l'autorisation d'envoyer la requête de test.
+        """
+        state = self.get_state(source_name)
+        now = time.time()
+        if state['state'] == CLOSED:
+            return True
+        if state['state'] == OPEN and now < state['opened_at'] + Config.HEALTH_OPEN_COOLDOWN:
+            return False
+        if state['state'] == HALF_OPEN and now < state['probe_until']:
+            return False
+        
+        granted = []
+        
+        def take_probe(state):
+            # Revérifie dans la transaction : un autre worker a pu prendre la requête de test
+            probe_due = (
+                (state['state'] == OPEN and now >= state['opened_at'] + Config.HEALTH_OPEN_COOLDOWN)
+                or (state['state'] == HALF_OPEN and now >= state['probe_until'])
+            )
+            if probe_due:
+                state['state'] = HALF_OPEN
+                state['probe_until'] = now + Config.HEALTH_PROBE_TIMEOUT
+                granted.append(True)
+            return state
+        
+        try:
+            self._update(source_name, take_probe)
+        except Exception as e:
+            # Stockage occupé : la requête de test attendra le prochain appel
+            logger.warning("État de %s indisponible: %s", source_name, e)
+            return False
+        if granted:
+            logger.info("Requête de test autorisée pour %s", source_name)
+        return bool(granted)
+    
+    def record(self, source_name: str, ok: bool, latency: float):
+        """
+        Enregistre le résultat d'un appel à une source
+        
+        Args:
+            source_name: Nom de la source
+            ok: Succès de l'appel (les délais dépassés comptent comme des échecs)
+            latency: Durée de l'appel en secondes
+        """
+        now = time.time()
+        
+        def apply(state):
+            samples = [s for s in state['samples'] if s[0] > now - Config.HEALTH_WINDOW]
+            samples.append([now, ok, latency])
+            state['samples'] = samples[-Config.HEALTH_MAX_SAMPLES:]
+            if ok:
+                if state['state'] != CLOSED:
+                    logger.info("Circuit refermé pour %s", source_name)
+                state.update(state=CLOSED, failures=0, probe_until=0)
+                return state
+            
+            state['failures'] += 1
+            if state['state'] == HALF_OPEN or self._should_open(state):
+                if state['state'] != OPEN:
+                    logger.warning("Circuit ouvert pour %s", source_name)
+                state.update(state=OPEN, opened_at=now, probe_until=0)
+            return state
+        
+        try:
+            self._update(source_name, apply)
+        except Exception as e:
+            logger.warning("Impossible d'enregistrer l'état de %s: %s", source_name, e)
+    
+    @staticmethod
+    def _should_open(state: Dict[str, Any]) -> bool:
+        """Indique si les mesures justifient l'ouverture du circuit"""
+        if state['failures'] >= Config.HEALTH_FAILURE_THRESHOLD:
+            return True
+        samples = state['samples']
+        if len(samples) < Config.HEALTH_MIN_SAMPLES:
+            return False
+        return HealthTracker._error_rate(samples) >= Config.HEALTH_ERROR_RATE
+    
+    @staticmethod
+    def _error_rate(samples: List[List[Any]]) -> float:
+        return sum(1 for s in samples if not s[1]) / len(samples) if samples else 0.0
+    
+    @staticmethod
+    def _p95_latency(samples: List[List[Any]]) -> float:
+        latencies = sorted(s[2] for s in samples)
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+    
+    def is_degraded(self, source_name: str, budget: float) -> bool:
+        """
+        Indique si une source, bien que disponible, est lente ou instable
+        
+        Une source est dégradée si son taux d'erreur dépasse HEALTH_DEGRADED_ERROR_RATE
+        ou si sa latence p95 dépasse son budget.
+        """
+        samples = self.get_state(source_name)['samples']
+        if len(samples) < Config.HEALTH_MIN_SAMPLES:
+            return False
+        return (self._error_rate(samples) >= Config.HEALTH_DEGRADED_ERROR_RATE
+                or self._p95_latency(samples) >= budget)
+    
+    def snapshot(self, source_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Résumé de l'état de chaque source (état, taux d'erreur, latence p95)"""
+        summary = {}
+        for source_name in source_names:
+            state = self.get_state(source_name)
+            summary[source_name] = {
+                'state': state['state'],
+                'error_rate': self._error_rate(state['samples']),
+                'p95_latency': self._p95_latency(state['samples']),
+                'samples': len(state['samples'])
+            }
+        return summary
+    
+    def reset(self, source_name: str):
+        """Réinitialise l'état d'une source"""
+        self.storage.delete(self.NAMESPACE, source_name)
@@ -0,0 +1,186 @@
+"""
+Client HTTP partagé par toutes les sources d'un même worker
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional
+
+import aiohttp
+
+from app.core.config import Config
+
+class HttpClient:
+    """
+    Pool de connexions HTTP longue durée, propre à chaque processus
+    
+    La session aiohttp vit dans une boucle d'événements dédiée, exécutée dans un
+    thread d'arrière-plan : elle survit ainsi aux requêtes Flask, qui créent chacune
+    leur propre boucle. Les coroutines lancées depuis une autre boucle sont
+    transférées sur celle du client, ce qui permet de réutiliser les connexions
+    keep-alive et le cache DNS d'une requête à l'autre.
+    
+    Sous un serveur ASGI, le client est rattaché à la boucle du serveur (voir
+    attach) : les recherches s'y exécutent directement, sans changer de thread.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pid: Optional[int] = None
+    
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Boucle d'événements du client, démarrée à la première utilisation"""
+        with self._lock:
+            # Après un fork (workers gunicorn), le thread du parent n'existe plus
+            if (self._loop is None or self._pid != os.getpid() or self._loop.is_closed()
+                    or (self._thread is not None and not self._thread.is_alive())):
+                self._start()
+            return self._loop
+    
+    @property
+    def attached(self) -> bool:
+        """Indique si le client s'exécute sur la boucle d'un serveur ASGI"""
+        return self._loop is not None and self._thread is None
+    
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """
+        Exécute le client sur une boucle existante plutôt que dans son propre thread
+        
+        Appelé par le serveur ASGI (app/asgi.py) avec sa boucle d'événements : les
+        recherches de toutes les requêtes partagent alors la session et son pool.
+        """
+        with self._lock:
+            if self._loop is loop and self._pid == os.getpid():
+                return
+        # Arrête la boucle dédiée éventuellement démarrée avant le serveur
+        self.close()
+        with self._lock:
+            self._loop = loop
+            self._session = None
+            self._pid = os.getpid()
+            self._thread = None
+    
+    def _start(self):
+        """Démarre la boucle d'événements dans un thread d'arrière-plan"""
+        self._loop = asyncio.new_event_loop()
+        self._session = None
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name='book-finder-http', daemon=True)
+        self._thread.start()
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Crée la session aiohttp et son pool de connexions"""
+        connector = aiohttp.TCPConnector(
+            limit=Config.HTTP_POOL_SIZE,
+            limit_per_host=Config.HTTP_POOL_PER_HOST,
+            keepalive_timeout=Config.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=Config.HTTP_DNS_CACHE_TTL,
+            use_dns_cache=True
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=Config.SEARCH_TIMEOUT)
+        )
+    
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Retourne la session partagée
+        
+        Doit être appelée depuis la boucle du client (voir run et submit).
+        """
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+    
+    def submit(self, coro: Awaitable[Any]) -> Future:
+        """Planifie une coroutine sur la boucle du client depuis n'importe quel thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """
+        Exécute une coroutine sur la boucle du client et attend son résultat
+        
+        L'annulation de l'appelant est propagée à la tâche exécutée sur le client.
+        """
+        loop = self.loop
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+    
+    def run_sync(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        Exécute une coroutine sur la boucle du client depuis du code synchrone
+        
+        Raises:
+            RuntimeError: Si l'appel provient de la boucle du client elle-même, qu'il
+                bloquerait (utiliser run)
+        """
+        loop = self.loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("Appel bloquant depuis la boucle du client HTTP")
+        return self.submit(coro).result(timeout)
+    
+    def iterate(self, agen: AsyncIterator[Any]) -> Iterator[Any]:
+        """
+        Parcourt un générateur asynchrone sur la boucle du client depuis du code synchrone
+        
+        Permet de diffuser une réponse Flask au fil de l'eau ; le générateur est
+        fermé (et ses tâches annulées) si le client se déconnecte.
+        """
+        try:
+            while True:
+                try:
+                    yield self.run_sync(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run_sync(agen.aclose())
+    
+    def close(self):
+        """Ferme la session et arrête la boucle du client (sauf celle d'un serveur ASGI)"""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            loop, session, thread = self._loop, self._session, self._thread
+            self._loop = self._session = self._thread = None
+        if loop.is_closed():
+            return
+        if thread is None:
+            # Boucle du serveur ASGI : elle lui appartient, seule la session est fermée
+            if session is not None and not session.closed:
+                loop.call_soon_threadsafe(asyncio.ensure_future, session.close())
+            return
+        if session is not None and not session.closed:
+            asyncio.run_coroutine_threadsafe(session.close(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+    
+    async def aclose(self):
+        """Ferme la session depuis la boucle du client et détache le client de cette boucle"""
+        with self._lock:
+            session = self._session
+            self._loop = self._session = self._thread = None
+        if session is not None and not session.closed:
+            await session.close()
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Retourne le client HTTP du processus courant"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,181 @@
+"""
+Journalisation structurée et traces des recherches
+"""
+
+import logging
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Iterable, Iterator, List, Optional
+
+from app.core.config import Config
+
+logger = logging.getLogger('app.search')
+
+class SamplingFilter(logging.Filter):
+    """
+    Ne conserve qu'une partie des enregistrements de niveau inférieur à WARNING
+    
+    Les avertissements et les erreurs sont toujours conservés.
+    """
+    
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: Proportion des enregistrements conservés, entre 0 et 1
+        """
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+_handler: Optional[logging.Handler] = None
+_handler_lock = threading.Lock()
+
+def configure_logging(level: Optional[str] = None, sample_rate: Optional[float] = None):
+    """
+    Configure les journaux du paquet app (niveau, format et échantillonnage)
+    
+    Chaque source journalise sur son propre logger (app.sources.<nom>), ce qui
+    permet d'en régler le niveau individuellement. Peut être appelée plusieurs fois.
+    """
+    global _handler
+    package_logger = logging.getLogger('app')
+    package_logger.setLevel(level or Config.LOG_LEVEL)
+    with _handler_lock:
+        if _handler is None:
+            _handler = logging.StreamHandler(sys.stderr)
+            _handler.setFormatter(logging.Formatter(Config.LOG_FORMAT))
+            package_logger.addHandler(_handler)
+        _handler.filters = [SamplingFilter(Config.LOG_SAMPLE_RATE if sample_rate is None else sample_rate)]
+
+class SourceTimings:
+    """Détail par source d'une recherche, mis en forme seulement si l'enregistrement est émis"""
+    
+    def __init__(self, outcomes: Iterable[Any]):
+        self.sources = {
+            outcome.source_name: {
+                'status': outcome.status,
+                'results': len(outcome.results),
+                'elapsed': round(outcome.elapsed, 3)
+            }
+            for outcome in outcomes
+        }
+    
+    def __str__(self) -> str:
+        return ' '.join(
+            f"{name}={source['status']}/{source['results']}/{source['elapsed']:.3f}s"
+            for name, source in self.sources.items()
+        )
+
+def log_search_summary(query: str, language: str, outcomes: Iterable[Any], elapsed: float,
+                       results: int, cache: Optional[str] = None):
+    """
+    Émet un enregistrement récapitulatif pour une recherche
+    
+    Le détail par source (statut, nombre de résultats, durée) est joint à
+    l'enregistrement dans l'attribut search, pour les formateurs structurés.
+    Comme pour le journal des requêtes HTTP, seule la longueur de la requête est
+    enregistrée, jamais son texte.
+    
+    Args:
+        query: Requête
+        language: Code de langue
+        outcomes: Résultats par source (SourceOutcome)
+        elapsed: Durée totale en secondes
+        results: Nombre de résultats renvoyés
+        cache: État du cache des requêtes si la réponse en provient ('fresh', 'stale')
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    timings = SourceTimings(outcomes)
+    summary: Dict[str, Any] = {
+        'query_length': len(query),
+        'language': language,
+        'elapsed': round(elapsed, 3),
+        'results': results,
+        'cache': cache,
+        'sources': timings.sources
+    }
+    logger.info('recherche longueur=%d lang=%s résultats=%d durée=%.3fs cache=%s %s',
+                len(query), language, results, elapsed, cache or 'miss', timings,
+                extra={'search': summary})
+
+class PhaseTimings:
+    """
+    Durées cumulées par phase pour une requête HTTP, exportées dans l'en-tête Server-Timing
+    
+    Les phases des sources sont nommées <source>-network et <source>-parse ; les
+    requêtes d'une même source s'exécutant en parallèle, leurs durées s'additionnent.
+    """
+    
+    def __init__(self):
+        self.phases: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, phase: str, duration: float):
+        """Ajoute une durée (en secondes) à une phase"""
+        with self._lock:
+            total = self.phases.setdefault(phase, [0.0, 0])
+            total[0] += duration
+            total[1] += 1
+    
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """Durées en millisecondes et nombre de mesures par phase"""
+        with self._lock:
+            return {phase: {'ms': round(total * 1000, 1), 'count': count}
+                    for phase, (total, count) in self.phases.items()}
+    
+    def server_timing(self) -> str:
+        """Valeur de l'en-tête Server-Timing"""
+        with self._lock:
+            return ', '.join(f'{phase};dur={total * 1000:.1f}'
+                             for phase, (total, _) in self.phases.items())
+
+_timings: ContextVar[Optional[PhaseTimings]] = ContextVar('book_finder_timings', default=None)
+
+def start_timings() -> PhaseTimings:
+    """Commence la mesure des phases de la requête courante"""
+    timings = PhaseTimings()
+    _timings.set(timings)
+    return timings
+
+def current_timings() -> Optional[PhaseTimings]:
+    """Mesures de la requête courante, ou None hors d'une requête mesurée"""
+    return _timings.get()
+
+def record_timing(phase: str, duration: float):
+    """Ajoute une durée aux mesures de la requête courante, s'il y en a"""
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(phase, duration)
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Mesure la durée du bloc pour la requête courante"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+async def bind_timings(timings: Optional[PhaseTimings], coro: Awaitable[Any]) -> Any:
+    """
+    Exécute une coroutine avec les mesures données
+    
+    Les coroutines transférées sur la boucle du client HTTP ne voient pas le contexte
+    de l'appelant : cette enveloppe y rattache les mesures de la requête Flask.
+    """
+    token = _timings.set(timings)
+    try:
+        return await coro
+    finally:
+        _timings.reset(token)
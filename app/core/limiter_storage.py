@@ -0,0 +1,95 @@
+"""
+Compteurs de Flask-Limiter dans le stockage partagé entre les workers
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple, Type
+
+from limits.storage import Storage
+
+from app.core.config import Config
+from app.core.metrics import RATELIMIT_STORAGE_ERRORS
+from app.core.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+class SharedLimiterStorage(Storage):
+    """
+    Stockage des limites de taux (stratégie à fenêtre fixe) adossé au stockage partagé
+    
+    Avec memory://, chaque worker gunicorn tient ses propres compteurs : les limites
+    effectives sont multipliées par le nombre de workers et varient d'une requête à
+    l'autre selon le worker qui la reçoit. Ici, chaque compteur est une entrée du
+    stockage de Config.SHARED_STORAGE_URI, incrémentée de manière atomique.
+    
+    Enregistré auprès de limits sous le schéma shared:// (voir Config.RATELIMIT_STORAGE_URL).
+    Les échecs du stockage sont comptés puis propagés : Flask-Limiter bascule alors sur
+    ses compteurs en mémoire jusqu'à ce que check() réussisse à nouveau.
+    """
+    
+    STORAGE_SCHEME = ['shared']
+    NAMESPACE = 'limiter'
+    
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.storage = get_storage()
+        self._increments = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def base_exceptions(self) -> Tuple[Type[Exception], ...]:
+        return (sqlite3.Error, ValueError)
+    
+    @contextmanager
+    def _counted(self, operation: str) -> Iterator[None]:
+        """Compte et journalise l'échec d'une opération sur le stockage partagé"""
+        try:
+            yield
+        except self.base_exceptions as e:
+            RATELIMIT_STORAGE_ERRORS.labels(operation).inc()
+            logger.warning("Stockage du limiteur indisponible (%s) : %s", operation, e)
+            raise
+    
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        """Incrémente le compteur d'une limite, créé pour expiry secondes s'il n'existe pas"""
+        with self._counted('incr'):
+            count = self.storage.incr(self.NAMESPACE, key, amount, time.time() + expiry)
+        with self._lock:
+            self._increments += 1
+            prune = self._increments % Config.RATELIMIT_PRUNE_INTERVAL == 0
+        if prune:
+            self.storage.prune(self.NAMESPACE, Config.RATELIMIT_STORAGE_MAX_ENTRIES)
+        return count
+    
+    def get(self, key: str) -> int:
+        """Valeur courante du compteur d'une limite (0 s'il a expiré)"""
+        with self._counted('get'):
+            row = self.storage.get(self.NAMESPACE, key)
+        return int(row[0]) if row else 0
+    
+    def get_expiry(self, key: str) -> float:
+        """Date de réinitialisation du compteur d'une limite"""
+        with self._counted('get_expiry'):
+            row = self.storage.get(self.NAMESPACE, key)
+        return row[2] if row else time.time()
+    
+    def check(self) -> bool:
+        """Indique si le stockage répond"""
+        try:
+            self.storage.get(self.NAMESPACE, '')
+        except Exception:
+            return False
+        return True
+    
+    def reset(self) -> Optional[int]:
+        """Remet tous les compteurs à zéro"""
+        self.storage.clear(self.NAMESPACE)
+        return None
+    
+    def clear(self, key: str):
+        """Remet à zéro le compteur d'une limite"""
+        self.storage.delete(self.NAMESPACE, key)
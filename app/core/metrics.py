@@ -0,0 +1,113 @@
+"""
+Métriques Prometheus du moteur de recherche
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+
+from app.core.instrumentation import record_timing
+
+# Les valeurs sont agrégées entre les workers gunicorn lorsque PROMETHEUS_MULTIPROC_DIR est
+# défini (voir gunicorn_config.py) : chaque processus écrit dans ses propres fichiers mmap.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 4.0, 6.0, 10.0)
+
+SOURCE_LATENCY = Histogram(
+    'book_finder_source_latency_seconds',
+    "Durée de la recherche sur une source, cache compris",
+    ['source', 'status'], buckets=LATENCY_BUCKETS
+)
+SOURCE_PHASE = Histogram(
+    'book_finder_source_phase_seconds',
+    "Durée des requêtes HTTP (network), de l'attente du débit sortant (throttle) et de l'analyse des pages (parse) d'une source",
+    ['source', 'phase'], buckets=(0.001, 0.005, 0.01, 0.025, 0.05) + LATENCY_BUCKETS
+)
+SOURCE_RESULTS = Histogram(
+    'book_finder_source_results',
+    "Nombre de résultats renvoyés par une source",
+    ['source'], buckets=(0, 1, 2, 5, 10, 20, 50)
+)
+SOURCE_ERRORS = Counter(
+    'book_finder_source_errors_total',
+    "Recherches sur une source en erreur, abandonnées ou écartées par le disjoncteur",
+    ['source', 'kind']
+)
+SOURCES_IN_FLIGHT = Gauge(
+    'book_finder_sources_in_flight',
+    "Recherches en cours par source",
+    ['source'], multiprocess_mode='livesum'
+)
+CACHE_REQUESTS = Counter(
+    'book_finder_cache_requests_total',
+    "Lectures des caches par résultat (memory, storage, stale, miss)",
+    ['cache', 'result']
+)
+COALESCED_QUERIES = Counter(
+    'book_finder_coalesced_queries_total',
+    "Recherches servies par une recherche identique en cours, du même worker ou d'un autre",
+    ['scope']
+)
+OUTBOUND_THROTTLED = Counter(
+    'book_finder_outbound_throttled_total',
+    "Requêtes sortantes abandonnées faute de créneau (rejected) et 429/503 reçus (backoff), par hôte",
+    ['host', 'reason']
+)
+RATELIMIT_STORAGE_ERRORS = Counter(
+    'book_finder_ratelimit_storage_errors_total',
+    "Opérations du limiteur de requêtes en échec sur le stockage partagé, compensées par les compteurs en mémoire du worker",
+    ['operation']
+)
+QUERY_LATENCY = Histogram(
+    'book_finder_query_seconds',
+    "Durée d'une recherche complète",
+    ['cache'], buckets=LATENCY_BUCKETS
+)
+QUERIES_IN_FLIGHT = Gauge(
+    'book_finder_queries_in_flight',
+    "Recherches en cours",
+    multiprocess_mode='livesum'
+)
+
+@contextmanager
+def observe_phase(source: str, phase: str) -> Iterator[None]:
+    """
+    Mesure la durée d'une phase ('network' ou 'parse') de la recherche sur une source
+    
+    La durée alimente aussi l'en-tête Server-Timing de la requête en cours.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_duration(source, phase, time.perf_counter() - start)
+
+def observe_duration(source: str, phase: str, duration: float):
+    """Enregistre une durée déjà mesurée pour une phase de la recherche sur une source"""
+    SOURCE_PHASE.labels(source, phase).observe(duration)
+    record_timing(f'{source}-{phase}', duration)
+
+def observe_outcome(outcome):
+    """Enregistre la durée, le nombre de résultats et le statut de la recherche sur une source"""
+    SOURCE_LATENCY.labels(outcome.source_name, outcome.status).observe(outcome.elapsed)
+    SOURCE_RESULTS.labels(outcome.source_name).observe(len(outcome.results))
+    if outcome.status in ('error', 'timeout', 'skipped', 'throttled', 'partial'):
+        SOURCE_ERRORS.labels(outcome.source_name, outcome.status).inc()
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Exporte les métriques au format texte de Prometheus
+    
+    Returns:
+        Tuple (contenu, type MIME)
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
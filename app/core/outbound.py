@@ -0,0 +1,238 @@
+"""
+Débit sortant par hôte : ordonnanceur de politesse partagé entre les workers
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from app.core.config import Config
+from app.core.metrics import OUTBOUND_THROTTLED
+from app.core.storage import SharedStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_STATUSES = (429, 503)
+
+class OutboundThrottled(aiohttp.ClientError):
+    """Aucun créneau d'envoi n'est disponible vers l'hôte dans Config.OUTBOUND_MAX_WAIT"""
+
+class Ticket(NamedTuple):
+    """Créneau obtenu pour une requête, à régler avec la réponse (OutboundScheduler.settle)"""
+    host: str
+    degraded: bool  # Débit réduit par des 429/503 : une réponse réussie le rétablit en partie
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convertit un en-tête Retry-After en secondes
+    
+    Args:
+        value: Nombre de secondes ou date HTTP
+    
+    Returns:
+        Délai en secondes, ou None si l'en-tête est absent ou illisible
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+class OutboundScheduler:
+    """
+    Seau à jetons par hôte, partagé entre les workers
+    
+    Chaque requête réserve le prochain créneau de l'hôte (algorithme GCRA) dans le
+    stockage partagé, puis attend son heure : les requêtes partent dans leur ordre
+    d'arrivée, tous workers confondus, au débit et avec la rafale définis par
+    Config.OUTBOUND_RATE_LIMITS. Une requête dont le créneau est trop lointain
+    (Config.OUTBOUND_MAX_WAIT) est abandonnée sans rien réserver.
+    
+    Une réponse 429 ou 503 suspend l'hôte pendant la durée de son Retry-After, ou à
+    défaut d'une pause exponentielle, et divise son débit par deux ; chaque réponse
+    réussie en rend ensuite une partie (Config.OUTBOUND_RECOVERY_STEP).
+    """
+    
+    NAMESPACE = 'outbound'
+    
+    def __init__(self, storage: Optional[SharedStorage] = None):
+        self.storage = storage or get_storage()
+    
+    @staticmethod
+    def host(url: str) -> str:
+        """Hôte d'une URL, tel qu'indiqué dans Config.OUTBOUND_RATE_LIMITS"""
+        return (urlparse(url).hostname or '').lower()
+    
+    @staticmethod
+    def limits(host: str) -> Optional[Tuple[float, int]]:
+        """Débit (requêtes par seconde) et rafale de l'hôte, None s'il n'est pas limité"""
+        return Config.OUTBOUND_RATE_LIMITS.get(host, Config.OUTBOUND_RATE_DEFAULT)
+    
+    @staticmethod
+    def _load(value: Optional[str]) -> Dict[str, Any]:
+        if value:
+            return json.loads(value)
+        return {'tat': 0.0, 'factor': 1.0, 'strikes': 0}
+    
+    def _update(self, host: str, func) -> Dict[str, Any]:
+        """Applique func à l'état de l'hôte dans une transaction partagée"""
+        def apply(value):
+            return json.dumps(func(self._load(value)))
+        expires_at = time.time() + Config.OUTBOUND_STATE_TTL
+        return json.loads(self.storage.update(self.NAMESPACE, host, apply, expires_at))
+    
+    def reserve(self, url: str) -> Tuple[float, Ticket]:
+        """
+        Réserve le prochain créneau d'envoi vers l'hôte de l'URL
+        
+        Returns:
+            Tuple (attente en secondes avant l'envoi, ticket de la requête)
+        
+        Raises:
+            OutboundThrottled: Si le créneau est au-delà de Config.OUTBOUND_MAX_WAIT
+        """
+        host = self.host(url)
+        limits = self.limits(host)
+        if not limits:
+            return 0.0, Ticket(host, False)
+        rate, burst = limits
+        now = time.time()
+        reservation = {}
+        
+        def take(state):
+            interval = 1 / (rate * state['factor'])
+            # Heure d'arrivée théorique : l'envoi est permis jusqu'à burst intervalles plus tôt
+            tat = max(state['tat'], now)
+            wait = max(0.0, tat + interval - burst * interval - now)
+            reservation['wait'] = wait
+            if wait <= Config.OUTBOUND_MAX_WAIT:
+                state['tat'] = tat + interval
+            return state
+        
+        try:
+            state = self._update(host, take)
+        except Exception as e:
+            # Sans stockage, les requêtes partent sans attendre plutôt que d'échouer
+            logger.warning("Débit sortant indisponible pour %s: %s", host, e)
+            return 0.0, Ticket(host, False)
+        
+        if reservation['wait'] > Config.OUTBOUND_MAX_WAIT:
+            OUTBOUND_THROTTLED.labels(host, 'rejected').inc()
+            raise OutboundThrottled(f"Aucun créneau vers {host} avant {reservation['wait']:.1f} s")
+        degraded = state['factor'] < 1 or state['strikes'] > 0
+        return reservation['wait'], Ticket(host, degraded)
+    
+    def headroom(self, url: str) -> float:
+        """
+        Part de la rafale de l'hôte disponible immédiatement, sans rien réserver
+        
+        Returns:
+            Valeur entre 0 (créneaux réservés au-delà de la rafale) et 1 (hôte inactif ou non limité)
+        """
+        host = self.host(url)
+        limits = self.limits(host)
+        if not limits:
+            return 1.0
+        rate, burst = limits
+        try:
+            row = self.storage.get(self.NAMESPACE, host)
+        except Exception:
+            return 1.0
+        state = self._load(row[0] if row else None)
+        interval = 1 / (rate * state['factor'])
+        # Créneaux réservés d'avance : ceux de la rafale qui ne sont pas encore écoulés
+        booked = max(0.0, state['tat'] - time.time()) / interval
+        return max(0.0, burst - booked) / burst
+    
+    async def acquire(self, url: str) -> Ticket:
+        """Attend le créneau d'envoi d'une requête (voir reserve)"""
+        wait, ticket = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return ticket
+    
+    def acquire_sync(self, url: str) -> Ticket:
+        """Équivalent bloquant de acquire, pour les requêtes synchrones"""
+        wait, ticket = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return ticket
+    
+    def settle(self, ticket: Ticket, status: int, headers: Mapping[str, str]):
+        """
+        Ajuste le débit de l'hôte d'après la réponse obtenue
+        
+        Args:
+            ticket: Ticket de la requête
+            status: Code HTTP de la réponse
+            headers: En-têtes de la réponse (Retry-After)
+        """
+        if status in BACKOFF_STATUSES:
+            self.penalize(ticket.host, parse_retry_after(headers.get('Retry-After')))
+        elif ticket.degraded and status < 400:
+            self.recover(ticket.host)
+    
+    def penalize(self, host: str, retry_after: Optional[float] = None):
+        """Suspend l'hôte après un 429/503 et divise son débit par deux"""
+        limits = self.limits(host)
+        if not limits:
+            return
+        rate, burst = limits
+        now = time.time()
+        OUTBOUND_THROTTLED.labels(host, 'backoff').inc()
+        
+        def apply(state):
+            state['strikes'] += 1
+            state['factor'] = max(state['factor'] / 2, Config.OUTBOUND_MIN_RATE_FACTOR)
+            pause = retry_after
+            if pause is None:
+                pause = Config.OUTBOUND_BACKOFF_BASE * 2 ** (state['strikes'] - 1)
+            pause = min(pause, Config.OUTBOUND_BACKOFF_MAX)
+            # Une seule requête à la reprise, puis le débit réduit, sans rafale
+            interval = 1 / (rate * state['factor'])
+            state['tat'] = max(state['tat'], now + pause + (burst - 1) * interval)
+            return state
+        
+        try:
+            state = self._update(host, apply)
+        except Exception as e:
+            logger.warning("Impossible d'enregistrer le ralentissement de %s: %s", host, e)
+            return
+        logger.info("Hôte %s ralenti (%d refus consécutifs, débit x%.3f)",
+                    host, state['strikes'], state['factor'])
+    
+    def recover(self, host: str):
+        """Rétablit en partie le débit d'un hôte après une réponse réussie"""
+        def apply(state):
+            state['strikes'] = 0
+            state['factor'] = min(1.0, state['factor'] + Config.OUTBOUND_RECOVERY_STEP)
+            return state
+        
+        try:
+            self._update(host, apply)
+        except Exception as e:
+            logger.warning("Impossible de rétablir le débit de %s: %s", host, e)
+
+_scheduler: Optional[OutboundScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_outbound_scheduler() -> OutboundScheduler:
+    """Retourne l'ordonnanceur de débit sortant partagé"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OutboundScheduler()
+        return _scheduler
@@ -0,0 +1,79 @@
+"""
+Calcul des scores de pertinence des résultats
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from rapidfuzz import fuzz, process
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalise une chaîne pour la comparaison (casse et espaces aux extrémités)"""
+    return (text or '').lower().strip()
+
+class QueryScorer:
+    """
+    Calcule les scores de pertinence d'un lot de résultats pour une requête
+    
+    La requête est normalisée une seule fois ; les titres et les auteurs du lot sont
+    ensuite comparés à la requête en un seul appel à rapidfuzz, qui prépare le profil
+    de la requête puis calcule toutes les similarités en C.
+    
+    Le score d'un résultat est la somme de :
+    - la similarité entre la requête et le titre (poids 0,5) ;
+    - la similarité entre la requête et l'auteur (poids 0,2) ;
+    - la correspondance de la langue (0,3, ou 0,15 pour l'anglais si ce n'est pas
+      la langue cible, car c'est souvent une alternative acceptable).
+    """
+    
+    TITLE_WEIGHT = 0.5
+    AUTHOR_WEIGHT = 0.2
+    LANGUAGE_WEIGHT = 0.3
+    FALLBACK_LANGUAGE_WEIGHT = 0.15
+    
+    def __init__(self, query: str, language: str):
+        """
+        Args:
+            query: Terme de recherche
+            language: Code de la langue cible
+        """
+        self.query = normalize_text(query)
+        self.language = normalize_text(language)
+    
+    def similarities(self, texts: Sequence[str]) -> List[float]:
+        """
+        Similarité entre la requête et chaque texte normalisé
+        
+        Returns:
+            Scores entre 0 et 1, dans l'ordre des textes
+        """
+        scores = [0.0] * len(texts)
+        for _, score, index in process.extract(self.query, texts, scorer=fuzz.ratio,
+                                               processor=None, limit=None):
+            scores[index] = score / 100
+        return scores
+    
+    def language_score(self, language: Optional[str]) -> float:
+        """Part du score liée à la langue du résultat"""
+        language = normalize_text(language)
+        if language == self.language:
+            return self.LANGUAGE_WEIGHT
+        if language == 'en' and self.language != 'en':
+            return self.FALLBACK_LANGUAGE_WEIGHT
+        return 0.0
+    
+    def score(self, results: Sequence[Dict[str, Any]]) -> List[float]:
+        """
+        Calcule le score de chaque résultat
+        
+        Returns:
+            Scores entre 0 et 1, dans l'ordre des résultats
+        """
+        if not results:
+            return []
+        titles = self.similarities([normalize_text(result.get('title')) for result in results])
+        authors = self.similarities([normalize_text(result.get('author')) for result in results])
+        return [
+            title * self.TITLE_WEIGHT + author * self.AUTHOR_WEIGHT
+            + (self.language_score(result['language']) if 'language' in result else 0.0)
+            for result, title, author in zip(results, titles, authors)
+        ]
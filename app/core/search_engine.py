@@ -4,12 +4,89 @@ Moteur de recherche principal
 
 import importlib
 import asyncio
-import aiohttp
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Any
+import base64
+import heapq
+import json
+import logging
+import time
+from typing import List, Dict, Any, NamedTuple, AsyncIterator, Optional, Tuple
 
 from app.core.config import Config
-from app.core.base_source import BookSource  # Correction du chemin d'import
+from app.core.http_client import get_http_client
+from app.core.cache import ResultCache, make_cache_key, FRESH, MISS, STALE
+from app.core.dedup import ResultMerger, merge_duplicates
+from app.core.health import HealthTracker
+from app.core.instrumentation import (bind_timings, current_timings, log_search_summary,
+                                      record_timing, timed)
+from app.core.metrics import QUERIES_IN_FLIGHT, QUERY_LATENCY, SOURCES_IN_FLIGHT, observe_outcome
+from app.core.outbound import OutboundThrottled
+from app.core.scoring import QueryScorer
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+class SourceOutcome(NamedTuple):
+    """Résultat de la recherche sur une source"""
+    source_name: str
+    results: List[Dict[str, Any]]
+    status: str  # 'ok', 'empty', 'partial' (détails manquants), 'error', 'timeout', 'skipped' (circuit ouvert) ou 'throttled' (débit sortant)
+    ttl: float  # Durée pendant laquelle ce résultat reste valable
+    elapsed: float = 0.0  # Durée de la recherche sur cette source, en secondes
+
+class SearchReport(NamedTuple):
+    """Résultat d'une recherche sur l'ensemble des sources"""
+    results: List[Dict[str, Any]]  # Classés par score décroissant
+    ttl: float  # Durée de validité de l'ensemble : celle de la source qui expire le plus tôt
+    timed_out: List[str]  # Sources abandonnées faute de réponse dans les délais
+    failed: List[str]  # Sources en erreur, écartées par leur disjoncteur ou par le débit sortant
+    next_cursor: Optional[str] = None  # Curseur de la page suivante, None après la dernière
+
+# Statuts des sources absentes de la réponse pour une autre raison que le délai
+FAILED_STATUSES = ('error', 'skipped', 'throttled')
+
+# Longueur maximale acceptée pour un curseur de pagination
+MAX_CURSOR_LENGTH = 512
+# Rang maximal dans un lot de résultats
+MAX_CURSOR_OFFSET = 1000
+
+def encode_cursor(pages: Dict[str, int], offset: int = 0) -> str:
+    """
+    Encode une position dans les résultats sous forme de curseur opaque
+    
+    Args:
+        pages: Numéro de page de chaque source, qui désigne un lot de résultats
+        offset: Rang du premier résultat de la page dans ce lot
+    """
+    data = {'pages': pages}
+    if offset:
+        data['offset'] = offset
+    data = json.dumps(data, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[Dict[str, int], int]:
+    """
+    Décode un curseur de pagination
+    
+    Returns:
+        Tuple (numéro de page de chaque source encore paginée, rang dans le lot)
+        
+    Raises:
+        ValueError: Si le curseur est mal formé ou désigne une page hors limites
+    """
+    def is_index(value, limit):
+        return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < limit
+    
+    try:
+        if len(cursor) > MAX_CURSOR_LENGTH:
+            raise ValueError(cursor)
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        pages, offset = data['pages'], data.get('offset', 0)
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Curseur de pagination invalide") from e
+    if (not isinstance(pages, dict) or not is_index(offset, MAX_CURSOR_OFFSET)
+            or not all(is_index(page, Config.SEARCH_MAX_PAGES) for page in pages.values())):
+        raise ValueError("Curseur de pagination invalide")
+    return pages, offset
 
 class SearchEngine:
     """Moteur de recherche qui agrège les résultats de différentes sources"""
@@ -17,6 +94,21 @@ class SearchEngine:
     def __init__(self):
         """Initialise le moteur de recherche avec les sources configurées"""
         self.sources = {}
+        # Pool de connexions partagé par toutes les recherches du worker
+        self.http_client = get_http_client()
+        # Cache des requêtes complètes (mémoire du worker + stockage partagé)
+        self.query_cache = ResultCache('queries')
+        # Cache par source, pour ne réinterroger que les sources expirées
+        self.source_cache = ResultCache('sources')
+        # État de santé des sources, partagé entre les workers
+        self.health = HealthTracker()
+        # Recherches identiques en cours, partagées entre les appelants et les workers,
+        # y compris les lots que le cache ne garde pas (réponses partielles)
+        self.flights = SingleFlight(encode=lambda report: json.dumps(report._asdict()),
+                                    decode=lambda value: SearchReport(**json.loads(value)))
+        self._refreshing = set()
+        self._background_tasks = set()
+        self._prefetching = set()
         self._load_sources()
         
     def _load_sources(self):
@@ -25,12 +117,9 @@ class SearchEngine:
             try:
                 # Importe le module de la source
                 module_path = f'app.sources.{source_name}'
-                print(f"\nChargement de {module_path}")
+                logger.debug("Chargement de %s", module_path)
                 module = importlib.import_module(module_path)
                 
-                # Liste les attributs du module
-                print(f"Attributs du module: {dir(module)}")
-                
                 # Vérifie d'abord si la classe existe directement dans le module
                 for attr in dir(module):
                     if attr.endswith('Source') and attr != 'BookSource':
@@ -39,130 +128,568 @@ class SearchEngine:
                             if (isinstance(source_class, type) and  # Vérifie que c'est bien une classe
                                 hasattr(source_class, '__base__') and  # Vérifie qu'elle a une classe parente
                                 source_class.__base__.__name__ == 'BookSource'):  # Vérifie qu'elle hérite de BookSource
-                                print(f"✅ Classe trouvée: {attr}")
                                 self.sources[source_name] = source_class()
-                                print(f"✅ Source chargée: {source_name}")
+                                logger.debug("Source chargée: %s (%s)", source_name, attr)
                                 break
-                        except Exception as e:
-                            print(f"❌ Erreur lors de l'instanciation de {attr}: {str(e)}")
+                        except Exception:
+                            logger.exception("Erreur lors de l'instanciation de %s", attr)
                 else:  # Si aucune classe n'a été trouvée
                     raise AttributeError(f"Aucune classe source trouvée dans {source_name}")
                 
-            except Exception as e:
-                print(f"❌ Erreur lors du chargement de la source {source_name}: {str(e)}")
-                import traceback
-                print(traceback.format_exc())
+            except Exception:
+                logger.exception("Erreur lors du chargement de la source %s", source_name)
+    
+    async def _search_source(self, source_name: str, source, query: str, language: str,
+                             page: int = 0) -> SourceOutcome:
+        """Effectue la recherche sur une source et mesure sa durée"""
+        start = time.monotonic()
+        with SOURCES_IN_FLIGHT.labels(source_name).track_inprogress():
+            outcome = await self._query_source(source_name, source, query, language, page)
+        outcome = outcome._replace(elapsed=time.monotonic() - start)
+        observe_outcome(outcome)
+        record_timing(f'{source_name}-total', outcome.elapsed)
+        return outcome
     
-    async def _search_source(self, source_name: str, source, query: str, language: str) -> List[Dict[str, Any]]:
-        """Effectue la recherche sur une source de manière asynchrone"""
+    async def _query_source(self, source_name: str, source, query: str, language: str,
+                            page: int = 0) -> SourceOutcome:
+        """
+        Effectue la recherche sur une source de manière asynchrone
+        
+        Les résultats sont servis depuis le cache de la source tant qu'ils sont frais ;
+        une entrée expirée est renvoyée telle quelle et rafraîchie en arrière-plan.
+        Une source dont le circuit est ouvert n'est pas interrogée, et une source qui
+        ne répond pas dans son budget (Config.SOURCE_TIMEOUTS, réduit si elle est
+        dégradée) est abandonnée.
+        """
+        if page:
+            key = make_cache_key(source_name, language, str(page), query)
+        else:
+            key = make_cache_key(source_name, language, query)
+        entry, state = self.source_cache.get_entry(key)
+        if state == FRESH:
+            return self._cached_outcome(source_name, entry)
+        
+        if not self.health.allow(source_name):
+            if state == STALE:
+                return self._cached_outcome(source_name, entry)
+            logger.debug("%s ignorée (circuit ouvert)", source_name)
+            return SourceOutcome(source_name, [], 'skipped', Config.CACHE_FAILURE_TTL)
+        
+        if state == STALE:
+            self._run_in_background(key, self._fetch_source(key, source_name, source, query,
+                                                            language, page, stale=entry.value))
+            return self._cached_outcome(source_name, entry)
+        
+        budget = Config.SOURCE_TIMEOUTS.get(source_name, Config.SEARCH_DEADLINE)
+        if self.health.is_degraded(source_name, budget):
+            budget *= Config.HEALTH_DEGRADED_BUDGET_FACTOR
+        start = time.monotonic()
+        try:
+            return await asyncio.wait_for(
+                self._fetch_source(key, source_name, source, query, language, page), budget
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Délai de %ss dépassé pour %s", budget, source_name)
+            self.health.record(source_name, False, time.monotonic() - start)
+            return SourceOutcome(source_name, [], 'timeout', 0)
+        except asyncio.CancelledError:
+            # Abandonnée par le délai global
+            self.health.record(source_name, False, time.monotonic() - start)
+            raise
+    
+    def _cached_outcome(self, source_name: str, entry) -> SourceOutcome:
+        """Construit le résultat d'une source à partir de son entrée de cache"""
+        logger.debug("%d résultats en cache pour %s", len(entry.value['results']), source_name)
+        return SourceOutcome(source_name, [dict(result) for result in entry.value['results']],
+                             entry.value['status'], entry.fresh_until - time.time())
+    
+    async def _fetch_source(self, key: str, source_name: str, source, query: str, language: str,
+                            page: int = 0, stale: Dict[str, Any] = None) -> SourceOutcome:
+        """
+        Interroge une source et met son résultat en cache, y compris en cas d'échec
+        
+        Une recherche refusée par l'ordonnanceur du débit sortant n'a rien envoyé :
+        elle n'est ni comptée dans la santé de la source ni mise en cache. Une liste
+        incomplète (pages de détail refusées ou hors délai, voir fetch_details) est
+        renvoyée avec le statut 'partial' et n'est gardée que Config.CACHE_FAILURE_TTL.
+        """
+        start = time.monotonic()
         try:
-            print(f"\nRecherche sur {source_name}...")
-            # Crée une session aiohttp pour les requêtes HTTP
-            async with aiohttp.ClientSession() as session:
-                # Si la source a une méthode de recherche asynchrone, utilise-la
-                if hasattr(source, 'search_async'):
-                    print(f"Utilisation de search_async pour {source_name}")
-                    results = await source.search_async(query, language, session)
-                else:
-                    # Sinon, exécute la méthode synchrone dans un thread séparé
-                    print(f"Utilisation de search synchrone pour {source_name}")
-                    with ThreadPoolExecutor() as executor:
-                        results = await asyncio.get_event_loop().run_in_executor(
-                            executor,
-                            source.search,
-                            query,
-                            language
-                        )
-                print(f"✅ {len(results)} résultats trouvés sur {source_name}")
-                for result in results:
-                    print(f"  - {result.get('title', 'Sans titre')} ({result.get('source', 'Source inconnue')})")
-                return results
+            logger.debug("Recherche sur %s", source_name)
+            # Toutes les sources passent par la session du pool partagé
+            session = await self.http_client.get_session()
+            results = await source.search_page(query, language, session, page)
+        except OutboundThrottled as e:
+            logger.info("Recherche sur %s différée: %s", source_name, e)
+            return SourceOutcome(source_name, [], 'throttled', 0)
         except Exception as e:
-            print(f"❌ Erreur lors de la recherche sur {source_name}: {str(e)}")
-            return []
+            logger.warning("Erreur lors de la recherche sur %s: %s", source_name, str(e) or type(e).__name__)
+            self.health.record(source_name, False, time.monotonic() - start)
+            return self._keep_stale(key, source_name, stale, [], 'error')
+        
+        if not getattr(results, 'complete', True):
+            # La page de recherche a répondu, mais pas toutes les pages de détail : la
+            # source n'est pas en cause (débit sortant, délai), sa santé n'est pas notée
+            logger.info("Résultats incomplets sur %s (%d retenus)", source_name, len(results))
+            return self._keep_stale(key, source_name, stale, list(results), 'partial')
+        
+        self.health.record(source_name, True, time.monotonic() - start)
+        logger.debug("%d résultats trouvés sur %s", len(results), source_name)
+        
+        if results:
+            status, ttl, stale_ttl = 'ok', Config.CACHE_TTL.get(source_name, Config.CACHE_TTL_DEFAULT), None
+        else:
+            status, ttl, stale_ttl = 'empty', Config.CACHE_NEGATIVE_TTL, 0
+        self.source_cache.set(key, {'results': results, 'status': status}, ttl, stale_ttl=stale_ttl)
+        return SourceOutcome(source_name, [dict(result) for result in results], status, ttl)
+    
+    def _keep_stale(self, key: str, source_name: str, stale: Optional[Dict[str, Any]],
+                    results: List[Dict[str, Any]], status: str) -> SourceOutcome:
+        """
+        Résultat d'une recherche en échec ou incomplète, mis en cache brièvement
+        
+        Un ancien résultat complet est servi de préférence ; à défaut, le résultat est
+        mémorisé pendant Config.CACHE_FAILURE_TTL pour ne pas réinterroger aussitôt la source.
+        """
+        if stale is not None and stale['status'] == 'ok':
+            # Continue de servir l'ancien résultat plutôt que l'erreur
+            self.source_cache.set(key, stale, Config.CACHE_FAILURE_TTL)
+            return SourceOutcome(source_name, [dict(result) for result in stale['results']],
+                                 'ok', Config.CACHE_FAILURE_TTL)
+        self.source_cache.set(key, {'results': results, 'status': status},
+                              Config.CACHE_FAILURE_TTL, stale_ttl=0)
+        return SourceOutcome(source_name, [dict(result) for result in results], status,
+                             Config.CACHE_FAILURE_TTL)
+    
+    async def search_async(self, query: str, language: str = 'fr') -> List[Dict[str, Any]]:
+        """
+        Effectue la recherche sur toutes les sources de manière asynchrone
+        
+        La recherche s'exécute sur la boucle du client HTTP partagé, quelle que soit
+        la boucle de l'appelant, afin de réutiliser son pool de connexions.
+        """
+        return (await self.search_with_status(query, language)).results
     
-    async def _calculate_result_score(self, result: Dict[str, Any], query: str, target_language: str) -> float:
+    async def search_with_status(self, query: str, language: str = 'fr',
+                                 cursor: Optional[str] = None) -> SearchReport:
         """
-        Calcule un score de pertinence pour un résultat
+        Effectue la recherche et indique les sources absentes de la réponse
+        
+        La réponse est renvoyée au plus tard après Config.SEARCH_DEADLINE secondes,
+        avec les résultats des sources qui ont répondu à temps. Elle contient au plus
+        Config.MAX_SEARCH_RESULTS résultats, les meilleurs de la page.
         
         Args:
-            result: Résultat de recherche
             query: Terme de recherche
-            target_language: Langue cible
+            language: Code de langue
+            cursor: Curseur de la page demandée (next_cursor d'une réponse précédente),
+                None pour la première page
             
-        Returns:
-            Score entre 0 et 1
+        Raises:
+            ValueError: Si le curseur est invalide
+        """
+        return await self.http_client.run(
+            bind_timings(current_timings(),
+                         self._search_cached(query, language, cursor, Config.MAX_SEARCH_RESULTS))
+        )
+    
+    def _first_pages(self) -> Dict[str, int]:
+        """Pages du premier lot : la première page de chaque source"""
+        return {source_name: 0 for source_name in self.sources}
+    
+    def _plan(self, cursor: Optional[str]) -> Tuple[Dict[str, int], int]:
+        """Numéro de page à demander à chaque source et rang dans le lot, pour le curseur donné"""
+        if cursor is None:
+            return self._first_pages(), 0
+        pages, offset = decode_cursor(cursor)
+        return {source_name: page for source_name, page in pages.items()
+                if source_name in self.sources}, offset
+    
+    def _next_cursor(self, pages: Dict[str, int], outcomes: List[SourceOutcome]) -> Optional[str]:
         """
-        # Calcule la similarité avec le titre (poids: 50%)
-        title_score = BookSource.calculate_similarity(query, result['title']) * 0.5
+        Curseur de la page suivante
         
-        # Calcule la similarité avec l'auteur (poids: 20%)
-        author_score = BookSource.calculate_similarity(query, result['author']) * 0.2
+        Seules les sources paginées qui ont renvoyé une page de résultats (même
+        incomplète) avancent d'une page ; les autres sont considérées comme épuisées.
+        """
+        next_pages = {
+            outcome.source_name: pages[outcome.source_name] + 1
+            for outcome in outcomes
+            if outcome.status in ('ok', 'partial') and self.sources[outcome.source_name].paginated
+            and pages[outcome.source_name] + 1 < Config.SEARCH_MAX_PAGES
+        }
+        return encode_cursor(next_pages) if next_pages else None
+    
+    def _batch_key(self, language: str, query: str, pages: Dict[str, int]) -> str:
+        """Clé du cache des requêtes pour un lot de résultats"""
+        if pages == self._first_pages():
+            return make_cache_key(language, query)
+        return make_cache_key(language, encode_cursor(pages), query)
+    
+    @staticmethod
+    def _rank(results: List[Dict[str, Any]], offset: int = 0,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Résultats de rang offset à offset + limit, par score décroissant
         
-        # Score de langue (poids: 30%)
-        language_score = 0.0
-        if 'language' in result:
-            # Correspondance exacte de la langue
-            if result['language'].lower() == target_language.lower():
-                language_score = 0.3
-            # Bonus partiel pour l'anglais si ce n'est pas la langue cible
-            # (car c'est souvent une langue acceptable comme alternative)
-            elif result['language'].lower() == 'en' and target_language.lower() != 'en':
-                language_score = 0.15
+        Avec une limite, seuls les offset + limit meilleurs résultats sont sélectionnés
+        (tas binaire), sans trier tout le lot.
+        """
+        with timed('rank'):
+            if limit is None:
+                ranked = sorted(results, key=lambda x: x.get('score', 0), reverse=True)
+            else:
+                ranked = heapq.nlargest(offset + limit, results, key=lambda x: x.get('score', 0))
+            return [dict(result) for result in ranked[offset:]]
+    
+    @staticmethod
+    def _following(pages: Dict[str, int], offset: int, limit: Optional[int], batch_size: int,
+                   next_batch: Optional[str]) -> Optional[str]:
+        """Curseur de la page qui suit : la suite du lot, ou à défaut le lot suivant"""
+        if limit is not None and offset + limit < min(batch_size, MAX_CURSOR_OFFSET):
+            return encode_cursor(pages, offset + limit)
+        return next_batch
+    
+    @staticmethod
+    def _unpack(cached: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Résultats et curseur suivant d'une entrée du cache des requêtes"""
+        if isinstance(cached, list):
+            # Entrée écrite avant la pagination
+            return cached, None
+        return cached['results'], cached['next_cursor']
+    
+    async def _search_cached(self, query: str, language: str, cursor: Optional[str] = None,
+                             limit: Optional[int] = None) -> SearchReport:
+        """
+        Sert la recherche depuis le cache des requêtes, ou interroge les sources
         
-        # Le score final est la somme des trois scores
-        return title_score + author_score + language_score
+        Le cache contient des lots : tous les résultats fusionnés d'une page de chaque
+        source. Une réponse en contient au plus limit, choisis par rang dans le lot.
+        Une entrée expirée mais encore servable est renvoyée immédiatement et
+        rafraîchie en arrière-plan. Le lot suivant est préparé en arrière-plan.
+        """
+        start = time.monotonic()
+        with QUERIES_IN_FLIGHT.track_inprogress():
+            pages, offset = self._plan(cursor)
+            key = self._batch_key(language, query, pages)
+            cached, state = self.query_cache.get(key)
+            if state != MISS:
+                batch, next_batch = self._unpack(cached)
+                if state == STALE:
+                    self._schedule_refresh(key, query, language, pages)
+                self._schedule_prefetch(query, language, next_batch)
+                results = self._rank(batch, offset, limit)
+                log_search_summary(query, language, [], time.monotonic() - start, len(results), cache=state)
+                QUERY_LATENCY.labels(state).observe(time.monotonic() - start)
+                return SearchReport(results, 0, [], [],
+                                    self._following(pages, offset, limit, len(batch), next_batch))
+            
+            report = await self._search_shared(key, query, language, pages)
+            self._schedule_prefetch(query, language, report.next_cursor)
+            QUERY_LATENCY.labels(MISS).observe(time.monotonic() - start)
+            return report._replace(
+                results=self._rank(report.results, offset, limit),
+                next_cursor=self._following(pages, offset, limit, len(report.results), report.next_cursor)
+            )
     
-    async def search_async(self, query: str, language: str = 'fr') -> List[Dict[str, Any]]:
-        """Effectue la recherche sur toutes les sources de manière asynchrone"""
-        print(f"\nDémarrage de la recherche pour '{query}' en langue '{language}'")
-        tasks = []
+    async def _search_shared(self, key: str, query: str, language: str,
+                             pages: Dict[str, int]) -> SearchReport:
+        """
+        Interroge les sources pour un lot absent du cache et le met en cache
+        
+        Les recherches identiques simultanées, de ce worker ou d'un autre, partagent
+        une seule interrogation des sources (voir SingleFlight).
+        """
+        shared, flight = await self.flights.acquire(key, lambda: self._peek_batch(key))
+        if flight is None:
+            return shared
+        with flight:
+            report = await self._search_all(query, language, pages)
+            self._store_results(key, report.results, report.ttl, report.next_cursor)
+            flight.finish(report)
+        return report
+    
+    def _peek_batch(self, key: str) -> Optional[SearchReport]:
+        """Lot frais mis en cache par un autre worker, ou None"""
+        cached = self.query_cache.peek_fresh(key)
+        if cached is None:
+            return None
+        results, next_cursor = self._unpack(cached)
+        return SearchReport(results, 0, [], [], next_cursor)
+    
+    def _store_results(self, key: str, results: List[Dict[str, Any]], ttl: float,
+                       next_cursor: Optional[str] = None):
+        """Met en cache un lot de résultats, avec le curseur du lot suivant"""
+        if not results or ttl <= 0:
+            # Un résultat vide vient le plus souvent de sources indisponibles
+            return
+        self.query_cache.set(key, {'results': results, 'next_cursor': next_cursor}, ttl)
+    
+    def _schedule_refresh(self, key: str, query: str, language: str, pages: Dict[str, int] = None):
+        """Lance le rafraîchissement d'une entrée expirée du cache des requêtes"""
+        self._run_in_background(key, self._refresh(key, query, language, pages))
+    
+    def _schedule_prefetch(self, query: str, language: str, cursor: Optional[str]):
+        """
+        Prépare en arrière-plan le lot désigné par le curseur, s'il n'est pas en cache
+        
+        Au-delà de Config.SEARCH_PREFETCH_MAX_IN_FLIGHT lots en préparation, le lot
+        n'est pas préparé : sous forte charge, les premières pages restent prioritaires.
+        """
+        if cursor is None or not Config.SEARCH_PREFETCH_NEXT_PAGE:
+            return
+        if len(self._prefetching) >= Config.SEARCH_PREFETCH_MAX_IN_FLIGHT:
+            return
+        pages, _ = self._plan(cursor)
+        key = self._batch_key(language, query, pages)
+        if key in self._refreshing:
+            return
+        # Réservé dès maintenant, pour que les recherches simultanées voient la limite
+        self._prefetching.add(key)
+        self._run_in_background(key, self._prefetch(key, query, language, pages))
+    
+    async def _prefetch(self, key: str, query: str, language: str, pages: Dict[str, int]):
+        """Met en cache le lot désigné par les numéros de page"""
+        try:
+            if self.query_cache.get_entry(key)[1] == FRESH:
+                return
+            logger.debug("Préparation de la page suivante")
+            await self._refresh(key, query, language, pages)
+        finally:
+            self._prefetching.discard(key)
+    
+    async def shutdown(self):
+        """Annule les rafraîchissements en arrière-plan lancés sur la boucle courante"""
+        loop = asyncio.get_running_loop()
+        tasks = [task for task in self._background_tasks if task.get_loop() is loop]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _run_in_background(self, key: str, coro):
+        """Exécute un rafraîchissement en arrière-plan, une seule fois par clé"""
+        if key in self._refreshing:
+            coro.close()
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        task.add_done_callback(lambda _: self._refreshing.discard(key))
+    
+    async def _refresh(self, key: str, query: str, language: str, pages: Dict[str, int] = None):
+        """Rafraîchit une entrée du cache des requêtes"""
+        try:
+            await self._search_shared(key, query, language, pages or self._first_pages())
+        except Exception:
+            logger.exception("Erreur lors du rafraîchissement du cache")
+    
+    async def _search_all(self, query: str, language: str, pages: Dict[str, int] = None) -> SearchReport:
+        """
+        Interroge les sources, calcule les scores et fusionne les doublons
+        
+        Les sources qui n'ont pas répondu à l'expiration de Config.SEARCH_DEADLINE
+        sont annulées et signalées dans le rapport. Un enregistrement récapitulatif
+        est journalisé pour chaque recherche.
+        
+        Args:
+            query: Terme de recherche
+            language: Code de langue
+            pages: Numéro de page par source ; par défaut, la première page de chacune
+        """
+        start = time.monotonic()
+        if pages is None:
+            pages = self._first_pages()
+        tasks = {}
         
         # Crée une tâche asynchrone pour chaque source
-        for source_name, source in self.sources.items():
+        for source_name, page in pages.items():
             task = asyncio.create_task(
-                self._search_source(source_name, source, query, language)
+                self._search_source(source_name, self.sources[source_name], query, language, page)
             )
-            tasks.append(task)
+            tasks[task] = source_name
         
-        # Attend que toutes les tâches soient terminées
-        results = await asyncio.gather(*tasks)
+        # Attend les sources jusqu'au délai global, puis abandonne les retardataires
+        if tasks:
+            await asyncio.wait(tasks, timeout=Config.SEARCH_DEADLINE)
+        outcomes = []
+        for task, source_name in tasks.items():
+            if not task.done():
+                task.cancel()
+                logger.warning("Délai global dépassé, %s abandonnée", source_name)
+                outcomes.append(SourceOutcome(source_name, [], 'timeout', 0, time.monotonic() - start))
+            elif task.exception() is not None:
+                logger.error("Erreur lors de la recherche sur %s", source_name,
+                             exc_info=task.exception())
+                outcomes.append(SourceOutcome(source_name, [], 'error', 0, time.monotonic() - start))
+            else:
+                outcomes.append(task.result())
         
-        # Fusionne et trie les résultats
+        # Rassemble les résultats ; ils ne sont classés qu'au moment de servir une page
         all_results = []
-        for source_results in results:
-            print(f"Ajout de {len(source_results)} résultats")
-            all_results.extend(source_results)
+        for outcome in outcomes:
+            all_results.extend(outcome.results)
+        ttl = min((outcome.ttl for outcome in outcomes), default=0)
         
-        print(f"Calcul des scores pour {len(all_results)} résultats...")
-        # Calcule un score pour chaque résultat
-        for result in all_results:
-            result['score'] = await self._calculate_result_score(result, query, language)
+        await self._score_results(all_results, query, language)
+        all_results = self._merge_results(all_results)
+        log_search_summary(query, language, outcomes, time.monotonic() - start, len(all_results))
         
-        # Trie par score décroissant
-        all_results.sort(key=lambda x: x.get('score', 0), reverse=True)
+        return SearchReport(
+            all_results,
+            ttl,
+            [outcome.source_name for outcome in outcomes if outcome.status == 'timeout'],
+            [outcome.source_name for outcome in outcomes if outcome.status in FAILED_STATUSES],
+            self._next_cursor(pages, outcomes)
+        )
+    
+    @staticmethod
+    def _merge_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Regroupe les doublons d'une liste de résultats notés"""
+        with timed('merge'):
+            return merge_duplicates(results)
+    
+    async def _score_results(self, results: List[Dict[str, Any]], query: str, language: str):
+        """Calcule le score de chaque résultat (le classement est fait par _rank)"""
+        with timed('score'):
+            # Calcule les scores du lot en une passe
+            for result, score in zip(results, QueryScorer(query, language).score(results)):
+                result['score'] = score
+    
+    async def iter_search(self, query: str, language: str = 'fr',
+                          cursor: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Effectue la recherche en renvoyant les résultats de chaque source dès leur arrivée
         
-        print(f"\nRésultats finaux :")
-        print(f"- Nombre total : {len(all_results)}")
-        for result in all_results[:5]:  # Affiche les 5 premiers résultats
-            print(f"- {result.get('title', 'Sans titre')} (score: {result.get('score', 0):.2f})")
+        Doit être parcouru sur la boucle du client HTTP (voir HttpClient.iterate).
         
-        return all_results
+        Tous les résultats du lot sont émis, sans limite de nombre : le navigateur
+        les insère à leur place d'après leur score.
+        
+        Yields:
+            Un événement {'type': 'results', 'source', 'status', 'results'} par source
+            (ou un seul, de source None, si le lot est en cache, déjà entamé ou servi par
+            une recherche identique en cours), suivi d'un événement {'type': 'update',
+            'source', 'results'} si la source complète des résultats déjà émis, puis un
+            événement final {'type': 'done', 'timed_out', 'failed', 'next_cursor'}
+            
+            Les résultats d'un événement update remplacent ceux déjà émis dont l'URL est
+            donnée par leur champ replaces : ils portent les liens des doublons arrivés
+            depuis, et peuvent avoir changé d'entrée principale (et donc d'URL et de score).
+            
+        Raises:
+            ValueError: Si le curseur est invalide
+        """
+        QUERIES_IN_FLIGHT.inc()
+        try:
+            async for event in self._iter_search(query, language, cursor):
+                yield event
+        finally:
+            QUERIES_IN_FLIGHT.dec()
+    
+    async def _iter_search(self, query: str, language: str,
+                           cursor: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Implémentation de iter_search"""
+        start = time.monotonic()
+        pages, offset = self._plan(cursor)
+        key = self._batch_key(language, query, pages)
+        cached, state = self.query_cache.get(key)
+        if state != MISS:
+            batch, next_cursor = self._unpack(cached)
+            if state == STALE:
+                self._schedule_refresh(key, query, language, pages)
+            self._schedule_prefetch(query, language, next_cursor)
+            log_search_summary(query, language, [], time.monotonic() - start, len(batch), cache=state)
+            QUERY_LATENCY.labels(state).observe(time.monotonic() - start)
+            yield {'type': 'results', 'source': None, 'status': 'cached',
+                   'results': self._rank(batch, offset)}
+            yield {'type': 'done', 'timed_out': [], 'failed': [], 'next_cursor': next_cursor}
+            return
+        
+        if offset:
+            # Suite d'un lot déjà entamé : le lot est classé avant d'émettre les résultats restants
+            report = await self._search_shared(key, query, language, pages)
+        else:
+            report, flight = await self.flights.acquire(key, lambda: self._peek_batch(key))
+            if flight is not None:
+                with flight:
+                    async for event in self._stream_sources(key, query, language, pages, flight, start):
+                        yield event
+                return
+        
+        # Lot entamé, ou servi par une recherche identique en cours : il est émis d'un bloc
+        QUERY_LATENCY.labels(MISS).observe(time.monotonic() - start)
+        yield {'type': 'results', 'source': None, 'status': 'ok',
+               'results': self._rank(report.results, offset)}
+        yield {'type': 'done', 'timed_out': report.timed_out, 'failed': report.failed,
+               'next_cursor': report.next_cursor}
+    
+    async def _stream_sources(self, key: str, query: str, language: str, pages: Dict[str, int],
+                              flight, start: float) -> AsyncIterator[Dict[str, Any]]:
+        """Interroge les sources pour iter_search et émet leurs résultats dès leur arrivée"""
+        tasks = {
+            asyncio.create_task(self._search_source(source_name, self.sources[source_name],
+                                                    query, language, page)): source_name
+            for source_name, page in pages.items()
+        }
+        outcomes = []
+        # Les doublons de résultats déjà émis ne sont pas réémis : l'entrée qu'ils
+        # complètent l'est à nouveau, désignée par l'URL sous laquelle elle a été émise
+        merger = ResultMerger()
+        emitted: Dict[int, str] = {}
+        try:
+            for next_outcome in asyncio.as_completed(tasks, timeout=Config.SEARCH_DEADLINE):
+                try:
+                    outcome = await next_outcome
+                except asyncio.TimeoutError:
+                    break
+                except Exception:
+                    logger.exception("Erreur lors de la recherche")
+                    continue
+                outcomes.append(outcome)
+                results = [dict(result) for result in outcome.results]
+                await self._score_results(results, query, language)
+                results = merger.add(results)
+                emitted.update((id(entry), entry['url']) for entry in results)
+                yield {'type': 'results', 'source': outcome.source_name,
+                       'status': outcome.status, 'results': results}
+                if merger.updated:
+                    yield {'type': 'update', 'source': outcome.source_name,
+                           'results': [{**entry, 'replaces': emitted[id(entry)]}
+                                       for entry in merger.updated]}
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        
+        answered = {outcome.source_name for outcome in outcomes}
+        timed_out = [outcome.source_name for outcome in outcomes if outcome.status == 'timeout']
+        timed_out += [source_name for source_name in tasks.values() if source_name not in answered]
+        failed = [outcome.source_name for outcome in outcomes if outcome.status in FAILED_STATUSES]
+        elapsed = time.monotonic() - start
+        log_search_summary(query, language,
+                           outcomes + [SourceOutcome(source_name, [], 'timeout', 0, elapsed)
+                                       for source_name in tasks.values() if source_name not in answered],
+                           elapsed, sum(len(outcome.results) for outcome in outcomes))
+        QUERY_LATENCY.labels(MISS).observe(elapsed)
+        
+        # Le lot fusionné au fil des sources est transmis aux recherches identiques et,
+        # s'il est complet, mis en cache comme pour une recherche classique
+        next_cursor = self._next_cursor(pages, outcomes)
+        ttl = 0 if timed_out else min((outcome.ttl for outcome in outcomes), default=0)
+        self._store_results(key, merger.results, ttl, next_cursor)
+        flight.finish(SearchReport(merger.results, ttl, timed_out, failed, next_cursor))
+        self._schedule_prefetch(query, language, next_cursor)
+        
+        yield {'type': 'done', 'timed_out': timed_out, 'failed': failed, 'next_cursor': next_cursor}
     
     def search(self, query: str, language: str = 'fr') -> List[Dict[str, Any]]:
         """Interface synchrone pour la recherche (utilise asyncio en interne)"""
         try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # Si une boucle est déjà en cours, utilise run_coroutine_threadsafe
-                future = asyncio.run_coroutine_threadsafe(
-                    self.search_async(query, language),
-                    loop
-                )
-                return future.result()
-            else:
-                # Sinon, utilise run_until_complete
-                return loop.run_until_complete(self.search_async(query, language))
-        except Exception as e:
-            print(f"❌ Erreur lors de la recherche synchrone: {str(e)}")
+            return self.http_client.run_sync(
+                bind_timings(current_timings(),
+                             self._search_cached(query, language, limit=Config.MAX_SEARCH_RESULTS))
+            ).results
+        except Exception:
+            logger.exception("Erreur lors de la recherche synchrone")
             return []
@@ -0,0 +1,207 @@
+"""
+Regroupement des recherches identiques simultanées (single-flight)
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Callable, Optional, Tuple
+
+from app.core.config import Config
+from app.core.metrics import COALESCED_QUERIES
+from app.core.storage import SharedStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+class Flight:
+    """
+    Recherche menée pour le compte de toutes les recherches identiques
+    
+    S'utilise comme gestionnaire de contexte : à la sortie, le bail partagé est
+    rendu et, si finish n'a pas été appelé (erreur, annulation), les recherches en
+    attente sont libérées pour mener la leur.
+    """
+    
+    def __init__(self, group: 'SingleFlight', key: str, future: asyncio.Future, token: Optional[str]):
+        self.group = group
+        self.key = key
+        self.future = future
+        self.token = token
+    
+    def finish(self, result: Any):
+        """Transmet le résultat aux recherches qui attendent, dans ce worker et dans les autres"""
+        if not self.future.done():
+            self.future.set_result(result)
+            self.group._publish(self, result)
+    
+    def __enter__(self) -> 'Flight':
+        return self
+    
+    def __exit__(self, *exc_info):
+        if not self.future.done():
+            self.future.cancel()
+        self.group._release(self)
+
+class SingleFlight:
+    """
+    Fait partager une seule interrogation des sources aux recherches identiques
+    
+    Les clés sont celles du cache des requêtes, donc calculées sur la requête
+    normalisée. Dans un worker, la première recherche d'une clé la mène et les
+    suivantes attendent son résultat. Entre workers, la recherche qui mène prend
+    un bail dans le stockage partagé ; les autres workers attendent que le
+    résultat apparaisse dans le cache partagé, au plus jusqu'à l'expiration du
+    bail (Config.SINGLEFLIGHT_LEASE_TTL).
+    
+    Le résultat est aussi publié à part, sous la clé du bail et le jeton de son
+    détenteur, pendant Config.SINGLEFLIGHT_RESULT_TTL : un résultat que le cache
+    ne garde pas (réponse partielle, lot vide) parvient ainsi aux workers qui
+    attendaient ce bail, au lieu qu'ils relancent la recherche. Ils ne tentent de prendre
+    le bail à leur tour que si la recherche a été abandonnée.
+    """
+    
+    NAMESPACE = 'flights'
+    
+    def __init__(self, storage: Optional[SharedStorage] = None,
+                 encode: Callable[[Any], str] = json.dumps, decode: Callable[[str], Any] = json.loads):
+        """
+        Args:
+            storage: Stockage partagé des baux et des résultats publiés
+            encode: Sérialise un résultat pour les autres workers
+            decode: Relit un résultat publié par un autre worker
+        """
+        self.storage = storage or get_storage()
+        self.encode = encode
+        self.decode = decode
+        self._flights = {}
+        self._publications = 0
+    
+    async def acquire(self, key: str, lookup: Callable[[], Optional[Any]]) -> Tuple[Optional[Any], Optional[Flight]]:
+        """
+        Rejoint la recherche en cours pour cette clé, ou en prend la direction
+        
+        Args:
+            key: Clé de la recherche
+            lookup: Lit le résultat mis en cache par un autre worker (None s'il est absent)
+        
+        Returns:
+            Tuple (résultat partagé, None), ou (None, vol à mener) si aucune recherche
+            identique n'est en cours : l'appelant interroge alors les sources et
+            transmet son résultat par Flight.finish
+        """
+        while True:
+            future = self._flights.get(key)
+            if future is not None:
+                try:
+                    # Le bouclier protège la recherche partagée de l'annulation d'un appelant
+                    result = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                    # Recherche abandonnée par celle qui la menait : on recommence
+                    continue
+                COALESCED_QUERIES.labels('worker').inc()
+                return result, None
+            
+            token, owner = self._take_lease(key)
+            if token is not None:
+                future = asyncio.get_running_loop().create_future()
+                self._flights[key] = future
+                return None, Flight(self, key, future, token)
+            
+            # Un autre worker interroge les sources : on attend son résultat
+            result = await self._wait_shared(key, owner, lookup)
+            if result is not None:
+                COALESCED_QUERIES.labels('shared').inc()
+                return result, None
+    
+    def _take_lease(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Prend le bail partagé d'une clé
+        
+        Returns:
+            Tuple (jeton du bail, None) ; ('', None) si le stockage est indisponible
+            (on mène sans bail) ; (None, jeton du détenteur) si un autre worker
+            détient le bail
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        until = now + Config.SINGLEFLIGHT_LEASE_TTL
+        
+        def take(value):
+            if value and json.loads(value)['until'] > now:
+                return value
+            return json.dumps({'owner': token, 'until': until})
+        
+        try:
+            lease = json.loads(self.storage.update(self.NAMESPACE, key, take, until))
+        except Exception as e:
+            logger.warning("Bail de recherche indisponible: %s", e)
+            return '', None
+        if lease['owner'] == token:
+            return token, None
+        return None, lease['owner']
+    
+    @staticmethod
+    def _result_key(key: str, owner: str) -> str:
+        return f'{key}#{owner}'
+    
+    def _lease_held(self, key: str, owner: str) -> bool:
+        """Indique si le bail de cette clé est toujours détenu par owner"""
+        try:
+            row = self.storage.get(self.NAMESPACE, key)
+        except Exception:
+            return False
+        if row is None:
+            return False
+        lease = json.loads(row[0])
+        return lease['owner'] == owner and lease['until'] > time.time()
+    
+    def _published(self, key: str, owner: str) -> Optional[Any]:
+        """Résultat publié par le détenteur du bail, ou None"""
+        try:
+            row = self.storage.get(self.NAMESPACE, self._result_key(key, owner))
+            return self.decode(row[0]) if row else None
+        except Exception as e:
+            logger.warning("Résultat de recherche partagé illisible: %s", e)
+            return None
+    
+    async def _wait_shared(self, key: str, owner: str, lookup: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """Attend le résultat du worker qui détient le bail, tant que son bail court"""
+        while True:
+            result = lookup()
+            if result is not None:
+                return result
+            if not self._lease_held(key, owner):
+                # Bail rendu ou expiré : le résultat a pu être mis en cache ou publié juste avant
+                result = lookup()
+                return result if result is not None else self._published(key, owner)
+            await asyncio.sleep(Config.SINGLEFLIGHT_POLL_INTERVAL)
+    
+    def _publish(self, flight: Flight, result: Any):
+        """Publie le résultat d'une recherche pour les workers qui attendent son bail"""
+        if not flight.token:
+            return
+        try:
+            self.storage.set(self.NAMESPACE, self._result_key(flight.key, flight.token),
+                             self.encode(result), time.time() + Config.SINGLEFLIGHT_RESULT_TTL)
+            self._publications += 1
+            if self._publications % Config.SINGLEFLIGHT_PRUNE_INTERVAL == 0:
+                self.storage.prune(self.NAMESPACE, Config.SINGLEFLIGHT_MAX_ENTRIES)
+        except Exception as e:
+            logger.warning("Impossible de publier le résultat de recherche: %s", e)
+    
+    def _release(self, flight: Flight):
+        """Rend le bail d'une recherche terminée"""
+        if self._flights.get(flight.key) is flight.future:
+            del self._flights[flight.key]
+        if not flight.token:
+            return
+        try:
+            row = self.storage.get(self.NAMESPACE, flight.key)
+            if row is not None and json.loads(row[0])['owner'] == flight.token:
+                self.storage.delete(self.NAMESPACE, flight.key)
+        except Exception as e:
+            logger.warning("Impossible de rendre le bail de recherche: %s", e)
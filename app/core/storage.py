@@ -0,0 +1,337 @@
+"""
+Stockage local partagé entre les workers gunicorn
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from app.core.config import Config
+
+class SharedStorage(ABC):
+    """
+    Interface des stockages clé/valeur utilisés par le cache, le disjoncteur, le
+    débit sortant et le limiteur de requêtes
+    
+    Les valeurs sont des chaînes regroupées par espace de noms, avec une date
+    d'expiration ; les entrées expirées ne sont plus lues. Chaque opération doit
+    rester bien en deçà de la milliseconde : elles sont appelées sur le chemin de
+    chaque requête (voir la section storage des bancs d'essai).
+    """
+    
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Tuple[str, float, float]]:
+        """Lit une entrée non expirée : (valeur, date de stockage, date d'expiration) ou None"""
+    
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: str, expires_at: float,
+            stored_at: Optional[float] = None):
+        """Écrit ou remplace une entrée"""
+    
+    @abstractmethod
+    def update(self, namespace: str, key: str, func: Callable[[Optional[str]], str],
+               expires_at: float) -> str:
+        """Lit puis réécrit une entrée de manière atomique ; retourne la nouvelle valeur"""
+    
+    @abstractmethod
+    def incr(self, namespace: str, key: str, amount: int, expires_at: float) -> int:
+        """
+        Incrémente un compteur de manière atomique
+        
+        Un compteur absent ou expiré repart de zéro avec la date d'expiration
+        donnée ; sinon il conserve la sienne.
+        
+        Returns:
+            Nouvelle valeur du compteur
+        """
+    
+    @abstractmethod
+    def scan(self, namespace: str) -> List[Tuple[str, str]]:
+        """Liste les entrées non expirées d'un espace de noms : (clé, valeur)"""
+    
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        """Supprime une entrée"""
+    
+    @abstractmethod
+    def prune(self, namespace: str, max_entries: int):
+        """Supprime les entrées expirées puis les plus anciennes au-delà de max_entries"""
+    
+    @abstractmethod
+    def clear(self, namespace: str):
+        """Supprime toutes les entrées d'un espace de noms"""
+
+class SQLiteStorage(SharedStorage):
+    """
+    Stockage clé/valeur partagé entre processus, adossé à un fichier SQLite
+    
+    Le fichier est placé par défaut dans /dev/shm (le worker_tmp_dir de gunicorn),
+    donc en mémoire. Les valeurs sont des chaînes regroupées par espace de noms,
+    avec une date d'expiration ; chaque processus et chaque thread ouvre sa
+    propre connexion.
+    
+    Une écriture attend au plus Config.SHARED_STORAGE_BUSY_TIMEOUT que les autres
+    processus libèrent le verrou. Appelée depuis une boucle d'événements (worker
+    ASGI, boucle du client HTTP), elle n'attend que
+    Config.SHARED_STORAGE_LOOP_BUSY_TIMEOUT : l'attente bloque toutes les requêtes
+    de la boucle, et l'opération échoue plutôt (sqlite3.OperationalError).
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Chemin du fichier SQLite
+        """
+        self.path = path
+        self._local = threading.local()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant, en la rouvrant après un fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            self._set_busy_timeout(conn)
+            return conn
+        conn = sqlite3.connect(self.path, timeout=Config.SHARED_STORAGE_BUSY_TIMEOUT,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' namespace TEXT NOT NULL,'
+            ' key TEXT NOT NULL,'
+            ' value TEXT NOT NULL,'
+            ' stored_at REAL NOT NULL,'
+            ' expires_at REAL NOT NULL,'
+            ' PRIMARY KEY (namespace, key))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS entries_expiry ON entries (namespace, expires_at)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        self._local.busy_timeout = None
+        self._set_busy_timeout(conn)
+        return conn
+    
+    def _set_busy_timeout(self, conn: sqlite3.Connection):
+        """Ajuste l'attente du verrou selon que l'appel bloque ou non une boucle d'événements"""
+        try:
+            asyncio.get_running_loop()
+            timeout = Config.SHARED_STORAGE_LOOP_BUSY_TIMEOUT
+        except RuntimeError:
+            timeout = Config.SHARED_STORAGE_BUSY_TIMEOUT
+        if self._local.busy_timeout != timeout:
+            conn.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+            self._local.busy_timeout = timeout
+    
+    def get(self, namespace: str, key: str) -> Optional[Tuple[str, float, float]]:
+        """
+        Lit une entrée non expirée
+        
+        Returns:
+            Tuple (valeur, date de stockage, date d'expiration) ou None
+        """
+        row = self._connect().execute(
+            'SELECT value, stored_at, expires_at FROM entries '
+            'WHERE namespace = ? AND key = ? AND expires_at > ?',
+            (namespace, key, time.time())
+        ).fetchone()
+        return tuple(row) if row else None
+    
+    def set(self, namespace: str, key: str, value: str, expires_at: float,
+            stored_at: Optional[float] = None):
+        """Écrit ou remplace une entrée"""
+        self._connect().execute(
+            'INSERT OR REPLACE INTO entries (namespace, key, value, stored_at, expires_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (namespace, key, value, stored_at or time.time(), expires_at)
+        )
+    
+    def update(self, namespace: str, key: str, func: Callable[[Optional[str]], str],
+               expires_at: float) -> str:
+        """
+        Lit puis réécrit une entrée de manière atomique, y compris entre processus
+        
+        Args:
+            namespace: Espace de noms
+            key: Clé de l'entrée
+            func: Fonction qui reçoit la valeur courante (None si absente ou expirée)
+                  et retourne la nouvelle valeur
+            expires_at: Date d'expiration de la nouvelle valeur
+            
+        Returns:
+            Nouvelle valeur
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?',
+                (namespace, key, now)
+            ).fetchone()
+            value = func(row[0] if row else None)
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (namespace, key, value, stored_at, expires_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (namespace, key, value, now, expires_at)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+    
+    def incr(self, namespace: str, key: str, amount: int, expires_at: float) -> int:
+        """Incrémente un compteur en une seule instruction, sans transaction explicite"""
+        now = time.time()
+        row = self._connect().execute(
+            'INSERT INTO entries (namespace, key, value, stored_at, expires_at) '
+            'VALUES (?1, ?2, ?3, ?4, ?5) '
+            'ON CONFLICT (namespace, key) DO UPDATE SET '
+            ' value = CASE WHEN expires_at > ?4 THEN CAST(value AS INTEGER) + ?3 ELSE ?3 END,'
+            ' stored_at = ?4,'
+            ' expires_at = CASE WHEN expires_at > ?4 THEN expires_at ELSE ?5 END '
+            'RETURNING value',
+            (namespace, key, amount, now, expires_at)
+        ).fetchone()
+        return int(row[0])
+    
+    def scan(self, namespace: str) -> List[Tuple[str, str]]:
+        """Liste les entrées non expirées d'un espace de noms : (clé, valeur)"""
+        return [tuple(row) for row in self._connect().execute(
+            'SELECT key, value FROM entries WHERE namespace = ? AND expires_at > ?',
+            (namespace, time.time())
+        )]
+    
+    def delete(self, namespace: str, key: str):
+        """Supprime une entrée"""
+        self._connect().execute('DELETE FROM entries WHERE namespace = ? AND key = ?',
+                                (namespace, key))
+    
+    def prune(self, namespace: str, max_entries: int):
+        """
+        Supprime les entrées expirées puis les plus anciennes au-delà de max_entries
+        
+        Args:
+            namespace: Espace de noms à nettoyer
+            max_entries: Nombre maximum d'entrées conservées
+        """
+        conn = self._connect()
+        conn.execute('DELETE FROM entries WHERE namespace = ? AND expires_at <= ?',
+                     (namespace, time.time()))
+        conn.execute(
+            'DELETE FROM entries WHERE namespace = ? AND key IN ('
+            ' SELECT key FROM entries WHERE namespace = ?'
+            ' ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+            (namespace, namespace, max_entries)
+        )
+    
+    def clear(self, namespace: str):
+        """Supprime toutes les entrées d'un espace de noms"""
+        self._connect().execute('DELETE FROM entries WHERE namespace = ?', (namespace,))
+
+class MemoryStorage(SharedStorage):
+    """
+    Stockage en mémoire, propre au processus
+    
+    Pour un serveur à un seul worker et pour les tests : les autres workers ne
+    voient pas ses entrées.
+    """
+    
+    def __init__(self):
+        self._namespaces: Dict[str, Dict[str, Tuple[str, float, float]]] = {}
+        self._lock = threading.Lock()
+    
+    def _entries(self, namespace: str) -> Dict[str, Tuple[str, float, float]]:
+        return self._namespaces.setdefault(namespace, {})
+    
+    def _live(self, namespace: str, key: str, now: float) -> Optional[Tuple[str, float, float]]:
+        entry = self._entries(namespace).get(key)
+        return entry if entry is not None and entry[2] > now else None
+    
+    def get(self, namespace: str, key: str) -> Optional[Tuple[str, float, float]]:
+        with self._lock:
+            return self._live(namespace, key, time.time())
+    
+    def set(self, namespace: str, key: str, value: str, expires_at: float,
+            stored_at: Optional[float] = None):
+        with self._lock:
+            self._entries(namespace)[key] = (value, stored_at or time.time(), expires_at)
+    
+    def update(self, namespace: str, key: str, func: Callable[[Optional[str]], str],
+               expires_at: float) -> str:
+        with self._lock:
+            now = time.time()
+            entry = self._live(namespace, key, now)
+            value = func(entry[0] if entry else None)
+            self._entries(namespace)[key] = (value, now, expires_at)
+            return value
+    
+    def incr(self, namespace: str, key: str, amount: int, expires_at: float) -> int:
+        with self._lock:
+            now = time.time()
+            entry = self._live(namespace, key, now)
+            if entry is not None:
+                count, expires_at = int(entry[0]) + amount, entry[2]
+            else:
+                count = amount
+            self._entries(namespace)[key] = (str(count), now, expires_at)
+            return count
+    
+    def scan(self, namespace: str) -> List[Tuple[str, str]]:
+        with self._lock:
+            now = time.time()
+            return [(key, entry[0]) for key, entry in self._entries(namespace).items() if entry[2] > now]
+    
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._entries(namespace).pop(key, None)
+    
+    def prune(self, namespace: str, max_entries: int):
+        with self._lock:
+            now = time.time()
+            entries = self._entries(namespace)
+            live = sorted(((entry[1], key) for key, entry in entries.items() if entry[2] > now),
+                          reverse=True)
+            keep = {key for _, key in live[:max_entries]}
+            for key in [key for key in entries if key not in keep]:
+                del entries[key]
+    
+    def clear(self, namespace: str):
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+
+def storage_from_uri(uri: str) -> SharedStorage:
+    """
+    Crée le stockage désigné par une URI
+    
+    - sqlite:///chemin/du/fichier.sqlite3 : fichier SQLite partagé entre les workers ;
+    - memory:// : mémoire du processus, non partagée.
+    
+    Raises:
+        ValueError: Si le schéma de l'URI n'est pas pris en charge
+    """
+    parsed = urlparse(uri)
+    if parsed.scheme == 'sqlite':
+        path = unquote(parsed.netloc + parsed.path)
+        if not path:
+            raise ValueError(f"Chemin manquant dans l'URI de stockage : {uri}")
+        return SQLiteStorage(path)
+    if parsed.scheme == 'memory':
+        return MemoryStorage()
+    raise ValueError(f"Stockage partagé non pris en charge : {uri}")
+
+_storage: Optional[SharedStorage] = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> SharedStorage:
+    """Retourne le stockage partagé configuré par Config.SHARED_STORAGE_URI"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = storage_from_uri(Config.SHARED_STORAGE_URI)
+        return _storage
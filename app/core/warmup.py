@@ -0,0 +1,242 @@
+"""
+Préchauffage des caches à partir des requêtes les plus fréquentes
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs
+
+from app.core.cache import make_cache_key, normalize_query
+from app.core.config import Config
+from app.core.outbound import OutboundScheduler, get_outbound_scheduler
+from app.core.storage import SharedStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+# Ligne de requête d'une recherche dans le journal d'accès, suivie du code de réponse
+ACCESS_LOG_SEARCH = re.compile(r'"GET /search(?:/stream)?\?(\S*) HTTP/[\d.]+" (\d{3}) ')
+
+class QueryLog:
+    """
+    Table de fréquence des requêtes, dans le stockage partagé
+    
+    Seules les premières pages des recherches sont comptées, sous leur forme
+    normalisée (celle des clés du cache) et sans aucune information sur le client.
+    Les compteurs expirent après Config.WARMUP_HISTORY_TTL.
+    """
+    
+    NAMESPACE = 'popularity'
+    
+    def __init__(self, storage: Optional[SharedStorage] = None):
+        self.storage = storage or get_storage()
+        self._records = 0
+        self._lock = threading.Lock()
+    
+    def record(self, query: str, language: str):
+        """Compte une recherche"""
+        key = make_cache_key(language, query)
+        try:
+            self.storage.incr(self.NAMESPACE, key, 1, time.time() + Config.WARMUP_HISTORY_TTL)
+            with self._lock:
+                self._records += 1
+                prune = self._records % Config.WARMUP_HISTORY_PRUNE_INTERVAL == 0
+            if prune:
+                self.storage.prune(self.NAMESPACE, Config.WARMUP_HISTORY_MAX_ENTRIES)
+        except Exception as e:
+            logger.warning("Impossible d'enregistrer la fréquence de la requête: %s", e)
+    
+    def counts(self) -> Counter:
+        """Nombre de recherches par (langue, requête normalisée)"""
+        counts = Counter()
+        for key, value in self.storage.scan(self.NAMESPACE):
+            language, _, query = key.partition('|')
+            counts[(language, query)] = int(value)
+        return counts
+
+def read_access_log(path: str, max_bytes: Optional[int] = None) -> Counter:
+    """
+    Compte les recherches réussies d'un journal d'accès gunicorn
+    
+    Seule la fin du journal est lue (max_bytes, par défaut
+    Config.WARMUP_ACCESS_LOG_MAX_BYTES). Les pages suivantes (paramètre page) sont ignorées.
+    
+    Returns:
+        Nombre de recherches par (langue, requête normalisée)
+    """
+    max_bytes = max_bytes or Config.WARMUP_ACCESS_LOG_MAX_BYTES
+    counts = Counter()
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - max_bytes))
+        if size > max_bytes:
+            f.readline()  # Première ligne probablement tronquée
+        for line in f:
+            match = ACCESS_LOG_SEARCH.search(line.decode('utf-8', 'replace'))
+            if not match or not match.group(2).startswith('2'):
+                continue
+            params = parse_qs(match.group(1))
+            if 'page' in params:
+                continue
+            query = normalize_query(params.get('q', [''])[0])
+            language = params.get('lang', [''])[0]
+            if query and language:
+                counts[(language, query)] += 1
+    return counts
+
+class CacheWarmer:
+    """
+    Rejoue les requêtes les plus fréquentes pour remplir les caches
+    
+    Après un déploiement, les requêtes populaires sont ainsi servies depuis le
+    cache des requêtes dès les premières recherches ; les pages de détail
+    consultées pendant le préchauffage remplissent aussi le cache des détails.
+    Les fréquences viennent de la table QueryLog et du journal d'accès
+    (Config.WARMUP_ACCESS_LOG).
+    
+    Le préchauffage passe par SearchEngine, donc par l'ordonnanceur du débit
+    sortant, et n'utilise que le débit laissé libre par les utilisateurs : avant
+    chaque requête, il attend que chaque source dispose d'au moins
+    Config.WARMUP_MIN_HEADROOM de sa rafale. Les requêtes dont le lot est déjà
+    frais dans le cache ne sont pas rejouées.
+    """
+    
+    NAMESPACE = 'warmup'
+    
+    def __init__(self, engine, query_log: Optional[QueryLog] = None,
+                 scheduler: Optional[OutboundScheduler] = None):
+        self.engine = engine
+        self.query_log = query_log or QueryLog()
+        self.scheduler = scheduler or get_outbound_scheduler()
+        self.storage = self.query_log.storage
+        self._task: Optional[Union[asyncio.Task, concurrent.futures.Future]] = None
+    
+    def top_queries(self, limit: int) -> List[Tuple[str, str]]:
+        """
+        Requêtes les plus fréquentes, vues au moins Config.WARMUP_MIN_COUNT fois
+        
+        Returns:
+            Liste de (requête, langue), de la plus fréquente à la moins fréquente
+        """
+        counts = self.query_log.counts()
+        path = Config.WARMUP_ACCESS_LOG
+        if path and os.path.exists(path):
+            try:
+                # Les deux sources comptent les mêmes recherches : on garde le plus grand compte
+                counts |= read_access_log(path)
+            except OSError as e:
+                logger.warning("Journal d'accès illisible (%s): %s", path, e)
+        ranked = sorted(
+            ((count, language, query) for (language, query), count in counts.items()
+             if count >= Config.WARMUP_MIN_COUNT and language in Config.SUPPORTED_LANGUAGES),
+            key=lambda item: (-item[0], item[1], item[2])
+        )
+        return [(query, language) for _, language, query in ranked[:limit]]
+    
+    async def warm(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Rejoue les requêtes les plus fréquentes absentes du cache
+        
+        Args:
+            limit: Nombre de requêtes (par défaut Config.WARMUP_TOP_QUERIES)
+        
+        Returns:
+            Nombre de requêtes rejouées (warmed), déjà en cache (cached) et sans résultat (failed)
+        """
+        stats = {'warmed': 0, 'cached': 0, 'failed': 0}
+        start = time.monotonic()
+        for query, language in self.top_queries(limit or Config.WARMUP_TOP_QUERIES):
+            if self.engine.query_cache.peek_fresh(make_cache_key(language, query)) is not None:
+                stats['cached'] += 1
+                continue
+            await self._wait_for_headroom()
+            try:
+                report = await self.engine.search_with_status(query, language)
+            except Exception as e:
+                logger.warning("Échec du préchauffage d'une requête: %s", e)
+                stats['failed'] += 1
+                continue
+            stats['warmed' if report.results else 'failed'] += 1
+        logger.info("Préchauffage terminé en %.1f s: %d requêtes rejouées, %d déjà en cache, %d sans résultat",
+                    time.monotonic() - start, stats['warmed'], stats['cached'], stats['failed'])
+        return stats
+    
+    async def _wait_for_headroom(self):
+        """Attend que chaque source ait assez de débit sortant libre"""
+        urls = [url for source in self.engine.sources.values()
+                for url in getattr(source, 'mirrors', [source.base_url])]
+        while min((self.scheduler.headroom(url) for url in urls), default=1.0) < Config.WARMUP_MIN_HEADROOM:
+            await asyncio.sleep(Config.WARMUP_POLL_INTERVAL)
+    
+    def claim(self) -> bool:
+        """
+        Réserve le préchauffage de l'intervalle en cours pour ce worker
+        
+        Un seul worker préchauffe les caches par Config.WARMUP_INTERVAL : les autres
+        en profitent par le stockage partagé.
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        until = now + (Config.WARMUP_INTERVAL or Config.CACHE_TTL_DEFAULT)
+        
+        def take(value):
+            if value and json.loads(value)['until'] > now:
+                return value
+            return json.dumps({'owner': token, 'until': until})
+        
+        try:
+            lease = json.loads(self.storage.update(self.NAMESPACE, 'schedule', take, until))
+        except Exception as e:
+            logger.warning("Préchauffage non planifié: %s", e)
+            return False
+        return lease['owner'] == token
+    
+    async def _run(self):
+        """Préchauffe les caches au démarrage, puis toutes les Config.WARMUP_INTERVAL secondes"""
+        await asyncio.sleep(Config.WARMUP_STARTUP_DELAY)
+        while True:
+            if self.claim():
+                try:
+                    await self.warm()
+                except Exception:
+                    logger.exception("Erreur lors du préchauffage des caches")
+            if not Config.WARMUP_INTERVAL:
+                return
+            await asyncio.sleep(Config.WARMUP_INTERVAL)
+    
+    def start(self):
+        """
+        Lance le préchauffage en arrière-plan sur la boucle du client HTTP
+        
+        Appelé au démarrage de chaque worker : par gunicorn (post_worker_init) pour
+        les workers synchrones, au démarrage de la boucle du serveur sous ASGI.
+        """
+        if not Config.WARMUP_ENABLED or self._task is not None:
+            return
+        loop = self.engine.http_client.loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._task = loop.create_task(self._run())
+        else:
+            self._task = asyncio.run_coroutine_threadsafe(self._run(), loop)
+    
+    async def stop(self):
+        """Arrête le préchauffage lancé sur la boucle courante"""
+        task, self._task = self._task, None
+        if isinstance(task, asyncio.Task) and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        elif task is not None:
+            task.cancel()
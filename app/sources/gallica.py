@@ -2,12 +2,12 @@
 Source Gallica
 """
 
+import asyncio
+import logging
 import os
 import sys
-from typing import List, Dict, Any
-import requests
-from bs4 import BeautifulSoup
-import html5lib
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import aiohttp
 import re
 
 # Ajoute le répertoire parent au PYTHONPATH
@@ -15,9 +15,18 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from app.core.base_source import BookSource
 
+logger = logging.getLogger(__name__)
+
 class GallicaSource(BookSource):
     """Source Gallica"""
     
+    paginated = True
+    PAGE_SIZE = 20  # Notices demandées par requête SRU
+    
+    # Espaces de noms de la réponse SRU
+    SRW = '{http://www.loc.gov/zing/srw/}'
+    DC = '{http://purl.org/dc/elements/1.1/}'
+    
     def __init__(self):
         super().__init__('Gallica', 'https://gallica.bnf.fr')
         
@@ -57,85 +66,44 @@ class GallicaSource(BookSource):
                 
         return title_clean, series_name, volume_number
     
-    def search(self, query: str, lang: str = None) -> List[Dict[str, Any]]:
+    async def search_async(self, query: str, language: str,
+                           session: aiohttp.ClientSession, page: int = 0) -> List[Dict[str, Any]]:
         """
         Recherche des livres sur Gallica
         
         Args:
             query (str): Terme de recherche
-            lang (str, optional): Code de langue (ex: 'fr')
+            language (str): Code de langue (ex: 'fr')
+            session (aiohttp.ClientSession): Session HTTP partagée
+            page (int): Numéro de la page de résultats, à partir de 0
             
         Returns:
             List[Dict[str, Any]]: Liste des résultats
         """
-        print("\nRecherche sur Gallica (https://gallica.bnf.fr/SRU)")
-        
         # Construit la requête SRU
         params = {
             'operation': 'searchRetrieve',
             'version': '1.2',
             'query': f'dc.title all "{query}"',
-            'maximumRecords': '20',
-            'startRecord': '1',
+            'maximumRecords': str(self.PAGE_SIZE),
+            'startRecord': str(page * self.PAGE_SIZE + 1),
             'recordSchema': 'dc'
         }
         
-        print(f"Paramètres: {params}")
+        logger.debug("Recherche sur Gallica (%s/SRU), paramètres: %s", self.base_url, params)
         
+        results = []
         try:
-            # Effectue la requête avec un User-Agent
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'application/xml'
-            }
-            response = self.make_request('https://gallica.bnf.fr/SRU', params=params, headers=headers)
-            
-            # Parse le XML avec le bon parseur
-            soup = BeautifulSoup(response.content, 'xml')
-            
-            # Trouve tous les résultats avec namespace
-            ns = {'srw': 'http://www.loc.gov/zing/srw/',
-                  'dc': 'http://purl.org/dc/elements/1.1/'}
-                  
-            records = soup.find_all('srw:record', ns)
-            if not records:
-                records = soup.find_all('record')  # essai sans namespace
-                if not records:
-                    print("❌ Aucun résultat trouvé")
-                    return []
-            
-            results = []
-            for record in records:
+            async for title, author, book_url in self._iter_records(session, params):
                 try:
-                    # Récupère le titre
-                    title_elem = record.find('dc:title', ns) or record.find('title')
-                    if not title_elem:
+                    if not title or not book_url.startswith('http'):
                         continue
-                        
-                    title = title_elem.get_text(strip=True)
                     
                     # Extraction des informations de série
                     clean_title, series_name, volume = self.extract_series_info(title)
                     
-                    # Récupère l'URL
-                    identifier = record.find('dc:identifier', ns) or record.find('identifier')
-                    if not identifier:
-                        continue
-                        
-                    book_url = identifier.get_text(strip=True)
-                    if not book_url.startswith('http'):
-                        continue
-                    
-                    # Récupère l'auteur
-                    creator = record.find('dc:creator', ns) or record.find('creator')
-                    author = creator.get_text(strip=True) if creator else "Auteur inconnu"
-                    
-                    # Affichage des informations trouvées
-                    print(f"\n📖 Titre trouvé: {title}")
-                    print(f"🔗 URL: {book_url}")
-                    print(f"👤 Auteur: {author}")
-                    if series_name:
-                        print(f"📚 Série: {series_name} (Tome {volume})")
+                    logger.debug("Titre trouvé: %s (%s, %s), série: %s, tome: %s",
+                                 title, author, book_url, series_name, volume)
                     
                     # Utilise format_result pour un format cohérent
                     results.append(self.format_result(
@@ -147,12 +115,41 @@ class GallicaSource(BookSource):
                     ))
                     
                 except Exception as e:
-                    print(f"⚠️ Erreur lors du traitement d'un résultat: {str(e)}")
+                    logger.debug("Erreur lors du traitement d'un résultat: %s", e)
                     continue
             
-            print(f"\n📊 Nombre de résultats trouvés: {len(results)}")
-            return results
-            
-        except Exception as e:
-            print(f"❌ Erreur lors de la recherche sur Gallica: {str(e)}")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            raise
+        except Exception:
+            logger.exception("Erreur lors de l'analyse de la réponse Gallica")
             return []
+        
+        logger.debug("Nombre de résultats trouvés: %d", len(results))
+        return results
+    
+    async def _iter_records(self, session: aiohttp.ClientSession,
+                            params: Dict[str, str]) -> AsyncIterator[Tuple[Optional[str], str, str]]:
+        """
+        Lit les notices de la réponse SRU au fil de son téléchargement
+        
+        Args:
+            session: Session HTTP partagée
+            params: Paramètres de la requête SRU
+            
+        Yields:
+            Tuples (titre, auteur, identifiant) de chaque notice
+        """
+        # Les notices sont cherchées avec et sans espace de noms
+        tags = [f'{self.SRW}record', 'record']
+        async for record in self.iter_xml(session, f'{self.base_url}/SRU', tags, params=params,
+                                          headers={'Accept': 'application/xml'}):
+            title = self._find(record, 'title')
+            creator = self._find(record, 'creator')
+            yield (self.node_text(title) if title is not None else None,
+                   self.node_text(creator) if creator is not None else "Auteur inconnu",
+                   self.node_text(self._find(record, 'identifier')))
+    
+    def _find(self, record, name: str):
+        """Premier élément Dublin Core d'une notice, avec ou sans espace de noms"""
+        element = record.find(f'.//{self.DC}{name}')
+        return element if element is not None else record.find(f'.//{name}')
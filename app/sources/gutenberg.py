@@ -2,78 +2,120 @@
 Source Project Gutenberg
 """
 
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+import logging
+import aiohttp
+from lxml import etree
+from typing import List, Dict, Any, Optional
 from app.core.base_source import BookSource
 
+logger = logging.getLogger(__name__)
+
 class GutenbergSource(BookSource):
     """Source Project Gutenberg"""
     
+    paginated = True
+    PAGE_SIZE = 25  # Résultats par page de recherche
+    
+    # Sélecteurs compilés une fois pour toutes
+    BOOK_LINKS = etree.XPath("//li[contains(concat(' ', normalize-space(@class), ' '), ' booklink ')]"
+                             "/descendant::a[1]/@href")
+    BIBREC = etree.XPath("//table[contains(concat(' ', normalize-space(@class), ' '), ' bibrec ')]")
+    TITLE = etree.XPath(".//td[@itemprop='headline']")
+    AUTHOR = etree.XPath(".//a[@itemprop='creator']")
+    LANGUAGE = etree.XPath(".//tr[@property='dcterms:language']/@content")
+    
     def __init__(self):
         super().__init__('Project Gutenberg', 'https://www.gutenberg.org')
     
-    def search(self, query: str, language: str = 'fr') -> List[Dict[str, Any]]:
+    async def search_async(self, query: str, language: str,
+                           session: aiohttp.ClientSession, page: int = 0) -> List[Dict[str, Any]]:
         results = []
         
+        search_url = f"{self.base_url}/ebooks/search/"
+        params = {'query': query}
+        if page:
+            params['start_index'] = str(page * self.PAGE_SIZE + 1)
+        search_html = await self.fetch(session, search_url, params=params)
+        
         try:
-            search_url = f"{self.base_url}/ebooks/search/"
-            response = requests.get(search_url, params={'query': query}, timeout=10)
-            search_soup = BeautifulSoup(response.text, 'html.parser')
-            
-            for link in search_soup.find_all('li', class_='booklink'):
-                try:
-                    book_url = "https://www.gutenberg.org" + link.find('a')['href']
-                    print(f"\nVérification: {book_url}")
-                    book_response = requests.get(book_url, timeout=10)
-                    book_soup = BeautifulSoup(book_response.text, 'html.parser')
-                    
-                    # Vérifie la section 'bibrec' pour extraire les informations
-                    bibrec_table = book_soup.find('table', class_='bibrec')
-                    if bibrec_table:
-                        # Extraction des informations
-                        title = bibrec_table.find('td', itemprop='headline')
-                        title = title.get_text(strip=True) if title else "Titre inconnu"
-                        print(f"Titre trouvé: {title}")
-                        
-                        author_tag = bibrec_table.find('a', itemprop='creator')
-                        author = author_tag.get_text(strip=True) if author_tag else "Auteur inconnu"
-                        print(f"Auteur trouvé: {author}")
-                        
-                        # Extraction de la langue à partir de la balise <tr property="dcterms:language">
-                        language_tag = bibrec_table.find('tr', property='dcterms:language')
-                        if language_tag and language_tag.has_attr('content'):
-                            language_content = language_tag['content']
-                            print(f"Langue trouvée: {language_content}")
-                        else:
-                            language_content = "Langue inconnue"
-                            print("❌ Langue non trouvée")
-                        
-                        # Vérifie si la langue correspond à celle choisie
-                        if language_content != language:
-                            print(f"❌ Mauvaise langue - ignoré (trouvé: {language_content})")
-                            continue
-                        
-                        results.append({
-                            'title': title,
-                            'author': author,
-                            'url': book_url,
-                            'source': self.name,
-                            'language': language_content,
-                            'is_free': True,
-                            'read_url': book_url,
-                            'download_url': None
-                        })
-                        print(f"✅ Ajouté: {title}")
-                    else:
-                        print("❌ Table bibrec non trouvée")
-                    
-                except Exception as e:
-                    print(f"Erreur lors de l'extraction des informations: {str(e)}")
-                    continue
-                    
-        except Exception as e:
-            print(f"Erreur de recherche: {str(e)}")
+            # Analyse uniquement la liste des résultats
+            hrefs = self.select_nodes(search_html, self.BOOK_LINKS, 'booklink', '</ul>')
+            book_urls = [self.base_url + href for href in hrefs]
             
-        print(f"Nombre de résultats trouvés: {len(results)}")
+            # Récupère les pages des livres en parallèle, dans l'ordre de la recherche ;
+            # toute la page est traitée, la page suivante commençant après son dernier livre
+            results = await self.fetch_details(
+                book_urls,
+                lambda book_url: self._fetch_book(session, book_url, language)
+            )
+        
+        except Exception:
+            logger.exception("Erreur de recherche")
+        
+        logger.debug("Nombre de résultats trouvés: %d", len(results))
         return results
+    
+    async def _fetch_book(self, session: aiohttp.ClientSession, book_url: str,
+                          language: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupère la fiche d'un livre et vérifie sa langue
+        
+        Args:
+            session: Session HTTP partagée
+            book_url: URL de la page du livre
+            language: Code de langue recherché
+        
+        Returns:
+            Résultat de recherche, ou None si le livre ne correspond pas
+        """
+        logger.debug("Vérification: %s", book_url)
+        metadata = await self.fetch_metadata(session, book_url, self._parse_book)
+        if metadata is None:
+            return None
+        
+        # Vérifie si la langue correspond à celle choisie
+        if metadata['language'] != language:
+            logger.debug("Mauvaise langue - ignoré (trouvé: %s)", metadata['language'])
+            return None
+        
+        logger.debug("Ajouté: %s", metadata['title'])
+        return {
+            'title': metadata['title'],
+            'author': metadata['author'],
+            'url': book_url,
+            'source': self.name,
+            'language': metadata['language'],
+            'is_free': True,
+            'read_url': book_url,
+            'download_url': None
+        }
+    
+    def _parse_book(self, book_html: str) -> Optional[Dict[str, Any]]:
+        """
+        Extrait titre, auteur et langue de la page d'un livre
+        
+        Returns:
+            Métadonnées du livre, ou None si la table bibrec est absente
+        """
+        # Analyse uniquement la table 'bibrec', qui contient les informations
+        bibrec = self.select_nodes(book_html, self.BIBREC, 'bibrec', '</table>')
+        if not bibrec:
+            logger.debug("Table bibrec non trouvée")
+            return None
+        
+        # Extraction des informations
+        title = self.TITLE(bibrec[0])
+        title = self.node_text(title[0]) if title else "Titre inconnu"
+        
+        author = self.AUTHOR(bibrec[0])
+        author = self.node_text(author[0]) if author else "Auteur inconnu"
+        
+        # Extraction de la langue à partir de la balise <tr property="dcterms:language">
+        language = self.LANGUAGE(bibrec[0])
+        if language:
+            language_content = language[0]
+        else:
+            language_content = "Langue inconnue"
+            logger.debug("Langue non trouvée")
+        
+        return {'title': title, 'author': author, 'language': language_content}
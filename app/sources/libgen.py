@@ -2,23 +2,49 @@
 Source Library Genesis
 """
 
+import asyncio
+import logging
 import os
 import sys
-from typing import List, Dict, Any
-import requests
-from bs4 import BeautifulSoup
-import html5lib
+import time
+from typing import List, Dict, Any, Tuple
+from urllib.parse import urlparse
+import aiohttp
+from lxml import etree
 
 # Ajoute le répertoire parent au PYTHONPATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from app.core.base_source import BookSource
+from app.core.config import Config
+from app.core.health import HealthTracker, CLOSED
+from app.core.outbound import OutboundThrottled
+
+logger = logging.getLogger(__name__)
 
 class LibgenSource(BookSource):
-    """Source Library Genesis"""
+    """
+    Source Library Genesis
+    
+    Les recherches sont envoyées au miroir le plus rapide parmi Config.LIBGEN_MIRRORS,
+    d'après les latences mesurées en arrière-plan et lors des recherches précédentes.
+    """
+    
+    paginated = True
+    
+    # Sélecteurs compilés une fois pour toutes : lignes de la table des résultats
+    # (hors en-têtes), cellules d'une ligne, premier lien d'une cellule
+    ROWS = etree.XPath("//table[contains(concat(' ', normalize-space(@class), ' '), ' c ')]"
+                       "//tr[position() > 1]")
+    CELLS = etree.XPath("./td")
+    FIRST_LINK = etree.XPath("(.//a)[1]")
     
     def __init__(self):
-        super().__init__('Library Genesis', 'https://libgen.is')
+        self.mirrors = list(Config.LIBGEN_MIRRORS)
+        super().__init__('Library Genesis', self.mirrors[0])
+        self.health = HealthTracker()
+        self._last_probe = 0.0
+        self._probe_task = None
         
         # Mapping des codes de langue LibGen
         self.language_map = {
@@ -29,153 +55,269 @@ class LibgenSource(BookSource):
             'it': 'italian'
         }
     
-    def search(self, query: str, language: str = 'fr') -> List[Dict[str, Any]]:
+    async def search_async(self, query: str, language: str,
+                           session: aiohttp.ClientSession, page: int = 0) -> List[Dict[str, Any]]:
         """
         Recherche des livres sur Library Genesis
         
         Args:
             query: Terme de recherche
             language: Code de langue (fr, en, etc.)
+            session: Session HTTP partagée
+            page: Numéro de la page de résultats, à partir de 0
             
         Returns:
             Liste des résultats de recherche
         """
         results = []
+        # Convertit le code de langue au format LibGen
+        libgen_language = self.language_map.get(language, 'french')
+        
+        # Paramètres de recherche avec le filtre de langue
+        params = {
+            'req': query,
+            'lg_topic': 'libgen',
+            'open': '0',
+            'view': 'simple',
+            'phrase': '1',
+            'column': 'def',
+            'res': '25',
+            'language': libgen_language
+        }
+        if page:
+            params['page'] = str(page + 1)
+        
+        # Effectue la requête avec les paramètres
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+            'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Sec-Fetch-User': '?1',
+            'Cache-Control': 'max-age=0'
+        }
+        
+        self._schedule_probe(session)
+        html, mirror = await self._hedged_fetch(session, params, headers)
+        
         try:
-            # Convertit le code de langue au format LibGen
-            libgen_language = self.language_map.get(language, 'french')
-            
-            # Construit l'URL de recherche avec le filtre de langue
-            search_url = f"{self.base_url}/search.php"
-            params = {
-                'req': query,
-                'lg_topic': 'libgen',
-                'open': '0',
-                'view': 'simple',
-                'phrase': '1',
-                'column': 'def',
-                'res': '25',
-                'language': libgen_language
-            }
-            
-            print(f"\nRecherche sur LibGen: {search_url}")
-            print(f"Paramètres: {params}")
-            
-            # Effectue la requête avec les paramètres
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'max-age=0'
-            }
-            
-            response = requests.get(search_url, params=params, headers=headers, verify=False, timeout=10)
-            response.raise_for_status()
-            
-            print(f"Code de statut: {response.status_code}")
-            print(f"URL finale: {response.url}")
-            
-            # Parse le HTML avec html5lib pour une meilleure tolérance aux erreurs
-            soup = BeautifulSoup(response.text, 'html5lib')
-            print("Page HTML récupérée et parsée")
+            # Analyse uniquement la table des résultats, en ignorant la ligne d'en-têtes
+            rows = self.select_nodes(html, self.ROWS, 'class=c ', '</table>')
+            if rows:
+                logger.debug("Nombre de lignes trouvées: %d", len(rows))
+            else:
+                logger.debug("Aucune table de résultats trouvée, aperçu du HTML reçu: %s", html[:500])
             
-            # Trouve la table des résultats
-            table = soup.find('table', {'class': ['c']})
-            if table:
-                # Ignore la première ligne (en-têtes)
-                rows = table.find_all('tr')[1:]
-                print(f"Nombre de lignes trouvées: {len(rows)}")
-                
-                for row in rows:
-                    try:
-                        # Récupère les cellules
-                        cells = row.find_all('td')
-                        if len(cells) < 8:
-                            print(f"❌ Pas assez de cellules: {len(cells)}")
-                            continue
-                        
-                        # Titre et URL
-                        title_cell = cells[2]
-                        title_link = title_cell.find('a')
-                        if not title_link:
-                            print("❌ Pas de lien de titre trouvé")
-                            continue
-                            
-                        title = title_link.get_text(strip=True)
-                        href = title_link.get('href', '')
-                        
-                        # Vérifie si c'est un lien vers une série
-                        if 'series' in href or 'search.php' in href:
-                            print("❌ Lien de série ignoré")
-                            continue
-                            
-                        # Extrait le MD5 du lien
-                        try:
-                            md5 = href.split('md5=')[1] if 'md5=' in href else None
-                            if not md5:
-                                print("❌ Pas de MD5 trouvé dans le lien")
-                                continue
-                            book_url = f"{self.base_url}/book/index.php?md5={md5}"
-                        except Exception as e:
-                            print(f"❌ Erreur lors de l'extraction du MD5: {str(e)}")
-                            continue
-                        
-                        print(f"\n📖 Titre trouvé: {title}")
-                        print(f"🔗 URL: {book_url}")
-                        
-                        # Auteur
-                        author = cells[1].get_text(strip=True)
-                        print(f"👤 Auteur: {author}")
-                        
-                        # Langue
-                        book_language = cells[6].get_text(strip=True).lower()
-                        print(f"🌍 Langue: {book_language}")
-                        
-                        # Lien de téléchargement
-                        download_cell = cells[8] if len(cells) > 8 else None
-                        download_url = None
-                        if download_cell:
-                            download_link = download_cell.find('a')
-                            if download_link:
-                                download_url = download_link.get('href', '')
-                                if not download_url.startswith('http'):
-                                    # Utilise l'URL de base pour le téléchargement
-                                    download_url = f"{self.base_url}/get.php?md5=" + download_url.split('=')[-1]
-                                print(f"⬇️ Lien de téléchargement: {download_url}")
-                        
-                        # Vérifie la langue
-                        if book_language != libgen_language:
-                            print(f"❌ Mauvaise langue ({book_language}), on cherche {libgen_language}")
-                            continue
-                        
-                        results.append({
-                            'title': title,
-                            'author': author,
-                            'url': book_url,
-                            'source': self.name,
-                            'language': language.upper(),
-                            'is_free': True,
-                            'read_url': None,
-                            'download_url': download_url
-                        })
-                        print(f"✅ Livre ajouté aux résultats: {title}")
-                        
-                    except Exception as e:
-                        print(f"❌ Erreur lors du parsing d'une ligne: {str(e)}")
+            for row in rows:
+                try:
+                    # Récupère les cellules
+                    cells = self.CELLS(row)
+                    if len(cells) < 8:
+                        logger.debug("Pas assez de cellules: %d", len(cells))
                         continue
-            else:
-                print("❌ Aucune table de résultats trouvée")
-                print("\nAperçu du HTML reçu:")
-                print(response.text[:500])
                     
-        except Exception as e:
-            print(f"❌ Erreur de recherche: {str(e)}")
+                    # Titre et URL
+                    title_link = self.FIRST_LINK(cells[2])
+                    if not title_link:
+                        logger.debug("Pas de lien de titre trouvé")
+                        continue
+                    
+                    title = self.node_text(title_link[0])
+                    href = title_link[0].get('href', '')
+                    
+                    # Vérifie si c'est un lien vers une série
+                    if 'series' in href or 'search.php' in href:
+                        logger.debug("Lien de série ignoré")
+                        continue
+                    
+                    # Extrait le MD5 du lien
+                    md5 = href.split('md5=')[1] if 'md5=' in href else None
+                    if not md5:
+                        logger.debug("Pas de MD5 trouvé dans le lien")
+                        continue
+                    book_url = f"{mirror}/book/index.php?md5={md5}"
+                    
+                    # Auteur
+                    author = self.node_text(cells[1])
+                    
+                    # Langue
+                    book_language = self.node_text(cells[6]).lower()
+                    
+                    # Vérifie la langue
+                    if book_language != libgen_language:
+                        logger.debug("Mauvaise langue (%s), on cherche %s", book_language, libgen_language)
+                        continue
+                    
+                    # Lien de téléchargement
+                    download_url = None
+                    download_link = self.FIRST_LINK(cells[8]) if len(cells) > 8 else None
+                    if download_link:
+                        download_url = download_link[0].get('href', '')
+                        if not download_url.startswith('http'):
+                            # Utilise le miroir qui a répondu pour le téléchargement
+                            download_url = f"{mirror}/get.php?md5=" + download_url.split('=')[-1]
+                    
+                    results.append({
+                        'title': title,
+                        'author': author,
+                        'url': book_url,
+                        'source': self.name,
+                        'language': language.upper(),
+                        'is_free': True,
+                        'read_url': None,
+                        'download_url': download_url
+                    })
+                    logger.debug("Livre ajouté aux résultats: %s (%s)", title, book_url)
+                    
+                except Exception as e:
+                    logger.debug("Erreur lors du parsing d'une ligne: %s", e)
+                    continue
+                    
+        except Exception:
+            logger.exception("Erreur de recherche")
             
-        print(f"\n📊 Nombre total de résultats: {len(results)}")
-        return results
\ No newline at end of file
+        logger.debug("Nombre total de résultats: %d", len(results))
+        return results
+    
+    @staticmethod
+    def _mirror_key(mirror: str) -> str:
+        """Identifiant d'un miroir dans le suivi de santé"""
+        return f"libgen@{urlparse(mirror).netloc}"
+    
+    def _mirror_stats(self) -> Dict[str, Dict[str, Any]]:
+        """État, taux d'erreur et latence p95 de chaque miroir"""
+        snapshot = self.health.snapshot([self._mirror_key(mirror) for mirror in self.mirrors])
+        return {mirror: snapshot[self._mirror_key(mirror)] for mirror in self.mirrors}
+    
+    def rank_mirrors(self, stats: Dict[str, Dict[str, Any]] = None) -> List[str]:
+        """
+        Classe les miroirs du plus rapide au plus lent
+        
+        Les miroirs en panne ou instables passent en dernier ; ceux qui n'ont pas
+        encore été mesurés suivent les miroirs mesurés, dans l'ordre de la configuration.
+        """
+        stats = stats or self._mirror_stats()
+        
+        def rank(item):
+            index, mirror = item
+            mirror_stats = stats[mirror]
+            return (
+                mirror_stats['state'] != CLOSED,
+                mirror_stats['error_rate'] >= Config.HEALTH_DEGRADED_ERROR_RATE,
+                mirror_stats['p95_latency'] if mirror_stats['samples'] else float('inf'),
+                index
+            )
+        
+        return [mirror for _, mirror in sorted(enumerate(self.mirrors), key=rank)]
+    
+    @staticmethod
+    def _hedge_delay(mirror_stats: Dict[str, Any]) -> float:
+        """Délai accordé à un miroir avant d'interroger le suivant : sa latence p95"""
+        if mirror_stats['samples'] < Config.HEALTH_MIN_SAMPLES:
+            return Config.LIBGEN_HEDGE_DELAY
+        return min(max(mirror_stats['p95_latency'], Config.LIBGEN_HEDGE_MIN_DELAY),
+                   Config.LIBGEN_HEDGE_MAX_DELAY)
+    
+    async def _hedged_fetch(self, session: aiohttp.ClientSession, params: Dict[str, str],
+                            headers: Dict[str, str]) -> Tuple[str, str]:
+        """
+        Interroge le miroir le plus rapide, en doublant la requête si nécessaire
+        
+        Si le miroir n'a pas répondu après sa latence p95, ou s'il échoue, le miroir
+        suivant est interrogé à son tour et la première réponse obtenue est retenue ;
+        les requêtes restantes sont annulées.
+        
+        Returns:
+            Tuple (HTML de la page de résultats, miroir qui a répondu)
+            
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: Si tous les miroirs ont échoué
+        """
+        stats = self._mirror_stats()
+        mirrors = iter(self.rank_mirrors(stats))
+        tasks: Dict[asyncio.Task, str] = {}
+        pending = set()
+        
+        def launch():
+            mirror = next(mirrors, None)
+            if mirror is not None:
+                logger.debug("Recherche sur LibGen: %s/search.php, paramètres: %s", mirror, params)
+                task = asyncio.create_task(self._fetch_mirror(session, mirror, params, headers))
+                tasks[task] = mirror
+                pending.add(task)
+            return mirror
+        
+        try:
+            mirror = launch()
+            error = None
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=self._hedge_delay(stats[mirror]),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        winner = task
+                    else:
+                        error = task.exception()
+                if winner is not None:
+                    return winner.result(), tasks[winner]
+                
+                # Délai dépassé ou échec : on interroge aussi le miroir suivant
+                mirror = launch() or mirror
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _fetch_mirror(self, session: aiohttp.ClientSession, mirror: str,
+                            params: Dict[str, str], headers: Dict[str, str]) -> str:
+        """Interroge un miroir et enregistre sa latence"""
+        start = time.monotonic()
+        try:
+            html = await self.fetch(session, f"{mirror}/search.php", params=params,
+                                    headers=headers, ssl=False)
+        except OutboundThrottled:
+            raise  # Requête jamais envoyée : rien à reprocher au miroir
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.health.record(self._mirror_key(mirror), False, time.monotonic() - start)
+            raise
+        self.health.record(self._mirror_key(mirror), True, time.monotonic() - start)
+        return html
+    
+    def _schedule_probe(self, session: aiohttp.ClientSession):
+        """Lance la mesure de latence des miroirs en arrière-plan si elle est périmée"""
+        now = time.monotonic()
+        if len(self.mirrors) < 2 or now - self._last_probe < Config.LIBGEN_PROBE_INTERVAL:
+            return
+        self._last_probe = now
+        self._probe_task = asyncio.create_task(self.probe_mirrors(session))
+    
+    async def probe_mirrors(self, session: aiohttp.ClientSession):
+        """
+        Mesure la latence de chaque miroir
+        
+        Les mesures alimentent le suivi de santé partagé : elles permettent de classer
+        les miroirs et de refermer le circuit d'un miroir revenu en ligne.
+        """
+        timeout = aiohttp.ClientTimeout(total=Config.LIBGEN_PROBE_TIMEOUT)
+        
+        async def probe(mirror):
+            try:
+                ticket = await self.throttle(mirror)
+            except OutboundThrottled:
+                return  # Miroir déjà sollicité : la mesure attendra la prochaine fois
+            start = time.monotonic()
+            try:
+                async with session.head(mirror, headers=self.headers, timeout=timeout,
+                                        allow_redirects=True, ssl=False) as response:
+                    self.scheduler.settle(ticket, response.status, response.headers)
+                    ok = response.status < 500
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                ok = False
+            self.health.record(self._mirror_key(mirror), ok, time.monotonic() - start)
+        
+        await asyncio.gather(*(probe(mirror) for mirror in self.mirrors))
@@ -2,14 +2,30 @@
 Source Open Library
 """
 
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+import asyncio
+import logging
+import aiohttp
+from lxml import etree
+from typing import List, Dict, Any, Optional
 from app.core.base_source import BookSource
+from app.core.outbound import OutboundThrottled
+
+logger = logging.getLogger(__name__)
 
 class OpenLibrarySource(BookSource):
     """Source Open Library"""
     
+    paginated = True
+    
+    # Sélecteurs compilés une fois pour toutes
+    RESULT_ITEMS = etree.XPath("//li[contains(concat(' ', normalize-space(@class), ' '), ' searchResultItem ')]")
+    READ_BUTTON = etree.XPath(".//a[contains(concat(' ', normalize-space(@class), ' '), ' cta-btn ')]"
+                              "[contains(., 'Read')]")
+    TITLE = etree.XPath(".//h3[contains(concat(' ', normalize-space(@class), ' '), ' booktitle ')]")
+    FIRST_LINK = etree.XPath("(.//a)[1]/@href")
+    AUTHOR = etree.XPath(".//span[contains(concat(' ', normalize-space(@class), ' '), ' bookauthor ')]")
+    LANGUAGE = etree.XPath("//span[@itemprop='inLanguage']")
+    
     def __init__(self):
         super().__init__('Open Library', 'https://openlibrary.org')
         
@@ -31,96 +47,115 @@ class OpenLibrarySource(BookSource):
             'italian': 'IT'
         }
     
-    def search(self, query: str, language: str = 'en') -> List[Dict[str, Any]]:
+    async def search_async(self, query: str, language: str,
+                           session: aiohttp.ClientSession, page: int = 0) -> List[Dict[str, Any]]:
         results = []
         no_read_button_count = 0  # Compteur pour les livres sans bouton Read
-        print(f"\nRecherche sur OpenLibrary pour: '{query}' (langue: {language})")
+        logger.debug("Recherche sur OpenLibrary pour: %r (langue: %s)", query, language)
+        
+        # Conversion de la langue au format OpenLibrary
+        ol_language = self.language_map.get(language, language)
+        
+        # Construction des paramètres de recherche pour les ebooks gratuits
+        search_params = {
+            'q': query,
+            'mode': 'ebooks',
+            'has_fulltext': 'true',
+            'language': ol_language
+        }
+        if page:
+            search_params['page'] = str(page + 1)
+        
+        search_url = f"{self.base_url}/search"
+        logger.debug("URL de recherche: %s, paramètres: %s", search_url, search_params)
+        
+        search_html = await self.fetch(session, search_url, params=search_params, timeout=30)
         
         try:
-            # Conversion de la langue au format OpenLibrary
-            ol_language = self.language_map.get(language, language)
-            
-            # Construction des paramètres de recherche pour les ebooks gratuits
-            search_params = {
-                'q': query,
-                'mode': 'ebooks',
-                'has_fulltext': 'true',
-                'language': ol_language
-            }
-            
-            search_url = f"{self.base_url}/search"
-            # Construction de l'URL complète pour les logs
-            params_str = '&'.join([f"{k}={v}" for k, v in search_params.items()])
-            full_search_url = f"{search_url}?{params_str}"
-            print(f"🔍 URL de recherche: {full_search_url}")
-            
-            response = requests.get(search_url, params=search_params, timeout=30)
-            
-            if response.status_code != 200:
-                print(f"❌ Erreur lors de la recherche: {response.status_code}")
-                return results
-            search_soup = BeautifulSoup(response.text, 'html.parser')
-            
-            print(f"📚 Analyse des résultats...")
+            # Les résultats contiennent des listes imbriquées : toute la page est analysée
+            items = self.select_nodes(search_html, self.RESULT_ITEMS, 'searchResultItem')
             
-            for link in search_soup.find_all('li', class_='searchResultItem'):
+            entries = []
+            for item in items:
                 try:
                     # Vérifie d'abord si le bouton Read est disponible dans les résultats de recherche
-                    read_button = link.find('a', class_='cta-btn', string=lambda text: text and 'Read' in text)
+                    read_button = self.READ_BUTTON(item)
                     if not read_button:
                         no_read_button_count += 1
                         continue  # Passe au résultat suivant si pas de bouton Read
                     
-                    title = link.find('h3', class_='booktitle').get_text(strip=True)
-                    book_url = "https://openlibrary.org" + link.find('a')['href']
-                    print(f"\nVérification: {title}")
-                    print(f"🔗 URL du livre: {book_url}")
-                    
-                    book_response = requests.get(book_url, timeout=30)
-                    
-                    if book_response.status_code != 200:
-                        print(f"❌ Erreur d'accès au livre: {book_response.status_code}")
-                        continue
-                    book_soup = BeautifulSoup(book_response.text, 'html.parser')
+                    title = self.node_text(self.TITLE(item)[0])
+                    book_url = self.base_url + self.FIRST_LINK(item)[0]
                     
                     # Extraction des informations
-                    author = link.find('span', class_='bookauthor').get_text(strip=True)
-                    print(f"👤 Auteur trouvé: {author}")
-                    
-                    # Vérifie la langue dans les métadonnées
-                    language_tag = book_soup.find('span', itemprop="inLanguage")
-                    book_language = language_tag.get_text(strip=True) if language_tag else None
-                    # Convertit le nom de langue complet en code court
-                    if book_language:
-                        book_language = self.full_name_to_code.get(book_language.lower(), book_language)
-                    print(f"🌍 Langue trouvée: {book_language}")
+                    author = self.node_text(self.AUTHOR(item)[0])
                     
                     # Récupération du lien de lecture
-                    read_url = "https://openlibrary.org" + read_button['href'] if read_button['href'].startswith('/') else read_button['href']
-                    print(f"📖 Lien de lecture trouvé: {read_url}")
-                    print(f"✨ Bouton Read disponible pour: '{title}'")
+                    read_href = read_button[0].get('href', '')
+                    read_url = self.base_url + read_href if read_href.startswith('/') else read_href
                     
-                    results.append({
+                    entries.append({
                         'title': title,
                         'author': author,
                         'url': book_url,
                         'source': self.name,
-                        'language': book_language,
+                        'language': None,
                         'is_free': True,
                         'read_url': read_url,
                         'download_url': None
                     })
-                    print(f"✅ Ajouté: {title}")
                     
                 except Exception as e:
-                    print(f"❌ Erreur lors de l'extraction des informations: {str(e)}")
+                    logger.debug("Erreur lors de l'extraction des informations: %s", e)
                     continue
+            
+            # Récupère les pages des livres en parallèle pour lire leur langue ;
+            # toute la page est traitée, la page suivante commençant après son dernier livre
+            results = await self.fetch_details(
+                entries,
+                lambda entry: self._fetch_book(session, entry)
+            )
                     
-        except Exception as e:
-            print(f"❌ Erreur de recherche: {str(e)}")
+        except Exception:
+            logger.exception("Erreur de recherche")
+            
+        logger.debug("Nombre de résultats trouvés: %d (%d livres ignorés car pas de bouton Read disponible)",
+                     len(results), no_read_button_count)
             
-        print(f"\n📊 Nombre de résultats trouvés: {len(results)}")
-        if no_read_button_count > 0:
-            print(f"ℹ️ {no_read_button_count} livres ignorés car pas de bouton Read disponible")
+        return results
+    
+    async def _fetch_book(self, session: aiohttp.ClientSession,
+                          entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Complète un résultat avec la langue lue sur la page du livre
+        
+        Args:
+            session: Session HTTP partagée
+            entry: Résultat construit à partir de la page de recherche
             
-        return results
\ No newline at end of file
+        Returns:
+            Résultat complété, ou None si la page est inaccessible
+        """
+        logger.debug("Vérification: %s (%s)", entry['title'], entry['url'])
+        
+        try:
+            metadata = await self.fetch_metadata(session, entry['url'], self._parse_book, timeout=30)
+        except OutboundThrottled:
+            raise  # Requête jamais envoyée : fetch_details signale la liste incomplète
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug("Erreur d'accès au livre: %s", str(e) or type(e).__name__)
+            return None
+        
+        logger.debug("Ajouté: %s", entry['title'])
+        return {**entry, 'language': metadata['language']}
+    
+    def _parse_book(self, book_html: str) -> Dict[str, Any]:
+        """Extrait la langue de la page d'un livre"""
+        # Vérifie la langue dans les métadonnées
+        language_tag = self.select_nodes(book_html, self.LANGUAGE, 'inLanguage')
+        book_language = self.node_text(language_tag[0]) if language_tag else None
+        # Convertit le nom de langue complet en code court
+        if book_language:
+            book_language = self.full_name_to_code.get(book_language.lower(), book_language)
+        
+        return {'language': book_language}
\ No newline at end of file
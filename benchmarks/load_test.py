@@ -0,0 +1,244 @@
+"""
+Test de charge du point d'entrée web : workers synchrones contre worker ASGI
+
+Les sources sont redirigées vers le serveur de rejeu (voir replay_server.py) et
+les recherches, toutes différentes, traversent toute l'application Flask
+(limiteur, en-têtes de sécurité, nettoyage, sérialisation). Deux modes :
+
+- sync : chaque worker traite une recherche à la fois, comme les workers
+  synchrones de gunicorn_config.py (un thread par worker, qui exécute la vue
+  asynchrone sur une boucle temporaire) ;
+- asgi : un seul worker, app/asgi.py, dont la boucle multiplexe toutes les
+  recherches en cours (gunicorn_asgi_config.py) ;
+- asgi_processes (--processes) : plusieurs workers ASGI, chacun dans son propre
+  processus, qui partagent le même fichier de stockage. Les écritures (disjoncteur,
+  baux de recherche, cache, fréquence des requêtes) s'y disputent le verrou SQLite,
+  et chaque attente bloque la boucle du worker qui écrit : le rapport mesure le
+  retard de la boucle (loop_lag) et les accès au cache refusés par le stockage.
+
+Le rapport compare le débit par worker : un worker gunicorn est un processus, et
+le nombre de processus fixe la mémoire consommée.
+
+Usage :
+    python -m benchmarks.load_test [--queries 200] [--concurrency 20] [--workers 5]
+                                   [--latency 0.05] [--jitter 0.02]
+                                   [--processes 4] [--loop-busy-timeout 0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+# Importé en premier : isole le stockage partagé et l'environnement avant de charger l'application
+from benchmarks.run_benchmarks import QUERY, LANGUAGE, percentile, redirect_sources
+from benchmarks.replay_server import ReplayServer
+
+from app.app import app, limiter, search_engine
+from app.core.config import Config
+
+# Période de la sonde qui mesure le retard de la boucle d'événements (secondes)
+LOOP_PROBE_INTERVAL = 0.01
+
+def summarize(latencies: List[float], statuses: List[int], partial: List[bool],
+              elapsed: float) -> Dict[str, Any]:
+    return {
+        'queries': len(latencies),
+        'errors': sum(status != 200 for status in statuses),
+        # Réponses sans les sources abandonnées au délai global
+        'partial_answers': sum(partial),
+        'elapsed_s': round(elapsed, 3),
+        'queries_per_second': round(len(latencies) / elapsed, 2),
+        'latency_p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'latency_p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+    }
+
+def search_url(i: int) -> str:
+    return f'/search?q={QUERY} charge {i}&lang={LANGUAGE}'
+
+def load_sync(queries: int, workers: int) -> Dict[str, Any]:
+    """Recherches servies par des workers qui traitent une requête à la fois"""
+    latencies, statuses, partial = [], [], []
+    
+    def one(i):
+        start = time.perf_counter()
+        response = app.test_client().get(search_url(i), base_url='https://localhost')
+        latencies.append(time.perf_counter() - start)
+        statuses.append(response.status_code)
+        partial.append('X-Sources-Timed-Out' in response.headers)
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(one, range(queries)))
+    elapsed = time.perf_counter() - start
+    search_engine.http_client.run_sync(search_engine.shutdown())
+    return {'workers': workers, **summarize(latencies, statuses, partial, elapsed)}
+
+def per_worker(report: Dict[str, Any]) -> float:
+    """Débit d'un worker, c'est-à-dire d'un processus gunicorn"""
+    return round(report['queries_per_second'] / report['workers'], 2)
+
+def run_asgi(queries: int, concurrency: int, first: int, barrier=None) -> Dict[str, Any]:
+    """
+    Recherches servies par le worker ASGI de ce processus
+    
+    Returns:
+        Mesures brutes : latencies, statuses, partial, elapsed, lags (retards de la
+        boucle d'événements) et cache_storage_errors (accès au cache refusés par le
+        stockage partagé)
+    """
+    import httpx
+    from app.asgi import application
+    
+    latencies, statuses, partial, lags = [], [], [], []
+    
+    async def probe_loop():
+        # Une écriture qui attend le verrou du stockage retarde tous les réveils de la boucle
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            lags.append(max(0.0, loop.time() - start - LOOP_PROBE_INTERVAL))
+    
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url='https://localhost',
+                                     timeout=None) as client:
+            async def one(i):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.get(search_url(first + i))
+                    latencies.append(time.perf_counter() - start)
+                    statuses.append(response.status_code)
+                    partial.append('X-Sources-Timed-Out' in response.headers)
+            
+            probe = asyncio.create_task(probe_loop())
+            try:
+                if barrier is not None:
+                    # Tous les processus commencent ensemble, une fois l'application chargée
+                    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+                start = time.perf_counter()
+                await asyncio.gather(*(one(i) for i in range(queries)))
+                return time.perf_counter() - start
+            finally:
+                probe.cancel()
+                await application.shutdown()
+    
+    elapsed = asyncio.run(run_all())
+    cache_storage_errors = sum(cache.stats['errors'] for cache in (search_engine.query_cache,
+                                                             search_engine.source_cache))
+    return {'latencies': latencies, 'statuses': statuses, 'partial': partial, 'elapsed': elapsed,
+            'lags': lags, 'cache_storage_errors': cache_storage_errors}
+
+def summarize_lags(lags: List[float]) -> Dict[str, Any]:
+    return {
+        'loop_lag_p99_ms': round(percentile(lags, 0.99) * 1000, 1) if lags else 0.0,
+        'loop_lag_max_ms': round(max(lags, default=0.0) * 1000, 1),
+    }
+
+def load_asgi(queries: int, concurrency: int) -> Dict[str, Any]:
+    """Recherches servies par un seul worker ASGI, à concurrence fixée"""
+    run = run_asgi(queries, concurrency, first=queries)
+    return {'workers': 1, 'concurrency': concurrency,
+            **summarize(run['latencies'], run['statuses'], run['partial'], run['elapsed']),
+            **summarize_lags(run['lags']), 'cache_storage_errors': run['cache_storage_errors']}
+
+def configure(base_url: str):
+    """Prépare l'application du processus courant pour le test de charge"""
+    logging.getLogger('app').setLevel(logging.ERROR)
+    app.logger.setLevel(logging.ERROR)
+    limiter.enabled = False
+    # Toutes les sources partagent l'hôte du serveur de rejeu : la limite par hôte
+    # briderait les deux modes, ce qui n'arrive pas avec des sources distinctes
+    Config.HTTP_POOL_PER_HOST = Config.HTTP_POOL_SIZE
+    redirect_sources(search_engine, base_url)
+
+def asgi_process(base_url: str, queries: int, concurrency: int, first: int, barrier, results):
+    """Worker ASGI d'un processus de load_asgi_processes"""
+    configure(base_url)
+    results.put(run_asgi(queries, concurrency, first, barrier))
+
+def load_asgi_processes(base_url: str, queries: int, concurrency: int,
+                        processes: int) -> Dict[str, Any]:
+    """Recherches réparties entre plusieurs workers ASGI qui partagent le stockage"""
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    per_process = max(1, queries // processes)
+    workers = [
+        context.Process(target=asgi_process,
+                        args=(base_url, per_process, concurrency, 2 * queries + k * per_process,
+                              barrier, results))
+        for k in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    runs = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    
+    latencies = [latency for run in runs for latency in run['latencies']]
+    statuses = [status for run in runs for status in run['statuses']]
+    partial = [flag for run in runs for flag in run['partial']]
+    elapsed = max(run['elapsed'] for run in runs)
+    return {'workers': processes, 'concurrency': concurrency,
+            'loop_busy_timeout_s': Config.SHARED_STORAGE_LOOP_BUSY_TIMEOUT,
+            **summarize(latencies, statuses, partial, elapsed),
+            **summarize_lags([lag for run in runs for lag in run['lags']]),
+            'cache_storage_errors': sum(run['cache_storage_errors'] for run in runs)}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge : workers synchrones contre worker ASGI")
+    parser.add_argument('--queries', type=int, default=200, help="Recherches par mode")
+    parser.add_argument('--concurrency', type=int, default=20, help="Recherches simultanées (ASGI)")
+    parser.add_argument('--workers', type=int, default=5, help="Workers synchrones")
+    parser.add_argument('--latency', type=float, default=0.05, help="Latence simulée des sources (s)")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Gigue de la latence simulée (s)")
+    parser.add_argument('--processes', type=int, default=0,
+                        help="Workers ASGI concurrents sur le même stockage (0 : mode non mesuré)")
+    parser.add_argument('--loop-busy-timeout', type=float,
+                        help="Attente du verrou du stockage sur la boucle (s), par défaut celle de la configuration")
+    parser.add_argument('--output', help="Fichier où écrire le rapport JSON")
+    args = parser.parse_args(argv)
+    
+    if args.loop_busy_timeout is not None:
+        # Transmis aux processus des workers ASGI par l'environnement
+        os.environ['SHARED_STORAGE_LOOP_BUSY_TIMEOUT'] = str(args.loop_busy_timeout)
+        Config.SHARED_STORAGE_LOOP_BUSY_TIMEOUT = args.loop_busy_timeout
+    
+    server = ReplayServer(args.latency, args.jitter)
+    base_url = server.start()
+    try:
+        configure(base_url)
+        report = {
+            'sync': load_sync(args.queries, args.workers),
+            'asgi': load_asgi(args.queries, args.concurrency),
+        }
+        if args.processes:
+            report['asgi_processes'] = load_asgi_processes(base_url, args.queries, args.concurrency,
+                                                           args.processes)
+    finally:
+        server.stop()
+    for mode in ('sync', 'asgi', 'asgi_processes'):
+        if mode in report:
+            report[mode]['queries_per_second_per_worker'] = per_worker(report[mode])
+    # Gain à nombre de processus égal : c'est ce qui fixe la mémoire et le nombre de workers
+    report['speedup_per_worker'] = round(report['asgi']['queries_per_second_per_worker']
+                                         / report['sync']['queries_per_second_per_worker'], 2)
+    
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 1 if any(report[mode]['errors'] for mode in ('sync', 'asgi', 'asgi_processes')
+                    if mode in report) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Serveur HTTP local qui rejoue les réponses enregistrées des sources
+"""
+
+import asyncio
+import os
+import random
+import threading
+import uuid
+from typing import Dict, Optional
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Chemin servi, page enregistrée, type MIME
+ROUTES = [
+    ('/', None, 'text/plain'),  # Mesure de latence des miroirs LibGen
+    ('/SRU', 'gallica_sru.xml', 'application/xml'),
+    ('/search.php', 'libgen_search.html', 'text/html'),
+    ('/ebooks/search/', 'gutenberg_search.html', 'text/html'),
+    ('/ebooks/{book_id}', 'gutenberg_book.html', 'text/html'),
+    ('/search', 'openlibrary_search.html', 'text/html'),
+    ('/works/{work_id}', 'openlibrary_work.html', 'text/html'),
+]
+
+class ReplayServer:
+    """
+    Rejoue les pages enregistrées de Gallica, LibGen, Gutenberg et Open Library
+    
+    Le serveur tourne dans sa propre boucle d'événements, dans un thread dédié, pour
+    ne pas partager la boucle du client HTTP mesuré. Chaque réponse est retardée de
+    latency ± jitter secondes. Les marqueurs {{token}} des pages de recherche sont
+    remplacés par une valeur unique à chaque requête : les pages de détail ont ainsi
+    des URL toujours nouvelles et ne sont jamais servies par le cache des métadonnées.
+    """
+    
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02,
+                 host: str = '127.0.0.1', port: int = 0):
+        """
+        Args:
+            latency: Délai moyen de réponse en secondes
+            jitter: Variation maximale autour du délai moyen
+            host: Adresse d'écoute
+            port: Port d'écoute (0 pour un port libre)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.host = host
+        self.port = port
+        self.requests: Dict[str, int] = {}
+        self._pages = {
+            fixture: open(os.path.join(FIXTURES_DIR, fixture), encoding='utf-8').read()
+            for _, fixture, _ in ROUTES if fixture
+        }
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+    
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+    
+    def _handler(self, fixture: Optional[str], content_type: str):
+        async def handle(request: web.Request) -> web.Response:
+            self.requests[fixture or 'probe'] = self.requests.get(fixture or 'probe', 0) + 1
+            delay = self.latency + random.uniform(-self.jitter, self.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            body = self._pages[fixture] if fixture else 'ok'
+            if '{{token}}' in body:
+                body = body.replace('{{token}}', '-' + uuid.uuid4().hex[:8])
+            return web.Response(text=body, content_type=content_type)
+        return handle
+    
+    async def _start(self):
+        app = web.Application()
+        for path, fixture, content_type in ROUTES:
+            app.router.add_get(path, self._handler(fixture, content_type))
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+    
+    def start(self) -> str:
+        """
+        Démarre le serveur dans un thread d'arrière-plan
+        
+        Returns:
+            URL de base du serveur
+        """
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='replay-server', daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(10)
+        return self.base_url
+    
+    def stop(self):
+        """Arrête le serveur"""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(description="Rejoue les pages enregistrées des sources")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    args = parser.parse_args()
+    
+    server = ReplayServer(args.latency, args.jitter, port=args.port)
+    print(f"Serveur de rejeu sur {server.start()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,310 @@
+"""
+Banc d'essai hors ligne du moteur de recherche
+
+Les sources sont redirigées vers un serveur local qui rejoue des pages enregistrées
+(voir replay_server.py), avec une latence et une gigue configurables. Mesures :
+
+- débit et latence de SearchEngine.search_async, à concurrence fixée ;
+- coût par adaptateur : durée d'un appel, temps réseau et temps d'analyse des pages ;
+- coût du calcul des scores ;
+- mémoire allouée par recherche.
+
+Usage :
+    python -m benchmarks.run_benchmarks [--queries 200] [--concurrency 10]
+                                        [--latency 0.05] [--jitter 0.02]
+                                        [--save-baseline] [--compare] [--tolerance 0.15]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+# Isole le stockage partagé (cache, état des sources) de celui de l'application
+os.environ.setdefault('FLASK_ENV', 'development')
+os.environ.setdefault('SHARED_STORAGE_PATH',
+                      os.path.join(tempfile.mkdtemp(prefix='book-finder-bench-'), 'storage.sqlite3'))
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.cache import get_detail_cache
+from app.core.config import Config
+from app.core.instrumentation import PhaseTimings, bind_timings
+from app.core.outbound import OutboundScheduler
+from app.core.storage import get_storage
+from app.core.search_engine import SearchEngine
+from benchmarks.replay_server import ReplayServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BASELINE_PATH = os.path.join(RESULTS_DIR, 'baseline.json')
+
+QUERY = 'les misérables'
+LANGUAGE = 'fr'
+
+# Indicateurs comparés à la référence : chemin dans le rapport, sens de l'amélioration
+TRACKED_METRICS = {
+    'throughput.queries_per_second': 'higher',
+    'throughput.latency_p50_ms': 'lower',
+    'throughput.latency_p95_ms': 'lower',
+    'scoring.us_per_result': 'lower',
+    'memory.peak_kib_per_query': 'lower',
+    'storage.us_per_incr': 'lower',
+}
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def redirect_sources(engine: SearchEngine, base_url: str) -> SearchEngine:
+    """Redirige toutes les sources du moteur vers le serveur de rejeu, sans limite de débit sortant"""
+    Config.OUTBOUND_RATE_LIMITS[OutboundScheduler.host(base_url)] = None
+    for source in engine.sources.values():
+        source.base_url = base_url
+        if hasattr(source, 'mirrors'):
+            source.mirrors = [base_url]
+    return engine
+
+def make_engine(base_url: str) -> SearchEngine:
+    """Crée un moteur dont toutes les sources pointent vers le serveur de rejeu"""
+    return redirect_sources(SearchEngine(), base_url)
+
+def clear_caches(engine: SearchEngine):
+    """Vide les caches des recherches, des sources et des pages de détail"""
+    engine.query_cache.clear()
+    engine.source_cache.clear()
+    get_detail_cache().clear()
+
+def bench_throughput(engine: SearchEngine, queries: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Recherches complètes à froid, à concurrence fixée
+    
+    Les caches sont vidés avant chaque recherche : sans cela, les pages de détail
+    des mêmes livres enregistrés seraient servies par le cache dès la deuxième.
+    """
+    latencies = []
+    counts = []
+    partial = []
+    
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def one(i):
+            async with semaphore:
+                clear_caches(engine)
+                start = time.perf_counter()
+                report = await engine.search_with_status(f'{QUERY} {i}', LANGUAGE)
+                latencies.append(time.perf_counter() - start)
+                counts.append(len(report.results))
+                partial.append(bool(report.timed_out or report.failed))
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(queries)))
+        return time.perf_counter() - start
+    
+    elapsed = engine.http_client.run_sync(run_all())
+    return {
+        'queries': queries,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'queries_per_second': round(queries / elapsed, 2),
+        'latency_p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'latency_p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'results_per_query': round(statistics.mean(counts), 1),
+        'partial_answers': sum(partial),
+    }
+
+def bench_adapters(engine: SearchEngine, repeats: int) -> Dict[str, Any]:
+    """Appels successifs de chaque adaptateur, avec le détail réseau / analyse"""
+    report = {}
+    for source_name, source in engine.sources.items():
+        timings = PhaseTimings()
+        
+        async def run_source():
+            session = await engine.http_client.get_session()
+            count = 0
+            start = time.perf_counter()
+            for i in range(repeats):
+                count += len(await source.search_async(f'{QUERY} {i}', LANGUAGE, session))
+            return time.perf_counter() - start, count
+        
+        elapsed, count = engine.http_client.run_sync(bind_timings(timings, run_source()))
+        phases = timings.as_dict()
+        network = phases.get(f'{source.key}-network', {'ms': 0, 'count': 0})
+        parse = phases.get(f'{source.key}-parse', {'ms': 0, 'count': 0})
+        report[source_name] = {
+            'call_ms': round(elapsed * 1000 / repeats, 2),
+            'network_ms_per_call': round(network['ms'] / repeats, 2),
+            'requests_per_call': round(network['count'] / repeats, 1),
+            'parse_ms_per_call': round(parse['ms'] / repeats, 2),
+            'parse_ms_per_page': round(parse['ms'] / parse['count'], 3) if parse['count'] else 0,
+            'results_per_call': round(count / repeats, 1),
+        }
+    return report
+
+def bench_scoring(engine: SearchEngine, size: int, repeats: int) -> Dict[str, Any]:
+    """Calcul des scores sur une liste de résultats issue des pages enregistrées"""
+    sample = engine.search(QUERY, LANGUAGE)
+    if not sample:
+        return {'results': 0, 'us_per_result': 0}
+    results = [dict(sample[i % len(sample)]) for i in range(size)]
+    
+    async def run():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            await engine._score_results([dict(result) for result in results], QUERY, LANGUAGE)
+        return time.perf_counter() - start
+    
+    elapsed = engine.http_client.run_sync(run())
+    return {
+        'results': size,
+        'ms_per_batch': round(elapsed * 1000 / repeats, 3),
+        'us_per_result': round(elapsed * 1e6 / (repeats * size), 2),
+    }
+
+def bench_storage(operations: int) -> Dict[str, Any]:
+    """Durée des opérations du stockage partagé (compteurs du limiteur, état des sources)"""
+    storage = get_storage()
+    namespace = 'bench'
+    storage.clear(namespace)
+    expires_at = time.time() + 60
+    timings = {}
+    
+    start = time.perf_counter()
+    for i in range(operations):
+        storage.incr(namespace, f'ip-{i % 100}', 1, expires_at)
+    timings['us_per_incr'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for i in range(operations):
+        storage.get(namespace, f'ip-{i % 100}')
+    timings['us_per_get'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for i in range(operations):
+        storage.update(namespace, f'state-{i % 100}', lambda value: '{}', expires_at)
+    timings['us_per_update'] = time.perf_counter() - start
+    
+    storage.clear(namespace)
+    report = {'backend': type(storage).__name__, 'operations': operations}
+    report.update({name: round(elapsed * 1e6 / operations, 2) for name, elapsed in timings.items()})
+    return report
+
+def bench_memory(engine: SearchEngine, queries: int) -> Dict[str, Any]:
+    """Pic de mémoire allouée pendant une recherche à froid (tracemalloc)"""
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    try:
+        for i in range(queries):
+            clear_caches(engine)
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            engine.search(f'{QUERY} mémoire {i}', LANGUAGE)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+            retained.append(after - current)
+    finally:
+        tracemalloc.stop()
+    return {
+        'queries': queries,
+        'peak_kib_per_query': round(statistics.mean(peaks) / 1024, 1),
+        'max_peak_kib': round(max(peaks) / 1024, 1),
+        'retained_kib_per_query': round(statistics.mean(retained) / 1024, 1),
+    }
+
+def lookup(report: Dict[str, Any], path: str) -> float:
+    value = report
+    for part in path.split('.'):
+        value = value[part]
+    return value
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Compare les indicateurs suivis à la référence
+    
+    Returns:
+        Liste des régressions au-delà de la tolérance
+    """
+    regressions = []
+    print(f"\nComparaison avec la référence du {baseline['meta']['date']}")
+    for path, better in TRACKED_METRICS.items():
+        try:
+            old, new = lookup(baseline, path), lookup(report, path)
+        except KeyError:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = change < -tolerance if better == 'higher' else change > tolerance
+        flag = '  RÉGRESSION' if worse else ''
+        print(f"  {path:<35} {old:>10} -> {new:>10} ({change:+.1%}){flag}")
+        if worse:
+            regressions.append(path)
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne du moteur de recherche")
+    parser.add_argument('--queries', type=int, default=200, help="Recherches pour la mesure de débit")
+    parser.add_argument('--concurrency', type=int, default=10, help="Recherches simultanées")
+    parser.add_argument('--latency', type=float, default=0.05, help="Latence simulée des sources (s)")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Gigue de la latence simulée (s)")
+    parser.add_argument('--repeats', type=int, default=20, help="Appels par adaptateur")
+    parser.add_argument('--output', help="Fichier où écrire le rapport JSON")
+    parser.add_argument('--save-baseline', action='store_true', help="Enregistre le rapport comme référence")
+    parser.add_argument('--compare', action='store_true', help="Compare le rapport à la référence")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Écart toléré avant régression")
+    args = parser.parse_args(argv)
+    
+    # Les journaux de chaque recherche fausseraient les mesures
+    logging.getLogger('app').setLevel(logging.ERROR)
+    
+    server = ReplayServer(args.latency, args.jitter)
+    base_url = server.start()
+    try:
+        engine = make_engine(base_url)
+        report = {
+            'meta': {
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'latency_s': args.latency,
+                'jitter_s': args.jitter,
+            },
+            'throughput': bench_throughput(engine, args.queries, args.concurrency),
+            'adapters': bench_adapters(engine, args.repeats),
+            'scoring': bench_scoring(engine, size=200, repeats=args.repeats),
+            'memory': bench_memory(engine, queries=max(5, args.repeats // 2)),
+            'storage': bench_storage(operations=args.repeats * 100),
+        }
+    finally:
+        server.stop()
+    
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    regressions = []
+    if args.compare:
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, encoding='utf-8') as f:
+                regressions = compare(report, json.load(f), args.tolerance)
+        else:
+            print(f"\nAucune référence dans {BASELINE_PATH}")
+    if args.save_baseline:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nRéférence enregistrée dans {BASELINE_PATH}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,22 @@
+"""
+Configuration Gunicorn pour la production, avec des workers ASGI (uvicorn)
+
+    gunicorn -c gunicorn_asgi_config.py
+
+Reprend gunicorn_config.py ; seuls le type et le nombre de workers changent.
+"""
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gunicorn_config import *  # noqa: E402,F401,F403
+
+# Application ASGI : Flask servie sur la boucle d'événements du worker (app/asgi.py)
+wsgi_app = "app.asgi:application"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Un worker multiplexe toutes ses recherches sur sa boucle : un par cœur suffit
+workers = multiprocessing.cpu_count()
+
+def post_worker_init(worker):
+    """Le préchauffage démarre avec la boucle du worker (lifespan, voir app/asgi.py)"""
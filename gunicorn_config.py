@@ -1,6 +1,7 @@
 """Configuration Gunicorn pour la production"""
 import multiprocessing
 import os
+import shutil
 
 # Paramètres du serveur
 bind = "127.0.0.1:5002"  # Bind sur localhost uniquement
@@ -33,3 +34,24 @@ limit_request_field_size = 8190
 
 # Utiliser /dev/shm pour les fichiers temporaires (plus sécurisé)
 worker_tmp_dir = "/dev/shm"
+
+# Métriques Prometheus : chaque worker écrit dans ce répertoire, /metrics agrège l'ensemble
+prometheus_multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                                 '/dev/shm/book-finder-metrics')
+
+def on_starting(server):
+    """Vide les métriques d'une exécution précédente"""
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, mode=0o750)
+    # Les workers s'exécutent sous l'utilisateur configuré
+    os.chown(prometheus_multiproc_dir, server.cfg.uid, server.cfg.gid)
+
+def post_worker_init(worker):
+    """Préchauffe les caches avec les requêtes les plus fréquentes (un seul worker par intervalle)"""
+    from app.app import warmer
+    warmer.start()
+
+def child_exit(server, worker):
+    """Retire les jauges d'un worker arrêté"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
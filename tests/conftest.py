@@ -0,0 +1,10 @@
+"""
+Configuration commune des tests
+"""
+
+import os
+import tempfile
+
+# Isole le stockage partagé (cache, état des sources) de celui de l'application
+os.environ.setdefault('SHARED_STORAGE_PATH',
+                      os.path.join(tempfile.mkdtemp(prefix='book-finder-tests-'), 'storage.sqlite3'))
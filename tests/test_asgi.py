@@ -0,0 +1,84 @@
+"""
+Tests du point d'entrée ASGI
+"""
+
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from app.app import limiter, search_engine
+from app.asgi import application
+from app.core.base_source import BookSource
+from app.core.health import HealthTracker
+
+class SlowSource(BookSource):
+    """Source factice qui répond après un délai donné"""
+    
+    def __init__(self, delay):
+        super().__init__('Slow', 'http://slow.invalid')
+        self.delay = delay
+    
+    async def search_async(self, query, language, session):
+        await asyncio.sleep(self.delay)
+        return [{'title': query, 'author': 'Frank Herbert', 'url': f'{self.base_url}/{query}',
+                 'source': self.name, 'language': language}]
+
+@pytest.fixture
+def slow_engine(monkeypatch):
+    monkeypatch.setattr(search_engine, 'sources', {'slow': SlowSource(0.2)})
+    monkeypatch.setattr(limiter, 'enabled', False)
+    search_engine.query_cache.clear()
+    search_engine.source_cache.clear()
+    search_engine.health.storage.clear(HealthTracker.NAMESPACE)
+    return search_engine
+
+def serve(coro_factory):
+    """Exécute des requêtes sur une boucle, comme un worker uvicorn, puis arrête le worker"""
+    async def run():
+        transport = httpx.ASGITransport(app=application)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url='https://testserver') as client:
+                return await coro_factory(client)
+        finally:
+            await application.shutdown()
+    return asyncio.run(run())
+
+def test_searches_are_multiplexed_on_the_server_loop(slow_engine):
+    """Test que les recherches simultanées partagent la boucle du serveur sans s'attendre"""
+    async def requests(client):
+        start = time.monotonic()
+        responses = await asyncio.gather(*(
+            client.get('/search', params={'q': f'Dune {i}', 'lang': 'fr'}) for i in range(50)
+        ))
+        # Le client HTTP s'exécute sur la boucle du serveur
+        assert search_engine.http_client.attached
+        assert search_engine.http_client.loop is asyncio.get_running_loop()
+        return responses, time.monotonic() - start
+    
+    responses, elapsed = serve(requests)
+    assert [response.status_code for response in responses] == [200] * 50
+    assert responses[7].json()[0]['title'] == 'Dune 7'
+    # 50 recherches de 0,2 s en parallèle, et non l'une après l'autre
+    assert elapsed < 2
+
+def test_stream_is_served_from_the_async_generator(slow_engine):
+    """Test que le flux NDJSON est diffusé sous ASGI"""
+    async def request(client):
+        return await client.get('/search/stream', params={'q': 'Dune', 'lang': 'fr'})
+    
+    response = serve(request)
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event['type'] for event in events] == ['results', 'done']
+    assert events[0]['results'][0]['title'] == 'Dune'
+
+def test_client_leaves_the_stopped_server_loop(slow_engine):
+    """Test que le client HTTP reprend sa propre boucle une fois le serveur arrêté"""
+    async def request(client):
+        return await client.get('/search', params={'q': 'Dune', 'lang': 'fr'})
+    
+    assert serve(request).status_code == 200
+    assert not search_engine.http_client.attached
+    assert search_engine.search('Dune') != []
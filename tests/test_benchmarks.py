@@ -0,0 +1,25 @@
+"""
+Tests du serveur de rejeu des bancs d'essai
+"""
+
+import pytest
+from benchmarks.replay_server import ReplayServer
+from benchmarks.run_benchmarks import make_engine
+
+@pytest.fixture(scope='module')
+def replay_url():
+    server = ReplayServer(latency=0, jitter=0)
+    yield server.start()
+    server.stop()
+
+def test_recorded_pages_match_the_adapters(replay_url):
+    """Test que chaque adaptateur extrait des résultats des pages enregistrées"""
+    engine = make_engine(replay_url)
+    
+    async def run(source):
+        return await source.search_async('les misérables', 'fr', await engine.http_client.get_session())
+    
+    for source_name, source in engine.sources.items():
+        results = engine.http_client.run_sync(run(source))
+        assert results, f"Aucun résultat pour {source_name}"
+        assert all(result['url'] for result in results)
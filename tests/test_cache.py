@@ -0,0 +1,132 @@
+"""
+Tests du cache des résultats de recherche
+"""
+
+import asyncio
+import time
+import pytest
+from app.core.base_source import BookSource
+from app.core.config import Config
+from app.core.cache import ResultCache, LRUCache, CacheEntry, make_cache_key, FRESH, STALE, MISS
+from app.core.health import HealthTracker
+from app.core.search_engine import SearchEngine
+from app.core.storage import SQLiteStorage
+
+class CountingSource(BookSource):
+    """Source factice qui compte ses appels"""
+    
+    def __init__(self):
+        super().__init__('Counting', 'http://counting.invalid')
+        self.calls = 0
+    
+    async def search_async(self, query, language, session):
+        self.calls += 1
+        return [{'title': query, 'author': 'Auteur', 'url': f'{self.base_url}/1',
+                 'source': self.name, 'language': language}]
+
+class FailingSource(CountingSource):
+    """Source factice toujours en erreur"""
+    
+    async def search_async(self, query, language, session):
+        self.calls += 1
+        raise asyncio.TimeoutError()
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / 'cache.sqlite3'))
+
+@pytest.fixture
+def engine():
+    engine = SearchEngine()
+    engine.sources = {'counting': CountingSource()}
+    engine.query_cache.clear()
+    engine.source_cache.clear()
+    engine.health.storage.clear(HealthTracker.NAMESPACE)
+    return engine
+
+def test_cache_keys_are_normalized():
+    """Test que les variantes de casse et d'espaces partagent la même clé"""
+    assert make_cache_key('fr', 'Les  Misérables ') == make_cache_key('fr', 'les misérables')
+    assert make_cache_key('fr', 'Dune') != make_cache_key('en', 'Dune')
+
+def test_lru_evicts_least_recently_used():
+    """Test l'éviction LRU du cache en mémoire"""
+    cache = LRUCache(2)
+    entry = CacheEntry('v', time.time() + 60, time.time() + 60)
+    cache.set('a', entry)
+    cache.set('b', entry)
+    cache.get('a')
+    cache.set('c', entry)
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+
+def test_cache_states(storage):
+    """Test les états frais, périmé et absent"""
+    cache = ResultCache('test', stale_ttl=60, storage=storage)
+    assert cache.get('k') == (None, MISS)
+    cache.set('k', [1, 2], ttl=60)
+    assert cache.get('k') == ([1, 2], FRESH)
+    cache.set('k', [3], ttl=-1)
+    assert cache.get('k') == ([3], STALE)
+
+def test_shared_tier_is_visible_to_other_workers(storage):
+    """Test qu'une entrée écrite par un worker est lue par un autre"""
+    ResultCache('test', storage=storage).set('k', {'a': 1}, ttl=60)
+    other = ResultCache('test', storage=storage)
+    assert other.get('k') == ({'a': 1}, FRESH)
+    assert other.stats['storage_hits'] == 1
+
+def test_engine_serves_repeated_queries_from_cache(engine):
+    """Test qu'une requête répétée n'interroge plus les sources"""
+    source = engine.sources['counting']
+    first = engine.search('Dune', 'fr')
+    second = engine.search('  dune ', 'fr')
+    assert source.calls == 1
+    assert [r['url'] for r in first] == [r['url'] for r in second]
+
+def test_engine_refreshes_stale_entries_in_background(engine):
+    """Test le rafraîchissement en arrière-plan d'une entrée périmée"""
+    source = engine.sources['counting']
+    key = make_cache_key('fr', 'Dune')
+    engine.query_cache.set(key, [{'title': 'ancien', 'author': '', 'url': 'u'}], ttl=-1)
+    
+    results = engine.search('Dune', 'fr')
+    assert results[0]['title'] == 'ancien'
+    
+    deadline = time.time() + 2
+    # Attend aussi la fin de la tâche, qui écrit dans le stockage partagé après la mémoire
+    while (engine._background_tasks or engine.query_cache.get(key)[1] != FRESH) and time.time() < deadline:
+        time.sleep(0.01)
+    assert source.calls == 1
+    assert engine.query_cache.get(key)[0]['results'][0]['title'] == 'Dune'
+
+def test_only_stale_sources_are_refetched(engine):
+    """Test qu'une source expirée est réinterrogée sans toucher aux sources fraîches"""
+    engine.sources['other'] = CountingSource()
+    engine.search('Dune', 'fr')
+    engine.query_cache.clear()
+    engine.source_cache.set(make_cache_key('other', 'fr', 'Dune'),
+                            {'results': [], 'status': 'empty'}, ttl=-1, stale_ttl=0)
+    
+    engine.search('Dune', 'fr')
+    assert engine.sources['counting'].calls == 1
+    assert engine.sources['other'].calls == 2
+
+def test_source_failures_are_cached_briefly(engine):
+    """Test qu'une source en panne n'est pas réinterrogée à chaque requête"""
+    engine.sources['failing'] = FailingSource()
+    first = engine.search('Dune', 'fr')
+    engine.query_cache.clear()
+    second = engine.search('Dune', 'fr')
+    assert engine.sources['failing'].calls == 1
+    assert len(first) == len(second) == 1
+    entry, state = engine.source_cache.get_entry(make_cache_key('failing', 'fr', 'Dune'))
+    assert entry.value['status'] == 'error'
+    assert entry.fresh_until - time.time() <= Config.CACHE_FAILURE_TTL
+
+def test_partial_results_use_shortest_ttl(engine):
+    """Test qu'une réponse incomplète n'est pas mise en cache aussi longtemps qu'une réponse complète"""
+    engine.sources['failing'] = FailingSource()
+    engine.search('Dune', 'fr')
+    entry, state = engine.query_cache.get_entry(make_cache_key('fr', 'Dune'))
+    assert entry.fresh_until - time.time() <= Config.CACHE_FAILURE_TTL
@@ -0,0 +1,82 @@
+"""
+Tests de la fusion des doublons entre les sources
+"""
+
+import time
+from app.core.dedup import ResultMerger, fingerprints, merge_duplicates
+from app.sources.gallica import GallicaSource
+
+def result(title, author, source, url, **fields):
+    return {'title': title, 'author': author, 'source': source, 'url': url,
+            'read_url': None, 'download_url': None, **fields}
+
+def test_same_work_from_several_sources_is_merged():
+    """Test qu'une même œuvre est regroupée en une entrée qui garde les liens de chaque source"""
+    results = [
+        result('Les Misérables', 'Victor Hugo', 'Project Gutenberg', 'https://gutenberg.org/ebooks/1',
+               read_url='https://gutenberg.org/ebooks/1'),
+        result('Les misérables', 'Hugo, Victor', 'Library Genesis',
+               'https://libgen.is/book/index.php?md5=0123456789abcdef0123456789abcdef',
+               download_url='https://libgen.is/get.php?md5=0123456789abcdef0123456789abcdef'),
+        result('Misérables (Les)', 'HUGO Victor', 'Open Library', 'https://openlibrary.org/works/OL1W',
+               read_url='https://openlibrary.org/borrow/1'),
+        result('Notre-Dame de Paris', 'Victor Hugo', 'Project Gutenberg', 'https://gutenberg.org/ebooks/2'),
+    ]
+    merged = merge_duplicates(results)
+    assert [entry['title'] for entry in merged] == ['Les Misérables', 'Notre-Dame de Paris']
+    assert [link['source'] for link in merged[0]['links']] == [
+        'Project Gutenberg', 'Library Genesis', 'Open Library']
+    # L'entrée principale garde son lien de lecture et reçoit le téléchargement LibGen
+    assert merged[0]['read_url'] == 'https://gutenberg.org/ebooks/1'
+    assert merged[0]['download_url'].endswith('0123456789abcdef0123456789abcdef')
+
+def test_best_scored_duplicate_becomes_the_main_entry():
+    """Test que l'entrée principale est le doublon de meilleur score, quel que soit l'ordre"""
+    results = [
+        result('Dune', 'Frank Herbert', 'Open Library', 'https://openlibrary.org/works/OL2W',
+               read_url='https://openlibrary.org/borrow/2', score=0.4),
+        result('Dune', 'Frank Herbert', 'Project Gutenberg', 'https://gutenberg.org/ebooks/3', score=0.9),
+    ]
+    for ordered in (results, results[::-1]):
+        merged = merge_duplicates([dict(r) for r in ordered])
+        assert len(merged) == 1
+        assert merged[0]['source'] == 'Project Gutenberg'
+        assert merged[0]['score'] == 0.9
+        assert merged[0]['read_url'] == 'https://openlibrary.org/borrow/2'
+        assert len(merged[0]['links']) == 2
+
+def test_distinct_works_are_kept_apart():
+    """Test que des tomes différents ou des auteurs inconnus ne sont pas fusionnés"""
+    gallica = GallicaSource()
+    volumes = []
+    for i, title in enumerate(['Les Misérables. Tome 1', 'Les Misérables. Tome 2'], 1):
+        # Résultats construits comme par l'adaptateur Gallica : le tome quitte le titre
+        clean_title, series_name, volume = gallica.extract_series_info(title)
+        volumes.append(gallica.format_result(clean_title, 'Hugo, Victor', f'https://gallica.bnf.fr/{i}',
+                                             series_name=series_name, series_volume=volume))
+    assert volumes[0]['title'] == volumes[1]['title']
+    results = volumes + [
+        result('Poèmes', 'Auteur inconnu', 'Gallica', 'https://gallica.bnf.fr/3'),
+        result('Poèmes', 'Auteur inconnu', 'Gallica', 'https://gallica.bnf.fr/4'),
+    ]
+    assert len(merge_duplicates(results)) == 4
+    assert fingerprints(results[2]) == []
+
+def test_identifiers_match_across_titles():
+    """Test que le md5 LibGen rapproche deux résultats aux titres différents"""
+    md5 = 'md5=FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF'
+    merger = ResultMerger()
+    assert len(merger.add([result('Dune', 'Frank Herbert', 'Library Genesis', f'https://a/book?{md5}')])) == 1
+    # Une entrée déjà émise absorbe ses doublons arrivés plus tard
+    assert merger.add([result('Dune (French edition)', 'F. Herbert', 'Library Genesis',
+                              f'https://b/book?{md5.lower()}')]) == []
+    assert len(merger.results[0]['links']) == 2
+
+def test_merge_is_linear():
+    """Test que des centaines de résultats sont fusionnés sans comparaison deux à deux"""
+    results = [result(f'Livre {i % 300}', f'Auteur {i % 300}', 'Source', f'https://s/{i}')
+               for i in range(1200)]
+    start = time.perf_counter()
+    merged = merge_duplicates(results)
+    assert len(merged) == 300
+    assert time.perf_counter() - start < 0.5
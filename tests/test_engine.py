@@ -0,0 +1,299 @@
+"""
+Tests du moteur de recherche avec des sources factices
+"""
+
+import asyncio
+import logging
+import time
+import pytest
+from app.core.base_source import BookSource
+from app.core.cache import make_cache_key, MISS
+from app.core.config import Config
+from app.core.health import HealthTracker
+from app.core.instrumentation import start_timings
+from app.core.outbound import OutboundScheduler
+from app.core.storage import MemoryStorage
+from app.core.search_engine import SearchEngine, decode_cursor, encode_cursor
+
+class FakeSource(BookSource):
+    """Source factice qui répond après un délai donné"""
+    
+    def __init__(self, delay=0.0, title='Dune'):
+        super().__init__('Fake', 'http://fake.invalid')
+        self.delay = delay
+        self.title = title
+        self.calls = 0
+    
+    async def search_async(self, query, language, session):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return [{'title': self.title, 'author': 'Frank Herbert', 'url': f'{self.base_url}/{self.title}',
+                 'source': self.name, 'language': language}]
+
+@pytest.fixture
+def engine():
+    engine = SearchEngine()
+    engine.sources = {'fast': FakeSource()}
+    engine.query_cache.clear()
+    engine.source_cache.clear()
+    engine.health.storage.clear(HealthTracker.NAMESPACE)
+    return engine
+
+def collect(engine, query, language='fr'):
+    """Parcourt la recherche en flux et retourne ses événements"""
+    return list(engine.http_client.iterate(engine.iter_search(query, language)))
+
+def test_slow_source_is_abandoned_after_its_budget(engine, monkeypatch):
+    """Test que la réponse partielle est renvoyée sans attendre la source lente"""
+    monkeypatch.setitem(Config.SOURCE_TIMEOUTS, 'slow', 0.05)
+    engine.sources['slow'] = FakeSource(delay=10)
+    
+    start = time.time()
+    report = engine.http_client.run_sync(engine.search_with_status('Dune', 'fr'))
+    assert time.time() - start < 1
+    assert len(report.results) == 1
+    assert report.timed_out == ['slow']
+    # Une réponse partielle n'est pas mise en cache
+    assert engine.query_cache.get(make_cache_key('fr', 'Dune'))[1] == MISS
+
+def test_global_deadline_cancels_stragglers(engine, monkeypatch):
+    """Test que le délai global interrompt les sources restantes"""
+    monkeypatch.setattr(Config, 'SEARCH_DEADLINE', 0.05)
+    monkeypatch.setitem(Config.SOURCE_TIMEOUTS, 'slow', 10)
+    engine.sources['slow'] = FakeSource(delay=10)
+    
+    start = time.time()
+    report = engine.http_client.run_sync(engine.search_with_status('Dune', 'fr'))
+    assert time.time() - start < 1
+    assert report.timed_out == ['slow']
+
+def test_stream_emits_sources_as_they_complete(engine):
+    """Test que la source la plus rapide est émise en premier"""
+    engine.sources = {'slow': FakeSource(delay=0.1, title='Dune Messiah'), 'fast': FakeSource()}
+    
+    events = collect(engine, 'Dune')
+    assert [event.get('source') for event in events] == ['fast', 'slow', None]
+    assert events[-1] == {'type': 'done', 'timed_out': [], 'failed': [], 'next_cursor': None}
+    assert events[0]['results'][0]['score'] > 0
+    
+    # La réponse complète est ensuite servie depuis le cache
+    cached = collect(engine, 'Dune')
+    assert cached[0]['status'] == 'cached'
+    assert [r['title'] for r in cached[0]['results']] == ['Dune', 'Dune Messiah']
+
+def test_stream_updates_results_completed_by_later_duplicates(engine):
+    """Test qu'un doublon arrivé plus tard renvoie l'entrée déjà émise avec ses liens"""
+    mirror = FakeSource(delay=0.1)
+    mirror.base_url = 'http://mirror.invalid'
+    engine.sources = {'fast': FakeSource(), 'mirror': mirror}
+    
+    events = collect(engine, 'Dune')
+    assert [(event['type'], event.get('source')) for event in events] == [
+        ('results', 'fast'), ('results', 'mirror'), ('update', 'mirror'), ('done', None)]
+    assert events[1]['results'] == []
+    update = events[2]['results'][0]
+    assert update['replaces'] == 'http://fake.invalid/Dune'
+    assert [link['url'] for link in update['links']] == ['http://fake.invalid/Dune',
+                                                         'http://mirror.invalid/Dune']
+    
+    # Les entrées mises en cache ne portent pas le champ replaces
+    cached = collect(engine, 'Dune')[0]['results']
+    assert len(cached) == 1 and 'replaces' not in cached[0]
+    assert len(cached[0]['links']) == 2
+
+def test_stream_reports_timed_out_sources(engine, monkeypatch):
+    """Test que le flux signale les sources abandonnées"""
+    monkeypatch.setattr(Config, 'SEARCH_DEADLINE', 0.05)
+    monkeypatch.setitem(Config.SOURCE_TIMEOUTS, 'slow', 10)
+    engine.sources['slow'] = FakeSource(delay=10)
+    
+    events = collect(engine, 'Dune')
+    assert events[-1]['timed_out'] == ['slow']
+
+class BrokenSource(FakeSource):
+    """Source factice toujours en erreur"""
+    
+    async def search_async(self, query, language, session):
+        self.calls += 1
+        raise ConnectionError('upstream down')
+
+def test_engine_skips_sources_with_open_circuit(engine):
+    """Test qu'une source en panne n'est plus interrogée une fois son circuit ouvert"""
+    broken = engine.sources['broken'] = BrokenSource()
+    for i in range(Config.HEALTH_FAILURE_THRESHOLD + 3):
+        # Requêtes distinctes pour ne pas passer par le cache des échecs
+        report = engine.http_client.run_sync(engine.search_with_status(f'Dune {i}', 'fr'))
+        assert report.failed == ['broken']
+    assert broken.calls == Config.HEALTH_FAILURE_THRESHOLD
+
+class ThrottledSource(FakeSource):
+    """Source factice qui attend son créneau d'envoi avant de répondre"""
+    
+    async def search_async(self, query, language, session):
+        await self.throttle(f'{self.base_url}/search')
+        return await super().search_async(query, language, session)
+
+def test_throttled_source_is_neither_recorded_nor_cached(engine, monkeypatch):
+    """Test qu'une recherche refusée par le débit sortant ne touche ni la santé ni le cache"""
+    scheduler = OutboundScheduler(MemoryStorage())
+    monkeypatch.setattr(ThrottledSource, 'scheduler', scheduler)
+    monkeypatch.setitem(Config.OUTBOUND_RATE_LIMITS, 'fake.invalid', (0.1, 1))
+    monkeypatch.setattr(Config, 'OUTBOUND_MAX_WAIT', 0)
+    scheduler.reserve('http://fake.invalid/search')
+    throttled = engine.sources['throttled'] = ThrottledSource()
+    
+    report = engine.http_client.run_sync(engine.search_with_status('Dune', 'fr'))
+    assert report.failed == ['throttled']
+    assert throttled.calls == 0
+    assert engine.health.snapshot(['throttled'])['throttled']['samples'] == 0
+    assert engine.source_cache.get(make_cache_key('throttled', 'fr', 'Dune'))[1] == MISS
+    # Réponse partielle : le lot n'est pas mis en cache non plus
+    assert engine.query_cache.get(make_cache_key('fr', 'Dune'))[1] == MISS
+
+class DetailSource(ThrottledSource):
+    """Source factice qui lit une page de détail par livre trouvé"""
+    
+    async def search_async(self, query, language, session):
+        self.calls += 1
+        
+        async def fetch_one(i):
+            await self.throttle(f'{self.base_url}/ebooks/{i}')
+            return {'title': f'{self.title} {i}', 'author': 'Frank Herbert', 'source': self.name,
+                    'url': f'{self.base_url}/ebooks/{i}', 'language': language}
+        
+        return await self.fetch_details(range(6), fetch_one)
+
+def test_throttled_detail_pages_make_a_partial_answer(engine, monkeypatch):
+    """Test qu'une liste tronquée par le débit sortant n'est ni gardée longtemps ni comptée comme un succès"""
+    scheduler = OutboundScheduler(MemoryStorage())
+    monkeypatch.setattr(ThrottledSource, 'scheduler', scheduler)
+    monkeypatch.setitem(Config.OUTBOUND_RATE_LIMITS, 'fake.invalid', (0.1, 4))
+    monkeypatch.setattr(Config, 'OUTBOUND_MAX_WAIT', 0)
+    monkeypatch.setattr(Config, 'DETAIL_FETCH_CONCURRENCY_DEFAULT', 1)
+    engine.sources = {'details': DetailSource()}
+    
+    report = engine.http_client.run_sync(engine.search_with_status('Dune', 'fr'))
+    assert [r['title'] for r in report.results] == ['Dune 0', 'Dune 1', 'Dune 2', 'Dune 3']
+    entry, _ = engine.source_cache.get_entry(make_cache_key('details', 'fr', 'Dune'))
+    assert entry.value['status'] == 'partial'
+    assert entry.fresh_until - time.time() <= Config.CACHE_FAILURE_TTL
+    assert engine.health.snapshot(['details'])['details']['samples'] == 0
+
+def test_one_summary_record_per_query(engine, caplog):
+    """Test qu'une recherche produit un seul enregistrement récapitulatif"""
+    engine.sources = {'fast': FakeSource(0.01)}
+    with caplog.at_level(logging.INFO, logger='app.search'):
+        engine.search('Dune', 'fr')
+        engine.search('Dune', 'fr')
+    
+    first, second = [record.search for record in caplog.records if record.name == 'app.search']
+    assert first['query_length'] == 4
+    assert all('Dune' not in record.getMessage() for record in caplog.records if record.name == 'app.search')
+    assert first['sources']['fast']['status'] == 'ok'
+    assert first['sources']['fast']['elapsed'] >= 0.01
+    assert second['cache'] == 'fresh'
+
+def test_metrics_record_source_latency_and_cache(engine):
+    """Test que les recherches alimentent les métriques Prometheus"""
+    from prometheus_client import REGISTRY
+    
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+    
+    engine.sources = {'metered': FakeSource(0.01)}
+    before = sample('book_finder_source_latency_seconds_count', source='metered', status='ok')
+    misses = sample('book_finder_cache_requests_total', cache='queries', result='miss')
+    engine.search('Dune', 'fr')
+    engine.search('Dune', 'fr')
+    
+    assert sample('book_finder_source_latency_seconds_count', source='metered', status='ok') == before + 1
+    assert sample('book_finder_cache_requests_total', cache='queries', result='miss') == misses + 1
+    assert sample('book_finder_queries_in_flight') == 0
+
+class ParsingSource(FakeSource):
+    """Source factice qui analyse une page"""
+    
+    async def search_async(self, query, language, session):
+        self.parse_html('<ul><li>Dune</li></ul>', 'html.parser')
+        return await super().search_async(query, language, session)
+
+def test_phase_timings_follow_the_query_to_the_client_loop(engine):
+    """Test que les durées mesurées sur la boucle du client sont rattachées à la requête"""
+    engine.sources = {'parsing': ParsingSource(0.01)}
+    timings = start_timings()
+    engine.search('Dune', 'fr')
+    
+    phases = timings.as_dict()
+    assert {'parsing-total', 'test_engine-parse', 'score'} <= set(phases)
+    assert 'parsing-total;dur=' in timings.server_timing()
+
+class PagedSource(FakeSource):
+    """Source factice paginée, avec trois pages de résultats"""
+    
+    paginated = True
+    
+    def __init__(self):
+        super().__init__()
+        self.pages = []
+    
+    async def search_async(self, query, language, session, page=0):
+        self.calls += 1
+        self.pages.append(page)
+        if page >= 3:
+            return []
+        return [{'title': f'Dune {page}', 'author': 'Frank Herbert', 'url': f'{self.base_url}/{page}',
+                 'source': self.name, 'language': language}]
+
+def test_cursor_pages_through_sources_and_prefetches_next_page(engine):
+    """Test la pagination par curseur et la préparation de la page suivante en arrière-plan"""
+    engine.sources['paged'] = PagedSource()
+    first = engine.http_client.run_sync(engine.search_with_status('Dune', 'fr'))
+    assert sorted(r['title'] for r in first.results) == ['Dune', 'Dune 0']
+    # Seule la source paginée figure dans le curseur
+    assert decode_cursor(first.next_cursor) == ({'paged': 1}, 0)
+    
+    deadline = time.time() + 2
+    while engine._background_tasks and time.time() < deadline:
+        time.sleep(0.01)
+    assert engine.sources['paged'].calls == 2
+    
+    # La page suivante a été préparée : elle est servie sans interroger la source
+    second = engine.http_client.run_sync(engine.search_with_status('Dune', 'fr', first.next_cursor))
+    assert [r['title'] for r in second.results] == ['Dune 1']
+    # La page 2 peut déjà être en préparation, mais la page 1 n'a été demandée qu'une fois
+    assert engine.sources['paged'].pages.count(1) == 1
+    assert decode_cursor(second.next_cursor) == ({'paged': 2}, 0)
+
+def test_invalid_cursor_is_rejected(engine):
+    """Test qu'un curseur mal formé ou hors limites est refusé"""
+    for cursor in ('???', encode_cursor({'paged': -1}), encode_cursor({'paged': Config.SEARCH_MAX_PAGES}),
+                   encode_cursor({'paged': 1}, -10)):
+        with pytest.raises(ValueError):
+            engine.http_client.run_sync(engine.search_with_status('Dune', 'fr', cursor))
+
+class ManySource(FakeSource):
+    """Source factice qui renvoie de nombreux résultats de pertinence décroissante"""
+    
+    async def search_async(self, query, language, session):
+        self.calls += 1
+        return [{'title': 'Dune' + 'x' * i, 'author': 'Frank Herbert', 'url': f'{self.base_url}/{i}',
+                 'source': self.name, 'language': language} for i in range(25)]
+
+def test_response_keeps_only_the_best_results(engine, monkeypatch):
+    """Test que seuls les meilleurs résultats sont renvoyés, le reste du lot restant paginable"""
+    monkeypatch.setattr(Config, 'MAX_SEARCH_RESULTS', 10)
+    engine.sources = {'many': ManySource()}
+    first = engine.http_client.run_sync(engine.search_with_status('Dune', 'fr'))
+    assert [r['url'] for r in first.results] == [f'http://fake.invalid/{i}' for i in range(10)]
+    assert decode_cursor(first.next_cursor) == ({'many': 0}, 10)
+    
+    # La suite du lot est servie depuis le cache, sans réinterroger la source
+    pages = [first.results]
+    cursor = first.next_cursor
+    while cursor:
+        report = engine.http_client.run_sync(engine.search_with_status('Dune', 'fr', cursor))
+        pages.append(report.results)
+        cursor = report.next_cursor
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [r['url'] for page in pages for r in page] == [f'http://fake.invalid/{i}' for i in range(25)]
+    assert engine.sources['many'].calls == 1
@@ -0,0 +1,62 @@
+"""
+Tests du suivi de santé des sources
+"""
+
+import pytest
+from app.core.config import Config
+from app.core.health import HealthTracker, CLOSED, OPEN, HALF_OPEN
+from app.core.storage import SQLiteStorage
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / 'health.sqlite3'))
+
+@pytest.fixture
+def health(storage):
+    return HealthTracker(storage)
+
+def test_circuit_opens_after_consecutive_failures(health):
+    """Test l'ouverture du circuit après des échecs répétés"""
+    for _ in range(Config.HEALTH_FAILURE_THRESHOLD - 1):
+        health.record('libgen', False, 10)
+    assert health.allow('libgen')
+    health.record('libgen', False, 10)
+    assert health.get_state('libgen')['state'] == OPEN
+    assert not health.allow('libgen')
+
+def test_state_is_shared_between_workers(storage):
+    """Test qu'un circuit ouvert par un worker l'est pour les autres"""
+    for _ in range(Config.HEALTH_FAILURE_THRESHOLD):
+        HealthTracker(storage).record('libgen', False, 10)
+    assert not HealthTracker(storage).allow('libgen')
+
+def test_single_probe_after_cooldown(health, monkeypatch):
+    """Test qu'une seule requête de test est autorisée après le délai d'ouverture"""
+    monkeypatch.setattr(Config, 'HEALTH_OPEN_COOLDOWN', 0)
+    for _ in range(Config.HEALTH_FAILURE_THRESHOLD):
+        health.record('libgen', False, 10)
+    
+    assert health.allow('libgen')
+    assert health.get_state('libgen')['state'] == HALF_OPEN
+    assert not health.allow('libgen')
+    
+    health.record('libgen', True, 0.2)
+    assert health.get_state('libgen')['state'] == CLOSED
+    assert health.allow('libgen')
+
+def test_failed_probe_reopens_circuit(health, monkeypatch):
+    """Test que l'échec de la requête de test rouvre le circuit"""
+    monkeypatch.setattr(Config, 'HEALTH_OPEN_COOLDOWN', 0)
+    for _ in range(Config.HEALTH_FAILURE_THRESHOLD):
+        health.record('libgen', False, 10)
+    assert health.allow('libgen')
+    health.record('libgen', False, 10)
+    assert health.get_state('libgen')['state'] == OPEN
+
+def test_slow_source_is_degraded(health):
+    """Test qu'une source lente est signalée comme dégradée"""
+    for _ in range(Config.HEALTH_MIN_SAMPLES):
+        health.record('gutenberg', True, 5)
+    assert health.is_degraded('gutenberg', budget=4)
+    assert not health.is_degraded('gutenberg', budget=10)
+    assert health.snapshot(['gutenberg'])['gutenberg']['p95_latency'] == 5
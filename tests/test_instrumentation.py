@@ -0,0 +1,34 @@
+"""
+Tests de la journalisation des recherches
+"""
+
+import logging
+from app.core.instrumentation import SamplingFilter, log_search_summary
+from app.core.search_engine import SourceOutcome
+
+def make_record(level):
+    return logging.LogRecord('app.sources.libgen', level, __file__, 1, 'message', (), None)
+
+def test_sampling_keeps_warnings():
+    """Test que l'échantillonnage n'écarte jamais les avertissements"""
+    sampling = SamplingFilter(0)
+    assert not sampling.filter(make_record(logging.INFO))
+    assert sampling.filter(make_record(logging.WARNING))
+    assert SamplingFilter(1).filter(make_record(logging.DEBUG))
+
+def test_search_summary_has_per_source_timings(caplog):
+    """Test l'enregistrement récapitulatif d'une recherche"""
+    outcomes = [SourceOutcome('gallica', [{}, {}], 'ok', 60, 0.4),
+                SourceOutcome('libgen', [], 'timeout', 0, 3.0)]
+    with caplog.at_level(logging.INFO, logger='app.search'):
+        log_search_summary('Dune', 'fr', outcomes, 3.1, 2)
+    
+    [record] = caplog.records
+    assert record.search['sources']['gallica'] == {'status': 'ok', 'results': 2, 'elapsed': 0.4}
+    assert 'libgen=timeout/0/3.000s' in record.getMessage()
+
+def test_summary_is_skipped_above_info(caplog):
+    """Test qu'aucun enregistrement n'est construit quand le niveau INFO est désactivé"""
+    with caplog.at_level(logging.WARNING, logger='app.search'):
+        log_search_summary('Dune', 'fr', [], 0.1, 0)
+    assert not caplog.records
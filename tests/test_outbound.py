@@ -0,0 +1,107 @@
+"""
+Tests de l'ordonnanceur du débit sortant
+"""
+
+import asyncio
+import aiohttp
+import pytest
+from app.core import base_source
+from app.core.config import Config
+from app.core.outbound import OutboundScheduler, OutboundThrottled, parse_retry_after
+from app.core.storage import SQLiteStorage
+from tests.test_sources import DummySource
+
+URL = 'https://books.invalid/search'
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / 'outbound.sqlite3'))
+
+@pytest.fixture
+def scheduler(storage, monkeypatch):
+    monkeypatch.setitem(Config.OUTBOUND_RATE_LIMITS, 'books.invalid', (10.0, 3))
+    return OutboundScheduler(storage)
+
+def test_burst_then_paced_in_arrival_order(scheduler):
+    """Test que la rafale part aussitôt, puis que les requêtes sont espacées dans leur ordre d'arrivée"""
+    waits = [scheduler.reserve(URL)[0] for _ in range(6)]
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3:] == pytest.approx([0.1, 0.2, 0.3], abs=0.02)
+
+def test_slots_are_shared_between_workers(storage, scheduler):
+    """Test que les créneaux réservés par un worker le sont pour les autres"""
+    for _ in range(3):
+        scheduler.reserve(URL)
+    assert OutboundScheduler(storage).reserve(URL)[0] == pytest.approx(0.1, abs=0.02)
+
+def test_request_is_dropped_rather_than_queued_too_long(scheduler, monkeypatch):
+    """Test qu'une requête sans créneau proche est abandonnée sans rien réserver"""
+    monkeypatch.setattr(Config, 'OUTBOUND_MAX_WAIT', 0.15)
+    waits = [scheduler.reserve(URL)[0] for _ in range(4)]
+    with pytest.raises(OutboundThrottled):
+        scheduler.reserve(URL)
+    assert waits[-1] == pytest.approx(0.1, abs=0.02)
+    assert scheduler.reserve('https://other.invalid/')[0] == 0
+
+def test_retry_after_suspends_and_slows_down_the_host(scheduler):
+    """Test qu'un 429 suspend l'hôte le temps du Retry-After puis réduit son débit"""
+    _, ticket = scheduler.reserve(URL)
+    scheduler.settle(ticket, 429, {'Retry-After': '1'})
+    wait, ticket = scheduler.reserve(URL)
+    assert wait == pytest.approx(1.0, abs=0.05)
+    assert ticket.degraded
+    # Une seule requête à la reprise, puis un créneau toutes les 0,2 s (débit divisé par 2)
+    assert scheduler.reserve(URL)[0] == pytest.approx(1.2, abs=0.05)
+    
+    scheduler.settle(ticket, 200, {})
+    state = scheduler._load(scheduler.storage.get(OutboundScheduler.NAMESPACE, 'books.invalid')[0])
+    assert state['strikes'] == 0
+    assert state['factor'] == 0.5 + Config.OUTBOUND_RECOVERY_STEP
+
+def test_backoff_doubles_without_retry_after(scheduler, monkeypatch):
+    """Test que la pause double à chaque 503 consécutif, à défaut de Retry-After"""
+    monkeypatch.setattr(Config, 'OUTBOUND_MAX_WAIT', 10)
+    _, ticket = scheduler.reserve(URL)
+    pauses = []
+    for _ in range(3):
+        scheduler.settle(ticket, 503, {})
+        wait, ticket = scheduler.reserve(URL)
+        pauses.append(wait)
+    assert pauses == pytest.approx([1, 2, 4], abs=0.05)
+
+def test_parse_retry_after():
+    """Test la lecture de Retry-After en secondes et en date HTTP"""
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert parse_retry_after('bientôt') is None
+    assert parse_retry_after(None) is None
+
+class RateLimitedSession:
+    """Session aiohttp factice qui répond 429 avec un Retry-After"""
+    
+    status = 429
+    headers = {'Retry-After': '30'}
+    
+    def request(self, method, url, **kwargs):
+        return self
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    def raise_for_status(self):
+        raise aiohttp.ClientError(f'{self.status}, Too Many Requests')
+
+def test_fetch_goes_through_the_scheduler(scheduler, monkeypatch):
+    """Test que les requêtes des sources passent par l'ordonnanceur et respectent Retry-After"""
+    monkeypatch.setattr(base_source, 'get_outbound_scheduler', lambda: scheduler)
+    source = DummySource()
+    
+    with pytest.raises(aiohttp.ClientError) as error:
+        asyncio.run(source.fetch(RateLimitedSession(), URL))
+    assert not isinstance(error.value, OutboundThrottled)
+    # L'hôte est suspendu 30 s : la requête suivante n'attend pas son tour
+    with pytest.raises(OutboundThrottled):
+        asyncio.run(source.fetch(RateLimitedSession(), URL))
@@ -0,0 +1,43 @@
+"""
+Tests du calcul des scores de pertinence
+"""
+
+from difflib import SequenceMatcher
+from app.core.scoring import QueryScorer
+
+RESULTS = [
+    {'title': 'Les Misérables', 'author': 'Victor Hugo', 'language': 'fr'},
+    {'title': 'Les Misérables, tome 2', 'author': 'Victor Hugo', 'language': 'FR'},
+    {'title': 'Les Miserables', 'author': 'Victor Hugo', 'language': 'en'},
+    {'title': 'Notre-Dame de Paris', 'author': 'Victor Hugo', 'language': 'fr'},
+    {'title': 'Misery', 'author': 'Stephen King', 'language': 'en'},
+    {'title': 'Le Misanthrope', 'author': 'Molière', 'language': None},
+    {'title': 'Les Misérables illustrés', 'author': '', 'language': 'de'},
+]
+
+def reference_score(result, query, language):
+    """Score calculé comme avant, avec SequenceMatcher"""
+    def similarity(a, b):
+        return SequenceMatcher(None, a.lower().strip(), b.lower().strip()).ratio()
+    score = similarity(query, result['title']) * 0.5 + similarity(query, result['author']) * 0.2
+    if (result['language'] or '').lower() == language:
+        score += 0.3
+    elif (result['language'] or '').lower() == 'en' and language != 'en':
+        score += 0.15
+    return score
+
+def test_scores_match_previous_ranking():
+    """Test que le classement reste celui de SequenceMatcher, à une tolérance près"""
+    query, language = 'les misérables', 'fr'
+    scores = QueryScorer(query, language).score(RESULTS)
+    reference = [reference_score(result, query, language) for result in RESULTS]
+    assert all(abs(a - b) < 0.05 for a, b in zip(scores, reference))
+    assert sorted(range(len(RESULTS)), key=lambda i: -scores[i]) == \
+        sorted(range(len(RESULTS)), key=lambda i: -reference[i])
+
+def test_missing_fields_do_not_break_scoring():
+    """Test les résultats sans auteur, sans langue ou avec une langue absente (None)"""
+    scores = QueryScorer('Dune', 'fr').score([{'title': 'Dune'}, {'title': 'Dune', 'author': None,
+                                                                  'language': None}])
+    assert scores == [0.5, 0.5]
+    assert QueryScorer('Dune', 'fr').score([]) == []
@@ -2,6 +2,7 @@
 Tests pour le moteur de recherche
 """
 
+import asyncio
 import pytest
 from app.core.search_engine import SearchEngine
 from app.core.config import Config
@@ -43,3 +44,22 @@ def test_search_with_different_languages():
     for lang in Config.SUPPORTED_LANGUAGES.keys():
         results = engine.search("test", lang)
         assert isinstance(results, list), f"La recherche devrait fonctionner pour la langue {lang}"
+
+def test_sources_implement_search_async():
+    """Test que chaque source fournit une implémentation asynchrone native"""
+    engine = SearchEngine()
+    for source_name, source in engine.sources.items():
+        assert asyncio.iscoroutinefunction(source.search_async), \
+            f"{source_name} devrait implémenter search_async"
+
+def test_engine_reuses_pooled_session():
+    """Test que le pool de connexions est partagé entre les recherches"""
+    engine = SearchEngine()
+    client = engine.http_client
+    first = client.run_sync(client.get_session())
+    asyncio.run(engine.search_async("test", "fr"))
+    engine.search("test", "en")
+    assert client.run_sync(client.get_session()) is first, \
+        "La session HTTP devrait être réutilisée d'une recherche à l'autre"
+    assert SearchEngine().http_client is client, \
+        "Tous les moteurs d'un même worker devraient partager le même client"
@@ -0,0 +1,100 @@
+"""
+Tests du regroupement des recherches identiques simultanées
+"""
+
+import asyncio
+import time
+import pytest
+from app.core.config import Config
+from app.core.health import HealthTracker
+from app.core.search_engine import SearchEngine
+from app.core.singleflight import SingleFlight
+from tests.test_engine import FakeSource
+
+@pytest.fixture
+def engine():
+    engine = SearchEngine()
+    engine.sources = {'slow': FakeSource(delay=0.1)}
+    engine.query_cache.clear()
+    engine.source_cache.clear()
+    engine.health.storage.clear(HealthTracker.NAMESPACE)
+    engine.flights.storage.clear(SingleFlight.NAMESPACE)
+    return engine
+
+def test_identical_queries_share_one_upstream_search(engine):
+    """Test que des recherches identiques simultanées n'interrogent les sources qu'une fois"""
+    async def run():
+        searches = [engine.search_with_status(query, 'fr')
+                    for query in ['Dune', ' dune ', 'DUNE'] * 5]
+        return await asyncio.gather(*searches)
+    
+    reports = engine.http_client.run_sync(run())
+    assert engine.sources['slow'].calls == 1
+    assert all([r['title'] for r in report.results] == ['Dune'] for report in reports)
+
+def test_stream_joins_a_search_in_flight(engine):
+    """Test qu'un flux rejoint la recherche identique en cours et en émet le lot"""
+    async def run():
+        search = asyncio.ensure_future(engine.search_with_status('Dune', 'fr'))
+        await asyncio.sleep(0.01)
+        events = [event async for event in engine.iter_search('Dune', 'fr')]
+        return events, await search
+    
+    events, report = engine.http_client.run_sync(run())
+    assert engine.sources['slow'].calls == 1
+    assert [event['type'] for event in events] == ['results', 'done']
+    assert events[0]['results'][0]['title'] == 'Dune'
+
+def test_waiters_take_over_an_abandoned_search(engine):
+    """Test qu'une recherche abandonnée par celle qui la menait est reprise par une autre"""
+    flights = engine.flights
+    
+    async def run():
+        _, leader = await flights.acquire('fr|dune', lambda: None)
+        waiter = asyncio.ensure_future(flights.acquire('fr|dune', lambda: None))
+        await asyncio.sleep(0.01)
+        with leader:
+            pass  # Abandon sans résultat
+        shared, flight = await waiter
+        with flight:
+            flight.finish('lot')
+        return shared, flight
+    
+    shared, flight = engine.http_client.run_sync(run())
+    assert shared is None and flight is not None
+
+def test_workers_share_a_partial_answer(engine, monkeypatch):
+    """Test qu'une réponse partielle, non mise en cache, est transmise aux autres workers"""
+    monkeypatch.setitem(Config.SOURCE_TIMEOUTS, 'stuck', 0.3)
+    stuck = FakeSource(delay=10)
+    workers = [engine] + [SearchEngine() for _ in range(2)]
+    for worker in workers:
+        worker.sources = {'slow': engine.sources['slow'], 'stuck': stuck}
+    
+    async def run():
+        return await asyncio.gather(*(worker.search_with_status('Dune', 'fr') for worker in workers))
+    
+    start = time.monotonic()
+    reports = engine.http_client.run_sync(run())
+    # Une seule recherche, dans le budget de la source abandonnée
+    assert time.monotonic() - start < 0.6
+    assert stuck.calls == 1 and engine.sources['slow'].calls == 1
+    assert all(report.timed_out == ['stuck'] for report in reports)
+    assert all([r['title'] for r in report.results] == ['Dune'] for report in reports)
+
+def test_workers_wait_for_the_lease_holder(engine):
+    """Test qu'un autre worker attend le résultat de celui qui détient le bail"""
+    first, second = SingleFlight(), SingleFlight()  # Deux workers, un stockage commun
+    shared_cache = {}
+    
+    async def run():
+        _, leader = await first.acquire('fr|dune', lambda: shared_cache.get('fr|dune'))
+        waiter = asyncio.ensure_future(second.acquire('fr|dune', lambda: shared_cache.get('fr|dune')))
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+        with leader:
+            shared_cache['fr|dune'] = 'lot'
+            leader.finish('lot')
+        return await waiter
+    
+    assert engine.http_client.run_sync(run()) == ('lot', None)
@@ -0,0 +1,255 @@
+"""
+Tests des utilitaires communs aux sources
+"""
+
+import asyncio
+import time
+import pytest
+from app.core.base_source import BookSource
+from lxml import etree
+from app.core.config import Config
+from app.core.health import HealthTracker
+from app.core.storage import SQLiteStorage
+from app.sources.gutenberg import GutenbergSource
+from app.sources.libgen import LibgenSource
+
+class DummySource(BookSource):
+    """Source factice pour les tests"""
+    
+    def __init__(self):
+        super().__init__('Dummy', 'http://dummy.invalid')
+    
+    async def search_async(self, query, language, session):
+        return []
+
+def test_fetch_details_preserves_order_and_runs_in_parallel():
+    """Test que les pages de détail sont récupérées en parallèle et dans l'ordre"""
+    source = DummySource()
+    
+    async def fetch_one(i):
+        # Les premiers éléments sont les plus lents
+        await asyncio.sleep(0.05 - i * 0.005)
+        return {'title': str(i)}
+    
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await source.fetch_details(list(range(8)), fetch_one)
+        return results, loop.time() - start
+    
+    results, elapsed = asyncio.run(run())
+    assert [r['title'] for r in results] == [str(i) for i in range(8)]
+    assert elapsed < 0.2, "Les requêtes devraient être exécutées en parallèle"
+
+def test_fetch_details_skips_none():
+    """Test que les éléments ignorés par fetch_one ne laissent pas la liste incomplète"""
+    source = DummySource()
+    
+    async def fetch_one(i):
+        return None if i % 2 else {'title': str(i)}
+    
+    results = asyncio.run(source.fetch_details(list(range(6)), fetch_one))
+    assert [r['title'] for r in results] == ['0', '2', '4']
+    assert results.complete
+
+def test_fetch_details_respects_deadline(monkeypatch):
+    """Test que le délai global interrompt la collecte"""
+    monkeypatch.setattr(Config, 'DETAIL_FETCH_DEADLINE', 0.05)
+    source = DummySource()
+    
+    async def fetch_one(i):
+        await asyncio.sleep(0 if i == 0 else 1)
+        return {'title': str(i)}
+    
+    results = asyncio.run(source.fetch_details([0, 1, 2], fetch_one))
+    assert [r['title'] for r in results] == ['0']
+
+def test_fetch_metadata_uses_detail_cache(monkeypatch):
+    """Test que les métadonnées d'une page de détail ne sont extraites qu'une fois"""
+    source = DummySource()
+    fetched = []
+    
+    async def fake_fetch(session, url, **kwargs):
+        fetched.append(url)
+        return '<html>fr</html>'
+    
+    monkeypatch.setattr(source, 'fetch', fake_fetch)
+    extract = lambda html: {'language': 'fr'}
+    url = 'http://dummy.invalid/ebooks/metadata-cache'
+    
+    async def run():
+        first = await source.fetch_metadata(None, url, extract)
+        second = await source.fetch_metadata(None, url, extract)
+        return first, second
+    
+    assert asyncio.run(run()) == ({'language': 'fr'}, {'language': 'fr'})
+    assert fetched == [url]
+
+LIBGEN_PAGE = """
+<table width=100% class=c align=center>
+<tr><td>ID</td><td>Auteur</td><td>Titre</td><td></td><td></td><td></td><td>Langue</td><td></td><td></td></tr>
+<tr><td>1</td><td>Frank Herbert</td><td><a href="book/index.php?md5=ABC123">Dune</a></td>
+<td></td><td></td><td></td><td>French</td><td></td><td><a href="/get.php?md5=ABC123">[1]</a></td></tr>
+</table>
+"""
+
+def test_select_nodes_parses_fragment_and_tolerates_broken_html():
+    """Test que seule la partie utile est analysée, et que le HTML mal formé reste lisible"""
+    source = DummySource()
+    cells = etree.XPath("//table[@class='bibrec']//td")
+    
+    page = ('<html><body><table class="bibrec"><tr><td>Titre</td></tr></table>'
+            '<table class="other"><tr><td>Ignoré</td></tr></table></body></html>')
+    nodes = source.select_nodes(page, cells, 'class="bibrec"', '</table>')
+    assert [source.node_text(node) for node in nodes] == ['Titre']
+    
+    # Balises non fermées, table sans balise de fin
+    broken = '<html><body><p><table class="bibrec"><tr><td><b>Les <i>Misérables</td><td>Hugo'
+    nodes = source.select_nodes(broken, cells, 'class="bibrec"', '</table>')
+    assert [source.node_text(node) for node in nodes] == ['LesMisérables', 'Hugo']
+    
+    # Marqueur absent : la page entière est analysée
+    nodes = source.select_nodes(page, cells, 'class="absent"', '</table>')
+    assert [source.node_text(node) for node in nodes] == ['Titre']
+    assert source.select_nodes(page, etree.XPath('//ul'), 'class="bibrec"', '</table>') == []
+
+def test_paginated_source_keeps_the_whole_upstream_page(monkeypatch):
+    """Test qu'aucun livre d'une page de recherche n'est perdu au passage à la page suivante"""
+    source = GutenbergSource()
+    requested = []
+    
+    async def fake_fetch(session, url, params=None, **kwargs):
+        requested.append(params)
+        start = int(params.get('start_index', 1))
+        return ('<ul class="results">' + ''.join(
+            f'<li class="booklink"><a href="/ebooks/{i}">Livre {i}</a></li>'
+            for i in range(start, start + source.PAGE_SIZE)) + '</ul>')
+    
+    async def fake_metadata(session, url, extract):
+        return {'title': url.rsplit('/', 1)[1], 'author': 'Anonyme', 'language': 'fr'}
+    
+    monkeypatch.setattr(source, 'fetch', fake_fetch)
+    monkeypatch.setattr(source, 'fetch_metadata', fake_metadata)
+    assert source.PAGE_SIZE > Config.MAX_SEARCH_RESULTS
+    
+    async def run():
+        return [await source.search_page('Livre', 'fr', None, page) for page in range(2)]
+    
+    first, second = asyncio.run(run())
+    assert [r['title'] for r in first + second] == [str(i) for i in range(1, 2 * source.PAGE_SIZE + 1)]
+    assert requested[1]['start_index'] == str(source.PAGE_SIZE + 1)
+
+class ChunkedSession:
+    """Session aiohttp factice qui renvoie un document découpé en petits blocs"""
+    
+    status = 200
+    headers = {}
+    
+    def __init__(self, body, chunk_size=100):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        self.content = self
+    
+    def request(self, method, url, **kwargs):
+        return self
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    def raise_for_status(self):
+        pass
+    
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+
+def test_iter_xml_streams_and_frees_records():
+    """Test que les notices sont produites au fil de l'eau et libérées une fois traitées"""
+    source = DummySource()
+    body = ('<records>' + ''.join(f'<record><title>Livre {i}</title></record>' for i in range(500))
+            + '</records>').encode()
+    
+    async def run():
+        titles, sizes = [], []
+        async for record in source.iter_xml(ChunkedSession(body), 'http://dummy.invalid', ['record']):
+            titles.append(record.findtext('title'))
+            sizes.append(len(record.getparent()))
+        return titles, sizes
+    
+    titles, sizes = asyncio.run(run())
+    assert titles == [f'Livre {i}' for i in range(500)]
+    # Seules les notices du bloc en cours restent en mémoire
+    assert max(sizes) < 10, "Les notices déjà traitées devraient être libérées"
+
+@pytest.fixture
+def libgen(tmp_path, monkeypatch):
+    source = LibgenSource()
+    source.mirrors = ['http://slow.invalid', 'http://fast.invalid']
+    source.health = HealthTracker(SQLiteStorage(str(tmp_path / 'health.sqlite3')))
+    source._last_probe = time.monotonic()
+    delays = {'http://slow.invalid': 1.0, 'http://fast.invalid': 0.05}
+    
+    async def fake_fetch(session, url, **kwargs):
+        await asyncio.sleep(delays[url.rsplit('/', 1)[0]])
+        return LIBGEN_PAGE
+    
+    monkeypatch.setattr(source, 'fetch', fake_fetch)
+    monkeypatch.setattr(Config, 'LIBGEN_HEDGE_DELAY', 0.1)
+    return source
+
+def test_libgen_hedges_slow_mirror(libgen):
+    """Test qu'un second miroir est interrogé quand le premier tarde à répondre"""
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await libgen.search_async('Dune', 'fr', None)
+        return results, loop.time() - start
+    
+    results, elapsed = asyncio.run(run())
+    assert elapsed < 0.5
+    assert results[0]['url'] == 'http://fast.invalid/book/index.php?md5=ABC123'
+    assert results[0]['download_url'] == 'http://fast.invalid/get.php?md5=ABC123'
+
+def test_libgen_reads_quoted_class_attribute(libgen, monkeypatch):
+    """Test que la table des résultats est lue quel que soit le style de l'attribut class"""
+    page = LIBGEN_PAGE.replace('class=c ', 'class="c" ')
+    
+    async def fake_fetch(session, url, **kwargs):
+        return page
+    
+    monkeypatch.setattr(libgen, 'fetch', fake_fetch)
+    results = asyncio.run(libgen.search_async('Dune', 'fr', None))
+    assert [result['title'] for result in results] == ['Dune']
+
+LIBGEN_NESTED_PAGE = """
+<table width=100% class=c align=center>
+<tr><td>ID</td><td>Auteur</td><td>Titre</td><td></td><td></td><td></td><td>Langue</td><td></td><td></td></tr>
+<tr><td>1</td><td>Frank Herbert</td><td><a href="book/index.php?md5=ABC123">Dune</a></td>
+<td><table><tr><td>ISBN 9782266320481</td></tr></table></td><td></td><td></td><td>French</td><td></td>
+<td><a href="/get.php?md5=ABC123">[1]</a></td></tr>
+<tr><td>2</td><td>Frank Herbert</td><td><a href="book/index.php?md5=DEF456">Le Messie de Dune</a></td>
+<td></td><td></td><td></td><td>French</td><td></td><td><a href="/get.php?md5=DEF456">[1]</a></td></tr>
+</table>
+"""
+
+def test_libgen_reads_rows_after_a_nested_table(libgen, monkeypatch):
+    """Test que le fragment analysé s'arrête à la fin de la table des résultats, et non d'une table imbriquée"""
+    
+    async def fake_fetch(session, url, **kwargs):
+        return LIBGEN_NESTED_PAGE
+    
+    monkeypatch.setattr(libgen, 'fetch', fake_fetch)
+    results = asyncio.run(libgen.search_async('Dune', 'fr', None))
+    assert [result['title'] for result in results] == ['Dune', 'Le Messie de Dune']
+
+def test_libgen_ranks_mirrors_by_latency_and_health(libgen):
+    """Test que le miroir le plus rapide et en bonne santé est interrogé en premier"""
+    assert libgen.rank_mirrors() == ['http://slow.invalid', 'http://fast.invalid']
+    libgen.health.record(libgen._mirror_key('http://slow.invalid'), True, 1.0)
+    libgen.health.record(libgen._mirror_key('http://fast.invalid'), True, 0.05)
+    assert libgen.rank_mirrors() == ['http://fast.invalid', 'http://slow.invalid']
+    for _ in range(Config.HEALTH_FAILURE_THRESHOLD):
+        libgen.health.record(libgen._mirror_key('http://fast.invalid'), False, 0.01)
+    assert libgen.rank_mirrors() == ['http://slow.invalid', 'http://fast.invalid']
@@ -0,0 +1,109 @@
+"""
+Tests des stockages partagés et des compteurs du limiteur de requêtes
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+import pytest
+from flask import Flask
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from limits import parse
+from prometheus_client import REGISTRY
+from limits.strategies import FixedWindowRateLimiter
+from app.core import limiter_storage
+from app.core.config import Config
+from app.core.limiter_storage import SharedLimiterStorage
+from app.core.storage import MemoryStorage, SQLiteStorage, storage_from_uri
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def storage(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteStorage(str(tmp_path / 'storage.sqlite3'))
+    return MemoryStorage()
+
+def test_incr_keeps_the_window_until_it_expires(storage):
+    """Test qu'un compteur conserve sa date d'expiration puis repart de zéro"""
+    expires_at = time.time() + 0.2
+    assert storage.incr('limiter', 'ip', 1, expires_at) == 1
+    assert storage.incr('limiter', 'ip', 2, time.time() + 60) == 3
+    assert storage.get('limiter', 'ip')[2] == pytest.approx(expires_at)
+    time.sleep(0.25)
+    assert storage.get('limiter', 'ip') is None
+    assert storage.incr('limiter', 'ip', 1, time.time() + 60) == 1
+
+def test_update_and_prune(storage):
+    """Test la lecture-écriture atomique et le nettoyage des entrées les plus anciennes"""
+    for i in range(5):
+        storage.update('health', str(i), lambda value: (value or '') + 'x', time.time() + 60)
+    storage.update('health', '0', lambda value: value + 'y', time.time() + 60)
+    assert storage.get('health', '0')[0] == 'xy'
+    storage.prune('health', 2)
+    assert storage.get('health', '1') is None
+    assert storage.get('health', '0')[0] == 'xy'
+
+def test_event_loop_writes_do_not_wait_for_the_lock(tmp_path, monkeypatch):
+    """Test qu'une écriture sur une boucle d'événements n'attend pas le verrou d'un autre processus"""
+    monkeypatch.setattr(Config, 'SHARED_STORAGE_LOOP_BUSY_TIMEOUT', 0.05)
+    path = str(tmp_path / 'storage.sqlite3')
+    storage = SQLiteStorage(path)
+    storage.set('health', 'x', '1', time.time() + 60)
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')
+    
+    async def write():
+        start = time.monotonic()
+        with pytest.raises(sqlite3.OperationalError):
+            storage.update('health', 'x', lambda value: '2', time.time() + 60)
+        return time.monotonic() - start
+    
+    assert asyncio.run(write()) < 0.5
+    # Hors de la boucle, la même connexion attend la fin de la transaction
+    release = threading.Timer(0.2, lambda: other.execute('ROLLBACK'))
+    release.start()
+    assert storage.update('health', 'x', lambda value: value + '3', time.time() + 60) == '13'
+    release.join()
+
+def test_storage_from_uri(tmp_path):
+    """Test le choix du stockage d'après son URI"""
+    path = str(tmp_path / 'shared.sqlite3')
+    assert storage_from_uri(f'sqlite://{path}').path == path
+    assert isinstance(storage_from_uri('memory://'), MemoryStorage)
+    with pytest.raises(ValueError):
+        storage_from_uri('redis://localhost')
+
+def test_limiter_counters_are_shared_between_workers(tmp_path, monkeypatch):
+    """Test qu'une limite est comptée pour l'ensemble des workers, et non par worker"""
+    shared = SQLiteStorage(str(tmp_path / 'limiter.sqlite3'))
+    monkeypatch.setattr(limiter_storage, 'get_storage', lambda: shared)
+    workers = [FixedWindowRateLimiter(SharedLimiterStorage('shared://')) for _ in range(3)]
+    limit = parse('5 per minute')
+    
+    allowed = [workers[i % 3].hit(limit, '127.0.0.1') for i in range(8)]
+    assert allowed == [True] * 5 + [False] * 3
+    remaining = workers[0].get_window_stats(limit, '127.0.0.1')
+    assert remaining.remaining == 0
+    assert remaining.reset_time > time.time()
+
+def test_limiter_falls_back_to_memory_when_storage_is_busy(monkeypatch):
+    """Test que le limiteur compte en mémoire, et non laisse tout passer, quand le stockage est occupé"""
+    class BusyStorage(MemoryStorage):
+        def incr(self, *args):
+            raise sqlite3.OperationalError('database is locked')
+    
+    monkeypatch.setattr(limiter_storage, 'get_storage', BusyStorage)
+    app = Flask(__name__)
+    Limiter(get_remote_address, app=app, default_limits=['2 per minute'],
+            storage_uri='shared://', in_memory_fallback_enabled=True)
+    app.add_url_rule('/', 'index', lambda: 'ok')
+    
+    def errors():
+        return REGISTRY.get_sample_value('book_finder_ratelimit_storage_errors_total',
+                                         {'operation': 'incr'}) or 0
+    
+    before = errors()
+    client = app.test_client()
+    assert [client.get('/').status_code for _ in range(3)] == [200, 200, 429]
+    assert errors() == before + 1
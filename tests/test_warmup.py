@@ -0,0 +1,87 @@
+"""
+Tests du préchauffage des caches
+"""
+
+import time
+import pytest
+from app.core.config import Config
+from app.core.health import HealthTracker
+from app.core.outbound import OutboundScheduler
+from app.core.search_engine import SearchEngine
+from app.core.storage import MemoryStorage
+from app.core.warmup import CacheWarmer, QueryLog, read_access_log
+from tests.test_engine import FakeSource
+
+ACCESS_LOG = '''\
+127.0.0.1 - - [18/Oct/2026:09:00:00 +0000] "GET /search?q=Dune&lang=fr HTTP/1.0" 200 512 "-" "Mozilla/5.0"
+127.0.0.1 - - [18/Oct/2026:09:00:01 +0000] "GET /search/stream?q=dune&lang=fr HTTP/1.0" 200 812 "-" "Mozilla/5.0"
+127.0.0.1 - - [18/Oct/2026:09:00:02 +0000] "GET /search?q=Dune&lang=fr&page=eyJwIjp7fX0 HTTP/1.0" 200 512 "-" "-"
+127.0.0.1 - - [18/Oct/2026:09:00:03 +0000] "GET /search?q=Les+Mis%C3%A9rables&lang=fr HTTP/1.0" 429 64 "-" "-"
+127.0.0.1 - - [18/Oct/2026:09:00:04 +0000] "GET /search?q=Les+Mis%C3%A9rables&lang=fr HTTP/1.0" 200 512 "-" "-"
+127.0.0.1 - - [18/Oct/2026:09:00:05 +0000] "GET /static/css/style.css HTTP/1.0" 200 2048 "-" "-"
+'''
+
+@pytest.fixture
+def engine():
+    engine = SearchEngine()
+    engine.sources = {'fast': FakeSource()}
+    engine.query_cache.clear()
+    engine.source_cache.clear()
+    engine.health.storage.clear(HealthTracker.NAMESPACE)
+    return engine
+
+@pytest.fixture
+def warmer(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'WARMUP_ACCESS_LOG', str(tmp_path / 'absent.log'))
+    storage = MemoryStorage()
+    return CacheWarmer(engine, QueryLog(storage), OutboundScheduler(storage))
+
+def test_query_log_ranks_normalized_queries(warmer):
+    """Test que les requêtes sont comptées sous leur forme normalisée et classées par fréquence"""
+    for query in ['Dune', ' dune ', 'DUNE', 'Fondation', 'fondation', 'Hapax']:
+        warmer.query_log.record(query, 'fr')
+    warmer.query_log.record('Dune', 'xx')
+    assert warmer.top_queries(10) == [('dune', 'fr'), ('fondation', 'fr')]
+    assert warmer.top_queries(1) == [('dune', 'fr')]
+
+def test_access_log_counts_first_pages_of_successful_searches(tmp_path):
+    """Test la lecture des recherches du journal d'accès"""
+    path = tmp_path / 'access.log'
+    path.write_text(ACCESS_LOG, encoding='utf-8')
+    assert read_access_log(str(path)) == {('fr', 'dune'): 2, ('fr', 'les misérables'): 1}
+    # Lecture de la fin du journal seulement
+    assert read_access_log(str(path), max_bytes=len(ACCESS_LOG.splitlines()[-1]) * 3) == {
+        ('fr', 'les misérables'): 1}
+
+def test_warm_fills_the_cache_once(engine, warmer):
+    """Test que les requêtes fréquentes sont rejouées une fois puis servies depuis le cache"""
+    for _ in range(3):
+        warmer.query_log.record('Dune', 'fr')
+    assert engine.http_client.run_sync(warmer.warm()) == {'warmed': 1, 'cached': 0, 'failed': 0}
+    assert engine.sources['fast'].calls == 1
+    
+    assert engine.http_client.run_sync(warmer.warm()) == {'warmed': 0, 'cached': 1, 'failed': 0}
+    assert engine.search('DUNE')[0]['title'] == 'Dune'
+    assert engine.sources['fast'].calls == 1
+
+def test_warm_waits_for_outbound_headroom(engine, warmer, monkeypatch):
+    """Test que le préchauffage attend que les utilisateurs laissent du débit sortant libre"""
+    monkeypatch.setitem(Config.OUTBOUND_RATE_LIMITS, 'fake.invalid', (20.0, 4))
+    monkeypatch.setattr(Config, 'WARMUP_POLL_INTERVAL', 0.01)
+    for _ in range(4):
+        warmer.scheduler.reserve('http://fake.invalid/search')
+    assert warmer.scheduler.headroom('http://fake.invalid/') == pytest.approx(0, abs=0.05)
+    
+    for _ in range(2):
+        warmer.query_log.record('Dune', 'fr')
+    start = time.monotonic()
+    assert engine.http_client.run_sync(warmer.warm())['warmed'] == 1
+    # Deux créneaux sur quatre libérés au rythme de 20 par seconde : au moins 0,1 s
+    assert time.monotonic() - start >= 0.09
+
+def test_one_worker_warms_per_interval(engine, warmer):
+    """Test qu'un seul worker préchauffe les caches par intervalle"""
+    other = CacheWarmer(engine, QueryLog(warmer.storage), warmer.scheduler)
+    assert warmer.claim()
+    assert not other.claim()
+    assert not warmer.claim()